@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'Palletways Shipping Integration',
-    'version': '17.0.2.1.0',
+    'version': '17.0.2.2.0',
     'category': 'Inventory/Delivery',
     'summary': 'Integración completa con API oficial de Palletways para envíos',
     'description': '''
@@ -72,6 +72,8 @@
         'views/delivery_carrier_views.xml',
         'views/stock_picking_views.xml',
         'views/palletways_shipment_views.xml',
+        'views/palletways_consignment_job_views.xml',
+        'views/palletways_label_batch_views.xml',
 
         # Vistas existentes actualizadas
         'views/res_company.xml',
@@ -0,0 +1,24 @@
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """
+    El cron de estados está en un bloque noupdate: pasar de 4 horas a 15
+    minutos solo si sigue con el intervalo antiguo (no pisar cambios del usuario)
+    """
+    if not version:
+        return
+    cr.execute("""
+        UPDATE ir_cron
+           SET interval_number = 15, interval_type = 'minutes'
+         WHERE id = (SELECT res_id
+                       FROM ir_model_data
+                      WHERE module = 'palletways_service_integration'
+                        AND name = 'cron_update_palletways_status')
+           AND interval_number = 4
+           AND interval_type = 'hours'
+    """)
+    if cr.rowcount:
+        _logger.info("Cron de estados Palletways: intervalo actualizado a 15 minutos")
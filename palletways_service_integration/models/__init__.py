@@ -1,6 +1,12 @@
 from . import res_company
 from . import palletways_api_client
+from . import palletways_rate_limit
+from . import palletways_service_cache
 from . import palletways_shipment
+from . import palletways_shipment_note
+from . import palletways_shipment_event
+from . import palletways_label_batch
+from . import palletways_consignment_job
 from . import delivery_carrier
 from . import stock_picking
 from . import sale_order
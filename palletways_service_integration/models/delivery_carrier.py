@@ -5,6 +5,8 @@ import math
 from datetime import datetime, timedelta
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools import split_every
+from . import palletways_normalizer
 
 _logger = logging.getLogger(__name__)
 
@@ -66,6 +68,10 @@ class DeliveryCarrier(models.Model):
     palletways_auto_handball = fields.Boolean('Despaletización Automática',
                                              default=False,
                                              help='Activar despaletización para productos específicos')
+    palletways_async_send = fields.Boolean('Envío Asíncrono',
+                                          default=False,
+                                          help='Validar el albarán sin esperar a Palletways: '
+                                               'el envío se encola y lo crea un proceso en segundo plano con reintentos')
     
     tail_lift = fields.Boolean(string="Tail Lift?", 
                               help="DEPRECATED: Usar palletways_auto_taillift")
@@ -93,6 +99,24 @@ class DeliveryCarrier(models.Model):
             raise UserError("Transportista Palletways sin cliente API configurado")
         
         api_client = self.palletways_api_client_id
+        
+        # ✅ NUEVO v2.6.0: Varios albaranes → un Manifest por lote
+        # Los albaranes ya reservados en Palletways se conservan aunque fallen
+        # otros del lote (si no, al volver a validar se reservarían dos veces);
+        # los fallidos llevan el error en su chatter y vuelven sin tracking
+        if len(pickings) > 1:
+            outcomes = self._palletways_send_shipping_batch(pickings)
+            errors = [f"{picking.name}: {outcomes[picking.id][1]}"
+                      for picking in pickings if not outcomes[picking.id][0]]
+            if len(errors) == len(pickings):
+                raise UserError("Error creando envíos Palletways:\n• " + "\n• ".join(errors))
+            if errors:
+                _logger.warning(f"Envíos Palletways no creados ({len(errors)} de {len(pickings)}): {errors}")
+            return [
+                outcomes[picking.id][0] or {'exact_price': 0.0, 'tracking_number': False, 'labels': []}
+                for picking in pickings
+            ]
+        
         results = []
         
         for picking in pickings:
@@ -164,54 +188,167 @@ class DeliveryCarrier(models.Model):
         _logger.info(f"palletways_send_shipping() completado. Resultados: {len(results)}")
         return results
 
-    def _process_api_response(self, api_response, picking, api_client):
+    def _palletways_send_shipping_batch(self, pickings):
         """
-        ✅ CORRECCIÓN v2.3.0:
-        Procesar respuesta XML de Palletways
+        ✅ NUEVO v2.6.0:
+        Enviar varios albaranes con un Manifest por lote (palletways.manifest_batch_size)
+        en lugar de una petición createConsignment por albarán.
+
+        No lanza excepciones por albarán: devuelve {picking.id: (resultado, error)}
+        para que el llamador decida (palletways_send_shipping, cola asíncrona).
+        Resultado y error a la vez = reservado en Palletways pero no registrado.
         """
-        _logger.info("="*80)
-        _logger.info("RESPUESTA API (XML):")
-        _logger.info(f"{json.dumps(api_response, indent=2, default=str)}")
-        _logger.info("="*80)
+        self.ensure_one()
+        api_client = self.palletways_api_client_id
+        batch_size = int(self.env['ir.config_parameter'].sudo().get_param(
+            'palletways.manifest_batch_size', 25))
+        outcomes = {}
         
-        if not api_response:
-            raise UserError("Respuesta vacía de la API")
+        valid_pickings = []
+        for picking in pickings:
+            try:
+                self._validate_palletways_picking(picking)
+            except UserError as e:
+                outcomes[picking.id] = (None, str(e))
+            else:
+                valid_pickings.append(picking)
+        
+        for chunk in split_every(batch_size, valid_pickings):
+            # Solo el envío a Palletways decide si el lote se reintenta
+            try:
+                shipment_data_list = [self._prepare_palletways_shipment_data(picking) for picking in chunk]
+                api_response = api_client.create_consignments(shipment_data_list)
+                response_ids = self._process_batch_api_response(api_response, shipment_data_list, api_client)
+            except Exception as e:
+                _logger.error(f"✗ Error en lote de {len(chunk)} albaranes: {e}")
+                for picking in chunk:
+                    outcomes[picking.id] = (None, str(e))
+                continue
+            
+            created = [
+                (picking, shipment_data, response_id)
+                for picking, shipment_data, response_id in zip(chunk, shipment_data_list, response_ids)
+                if response_id
+            ]
+            outcomes.update(self._register_booked_pickings(created, api_response))
+            
+            for picking, response_id in zip(chunk, response_ids):
+                if not response_id:
+                    outcomes[picking.id] = (None, "No se recibió ResponseID para este albarán")
         
-        status = api_response.get('Status', {})
-        if isinstance(status, list):
-            status = status[0] if status else {}
+        for picking in pickings:
+            error = outcomes[picking.id][1]
+            if error:
+                picking.message_post(
+                    body=f"❌ Error creando envío Palletways:<br/>{error}",
+                    message_type='comment'
+                )
         
-        if isinstance(status, str):
-            status_code = status
-            status_desc = ''
-        else:
-            status_code = status.get('Code', status.get('_text', ''))
-            status_desc = status.get('Description', '')
+        _logger.info(
+            f"Envío por lotes completado: "
+            f"{sum(1 for result, error in outcomes.values() if result)} de {len(pickings)} albaranes"
+        )
+        return outcomes
+
+    def _register_booked_pickings(self, created, api_response):
+        """
+        Registrar las consignaciones ya reservadas en Palletways:
+        `created` es una lista de (albarán, datos envío, tracking).
+        Un fallo aquí no debe provocar un reintento (se duplicaría la reserva):
+        el albarán queda con resultado (tracking) y error, para revisión manual.
+        Devuelve {picking.id: (resultado, error)}.
+        """
+        outcomes = {}
+        for picking, shipment_data, tracking_id in created:
+            outcomes[picking.id] = ({
+                'exact_price': 0.0,
+                'tracking_number': tracking_id,
+                'labels': [],
+            }, None)
+        
+        try:
+            with self.env.cr.savepoint():
+                self._create_booked_shipments(created, api_response)
+            return outcomes
+        except Exception as e:
+            _logger.error(f"✗ Error registrando lote reservado, se registra albarán a albarán: {e}")
         
-        _logger.info(f"Status Code: {status_code}")
-        _logger.info(f"Status Description: {status_desc}")
+        for picking, shipment_data, tracking_id in created:
+            try:
+                with self.env.cr.savepoint():
+                    self._create_booked_shipments([(picking, shipment_data, tracking_id)], api_response)
+            except Exception as e:
+                error = (f"Envío reservado en Palletways (Tracking ID {tracking_id}) pero no se pudo "
+                         f"registrar en Odoo: {e}. No reintentar sin comprobarlo en Palletways.")
+                _logger.error(f"✗ {picking.name}: {error}")
+                outcomes[picking.id] = (outcomes[picking.id][0], error)
+        return outcomes
+
+    def _create_booked_shipments(self, created, api_response):
+        """Crear los palletways.shipment de `created` y enlazarlos a sus albaranes"""
+        shipments = self.env['palletways.shipment'].create([
+            self._prepare_palletways_shipment_vals(picking, tracking_id, tracking_id, shipment_data, api_response)
+            for picking, shipment_data, tracking_id in created
+        ])
+        
+        for (picking, shipment_data, tracking_id), shipment in zip(created, shipments):
+            picking.write({
+                'palletways_shipment_id': shipment.id,
+                'carrier_tracking_ref': tracking_id,
+            })
+            picking.message_post(
+                body=f"✅ Envío Palletways creado exitosamente<br/>"
+                     f"<strong>Tracking ID:</strong> {tracking_id}<br/>"
+                     f"<strong>Servicio:</strong> {shipment.service_name}<br/>"
+                     f"<strong>Peso:</strong> {shipment.weight}kg<br/>"
+                     f"<strong>Pallets:</strong> {shipment.pallets}",
+                message_type='comment'
+            )
+        return shipments
+
+    def _process_batch_api_response(self, api_response, shipment_data_list, api_client):
+        """
+        Extraer el ResponseID de cada <Consignment> de un Manifest múltiple.
+        Las entradas ImportDetail se asocian por ImportID y, si no lo traen,
+        por posición. Devuelve una lista alineada con `shipment_data_list`.
+        """
+        detail = self._get_api_response_detail(api_response)
+        import_details = detail.records
         
-        if status_code != 'OK':
-            raise UserError(f"Error API: {status_code} - {status_desc}")
+        if not import_details:
+            message = detail.message
+            if api_client and api_client.test_mode:
+                raise UserError(f"❌ MODO PRUEBA - No se crean envíos reales\n\nMensaje: {message}")
+            raise UserError(f"❌ No se recibió ResponseID\n\nMensaje: {message}")
         
-        detail = api_response.get('Detail', {})
-        if isinstance(detail, list):
-            detail = detail[0] if detail else {}
+        by_import_id = {
+            entry.get('ImportID'): entry
+            for entry in import_details
+            if entry.get('ImportID')
+        }
         
-        import_detail = detail.get('ImportDetail', {})
-        if isinstance(import_detail, list):
-            import_detail = import_detail[0] if import_detail else {}
+        response_ids = []
+        for index, shipment_data in enumerate(shipment_data_list):
+            entry = by_import_id.get(shipment_data.get('import_id'))
+            if entry is None and not by_import_id and index < len(import_details):
+                entry = import_details[index]
+            response_ids.append(entry.get('ResponseID', entry.text) if entry is not None else '')
         
-        response_id = import_detail.get('ResponseID', import_detail.get('_text', ''))
+        return response_ids
+
+    def _process_api_response(self, api_response, picking, api_client):
+        """
+        ✅ CORRECCIÓN v2.3.0:
+        Procesar respuesta XML de Palletways
+        """
+        detail = self._get_api_response_detail(api_response)
         
-        if not response_id:
-            data = detail.get('Data', {})
-            if isinstance(data, list):
-                data = data[0] if data else {}
-            response_id = data.get('ResponseID', data.get('_text', ''))
+        # ImportDetail (o Data si no viene) ya desenvuelto por el normalizador
+        record = detail.first
+        response_id = record.get('ResponseID', record.text)
         
         if not response_id:
-            message = detail.get('Message', detail.get('_text', ''))
+            message = detail.message
             
             if api_client and api_client.test_mode:
                 raise UserError(
@@ -230,11 +367,39 @@ class DeliveryCarrier(models.Model):
         
         return tracking_id, response_id
 
+    def _get_api_response_detail(self, api_response):
+        """Verificar Status de la respuesta createConsignment y devolver su Detail normalizado (PwDetail)"""
+        if _logger.isEnabledFor(logging.DEBUG):
+            _logger.debug(f"RESPUESTA API (XML):\n{json.dumps(api_response, indent=2, default=str)}")
+        
+        if not api_response:
+            raise UserError("Respuesta vacía de la API")
+        
+        response = palletways_normalizer.normalize(api_response)
+        status = response.status
+        
+        _logger.info(f"Status Code: {status.code}")
+        _logger.info(f"Status Description: {status.description}")
+        
+        if not status.ok:
+            raise UserError(f"Error API: {status.code} - {status.description}")
+        
+        return response.detail
+
     def _create_palletways_shipment(self, picking, tracking_id, response_id, shipment_data, api_response):
         """
         Crear registro palletways.shipment
         """
-        shipment_vals = {
+        shipment_vals = self._prepare_palletways_shipment_vals(
+            picking, tracking_id, response_id, shipment_data, api_response)
+        
+        shipment = self.env['palletways.shipment'].create(shipment_vals)
+        _logger.info(f"Shipment creado: {shipment.id}")
+        
+        return shipment
+
+    def _prepare_palletways_shipment_vals(self, picking, tracking_id, response_id, shipment_data, api_response):
+        return {
             'tracking_id': tracking_id,
             'picking_id': picking.id,
             'response_id': response_id,
@@ -245,14 +410,9 @@ class DeliveryCarrier(models.Model):
             'bill_unit_type': shipment_data.get('bill_unit_type', 'FP'),
             'collection_date': shipment_data.get('collection_date', ''),
             'delivery_date': shipment_data.get('delivery_date', ''),
-            'api_response': json.dumps(api_response, indent=2, default=str),
+            'event_ids': [(0, 0, self.env['palletways.shipment.event']._prepare_creation_event(api_response, tracking_id))],
             'notes': f"Envío creado automáticamente al validar albarán {picking.name}",
         }
-        
-        shipment = self.env['palletways.shipment'].create(shipment_vals)
-        _logger.info(f"Shipment creado: {shipment.id}")
-        
-        return shipment
 
     def palletways_rate_shipment(self, order):
         """Calcular precio envío Palletways"""
@@ -277,6 +437,26 @@ class DeliveryCarrier(models.Model):
                 'O': 60.0,
             }
             
+            # ✅ NUEVO v2.6.0: Comprobar disponibilidad del servicio con la caché de rutas
+            # (precargada de noche), sin llamar a la API durante la jornada
+            sender = order.warehouse_id.partner_id
+            recipient = order.partner_shipping_id
+            if (self.palletways_api_client_id and self.palletways_service_code
+                    and sender.zip and sender.country_id and recipient.zip and recipient.country_id):
+                services = self.palletways_api_client_id._get_cached_services(
+                    sender.country_id.code, sender.zip, recipient.country_id.code, recipient.zip)
+                if services is not None and self.palletways_service_code not in {
+                        service.get('ServiceCode') for service in services}:
+                    return {
+                        'success': False,
+                        'price': 0.0,
+                        'error_message': (
+                            f"Servicio Palletways {self.palletways_service_code} no disponible "
+                            f"para la ruta {sender.zip} -> {recipient.zip}"
+                        ),
+                        'warning_message': False
+                    }
+            
             base_price = base_prices.get(self.palletways_service_code, 50.0)
             
             if total_weight > 1000:
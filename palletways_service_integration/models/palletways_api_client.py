@@ -2,11 +2,16 @@ import requests
 import json
 import base64
 import logging
+import time
+import threading
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
 from xml.dom import minidom
 from datetime import datetime, timedelta
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
+from odoo.modules.registry import Registry
+from . import palletways_http, palletways_manifest, palletways_normalizer, palletways_shipment_note
 
 _logger = logging.getLogger(__name__)
 
@@ -42,6 +47,38 @@ class PalletwaysApiClient(models.Model):
     last_request_time = fields.Datetime('Última Petición')
     request_count = fields.Integer('Contador Peticiones')
     
+    # Rate limiting (token bucket)
+    rate_limit_per_minute = fields.Integer('Peticiones por Minuto', default=100,
+                                           help='Límite de la API Palletways: 100 llamadas/min')
+    rate_limit_backend = fields.Selection([
+        ('memory', 'Memoria (por worker)'),
+        ('database', 'Base de datos (compartido entre workers)'),
+    ], string='Backend Rate Limit', default='memory', required=True,
+       help='• Memoria: sin acceso a BD, el límite se aplica por proceso\n'
+            '• Base de datos: límite global para despliegues multi-worker')
+    rate_limit_max_wait = fields.Integer('Espera Máxima (s)', default=60,
+                                         help='Segundos máximos esperando un token antes de abortar la petición')
+    rate_limit_tokens = fields.Float('Tokens Disponibles', compute='_compute_rate_limit_tokens',
+                                     digits=(16, 1))
+    
+    # Reintentos ante errores transitorios
+    retry_max_attempts = fields.Integer('Intentos Máximos', default=3,
+                                        help='Número total de intentos por petición (1 = sin reintentos)')
+    retry_backoff_base = fields.Float('Espera Base (s)', default=1.0,
+                                      help='Espera del primer reintento; se duplica en cada intento (con jitter)')
+    retry_backoff_max = fields.Float('Espera Máxima Reintento (s)', default=30.0)
+    
+    # Validación local del Manifest
+    validate_manifest = fields.Boolean('Validar Manifest (XSD)', default=False,
+                                       help='Validar el Manifest contra el esquema XSD antes de enviarlo, '
+                                            'para detectar campos incorrectos sin gastar una petición')
+    
+    # Caché de availableServices por ruta
+    service_cache_ttl = fields.Integer('Vigencia Caché Servicios (h)', default=24,
+                                       help='Horas que se reutiliza la respuesta de availableServices '
+                                            'para una misma ruta. 0 desactiva la caché')
+    service_cache_count = fields.Integer('Rutas en Caché', compute='_compute_service_cache_count')
+    
     @api.depends('api_endpoint_type')
     def _compute_api_endpoint(self):
         """
@@ -66,27 +103,168 @@ class PalletwaysApiClient(models.Model):
             if not record.api_endpoint.startswith(('http://', 'https://')):
                 raise ValidationError("El endpoint debe comenzar con http:// o https://")
     
+    def write(self, vals):
+        res = super().write(vals)
+        if 'api_key' in vals or 'api_endpoint_type' in vals:
+            for record in self:
+                palletways_http.invalidate_session(record._get_http_session_key())
+                palletways_http.forget_routes(record._get_http_session_key())
+        if 'api_endpoint_type' in vals or 'service_cache_ttl' in vals:
+            self._clear_service_cache()
+        return res
+    
+    def unlink(self):
+        keys = [record._get_http_session_key() for record in self]
+        for record in self:
+            self.env['ir.config_parameter'].sudo().set_param(record._get_service_cache_version_param(), False)
+        res = super().unlink()
+        for key in keys:
+            palletways_http.invalidate_session(key)
+            palletways_http.forget_routes(key)
+            palletways_http.forget_services(key)
+        return res
+    
+    def _get_http_session_key(self):
+        return (self.env.cr.dbname, self.id)
+    
+    def _get_http_session(self):
+        """
+        Sesión HTTP keep-alive reutilizada por todas las peticiones de este cliente
+        Se renueva automáticamente si cambian api_key o api_endpoint_type
+        """
+        self.ensure_one()
+        return palletways_http.get_session(
+            self._get_http_session_key(),
+            (self.api_key, self.api_endpoint_type),
+        )
+    
+    def _compute_service_cache_count(self):
+        counts = dict(self.env['palletways.service.cache']._read_group(
+            [('api_client_id', 'in', self.ids)], ['api_client_id'], ['__count']))
+        for record in self:
+            record.service_cache_count = counts.get(record, 0)
+    
+    def _get_service_cache_version_param(self):
+        return f'palletways.service_cache_version.{self.id}'
+    
+    def _get_service_memory_key(self, route_key):
+        """
+        Clave de la LRU en memoria para `route_key`.
+        ✅ CORRECCIÓN v2.6.0: Incluye la versión de caché del cliente
+        (ir.config_parameter, cacheado y con invalidación entre workers),
+        así vaciar la caché en un worker deja obsoletas las copias de los demás.
+        """
+        version = self.env['ir.config_parameter'].sudo().get_param(
+            self._get_service_cache_version_param(), '0')
+        return (self._get_http_session_key(), version, route_key)
+    
+    def _clear_service_cache(self):
+        self.env['palletways.service.cache']._invalidate(self)
+        ICP = self.env['ir.config_parameter'].sudo()
+        for record in self:
+            param = record._get_service_cache_version_param()
+            ICP.set_param(param, str(int(ICP.get_param(param, '0')) + 1))
+            palletways_http.forget_services(record._get_http_session_key())
+    
+    def action_clear_service_cache(self):
+        """Botón: olvidar los servicios cacheados para forzar nueva consulta a la API"""
+        self._clear_service_cache()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Caché de Servicios',
+                'message': 'Caché de servicios vaciada',
+                'type': 'success',
+            },
+        }
+    
+    def _compute_rate_limit_tokens(self):
+        for record in self:
+            if not record.id or not isinstance(record.id, int):
+                record.rate_limit_tokens = record.rate_limit_per_minute
+            else:
+                record.rate_limit_tokens = record._peek_rate_limit()
+    
+    def _peek_rate_limit(self):
+        """Nivel actual del token bucket (para monitorización)"""
+        capacity = self.rate_limit_per_minute or 100
+        if self.rate_limit_backend == 'database':
+            return self.env['palletways.rate.limit']._take_token(
+                self.env.cr.dbname, self.id, capacity, 60.0, consume=False)[1]
+        return palletways_http.get_bucket(self._get_http_session_key(), capacity, 60.0).level
+    
+    def _take_rate_token(self):
+        """Consumir un token; devuelve 0 o los segundos a esperar"""
+        capacity = self.rate_limit_per_minute or 100
+        if self.rate_limit_backend == 'database':
+            return self.env['palletways.rate.limit']._take_token(
+                self.env.cr.dbname, self.id, capacity, 60.0)[0]
+        return palletways_http.get_bucket(self._get_http_session_key(), capacity, 60.0).take()
+    
     def _check_rate_limit(self):
-        """Verificar límite de 100 peticiones por minuto"""
-        now = fields.Datetime.now()
-        
-        if self.last_request_time:
-            time_diff = (now - self.last_request_time).total_seconds()
-            
-            if time_diff >= 60:
-                self.request_count = 0
-            elif self.request_count >= 100:
+        """
+        ✅ CORRECCIÓN v2.6.0:
+        Token bucket de rate_limit_per_minute peticiones/minuto
+        No escribe en palletways.api.client: espera a que haya token
+        y solo aborta si se supera rate_limit_max_wait
+        """
+        self.ensure_one()
+        deadline = time.monotonic() + max(self.rate_limit_max_wait, 0)
+        while True:
+            wait = self._take_rate_token()
+            if not wait:
+                return
+            if time.monotonic() + wait > deadline:
                 raise UserError(
-                    "Límite de API alcanzado (100 peticiones/minuto). "
+                    f"Límite de API alcanzado ({self.rate_limit_per_minute} peticiones/minuto). "
                     "Espere antes de realizar más peticiones."
                 )
+            _logger.debug(f"Rate limit Palletways: esperando {wait:.2f}s")
+            time.sleep(wait)
+    
+    def _call_concurrent(self, method_name, args_list, max_workers=4):
+        """
+        ✅ NUEVO v2.6.0:
+        Ejecutar `method_name(*args)` de este cliente para cada elemento de
+        `args_list` en un pool de hilos. Cada hilo usa su propio cursor y
+        todos comparten el token bucket, así que el rate limit se respeta.
+
+        Devuelve una lista alineada con `args_list` de tuplas (resultado, error).
+        """
+        self.ensure_one()
+        if not args_list:
+            return []
+        
+        dbname = self.env.cr.dbname
+        uid = self.env.uid
+        context = dict(self.env.context)
+        client_id = self.id
+        results = [None] * len(args_list)
+        workers = max(1, min(max_workers, len(args_list)))
+        
+        def worker(indexes):
+            threading.current_thread().dbname = dbname
+            with Registry(dbname).cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                client = env['palletways.api.client'].browse(client_id)
+                for index in indexes:
+                    try:
+                        results[index] = (getattr(client, method_name)(*args_list[index]), None)
+                    except Exception as e:
+                        results[index] = (None, e)
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(worker, range(start, len(args_list), workers))
+                for start in range(workers)
+            ]
+            for future in futures:
+                future.result()
         
-        self.write({
-            'last_request_time': now,
-            'request_count': self.request_count + 1
-        })
+        return results
     
-    def _get_mapped_endpoint(self, endpoint):
+    def _get_mapped_endpoint(self, endpoint, endpoint_type=None):
         """
         ✅ CORRECCIÓN CRÍTICA v2.1.2:
         Mapear nombres de métodos según tipo de endpoint
@@ -105,26 +283,41 @@ class PalletwaysApiClient(models.Model):
             'getTrackingNotes': 'getTrackingNotes',
         }
         
-        if self.api_endpoint_type == 'portal' and endpoint in portal_method_mapping:
+        if (endpoint_type or self.api_endpoint_type) == 'portal' and endpoint in portal_method_mapping:
             mapped = portal_method_mapping[endpoint]
-            _logger.info(f"Portal API: Mapeando método '{endpoint}' → '{mapped}'")
+            _logger.debug(f"Portal API: Mapeando método '{endpoint}' → '{mapped}'")
             return mapped
         
         return endpoint
     
-    def _make_api_request(self, method, endpoint, data=None, params=None, timeout=30, _retry_with_portal=True):
+    def _make_api_request(self, method, endpoint, data=None, params=None, timeout=30,
+                          _retry_with_portal=True, endpoint_type=None, stream=False, normalized=False):
         """
-        ✅ CORRECCIÓN v2.5.0:
+        ✅ CORRECCIÓN v2.6.0:
         Realizar petición HTTP a la API de Palletways
         Respetar configuración del usuario - NO forzar cambio de endpoint
+        
+        `endpoint_type` fuerza 'api' o 'portal' solo para esta petición. Si no se
+        indica, se usa la ruta aprendida para el método (ver fallback 404) o el
+        tipo configurado en el cliente
+        
+        Con `stream=True` no se descarga ni se parsea el cuerpo: se devuelve el
+        objeto response de requests para leerlo en streaming (ver _iter_api_records)
+        Con `normalized=True` devuelve un PwResponse (palletways_normalizer) en
+        lugar del diccionario completo
         """
         self._check_rate_limit()
         
-        mapped_endpoint = self._get_mapped_endpoint(endpoint)
+        session_key = self._get_http_session_key()
+        method_name = palletways_http.route_method(endpoint)
+        if not endpoint_type:
+            endpoint_type = palletways_http.get_route(session_key, method_name) or self.api_endpoint_type
+        
+        mapped_endpoint = self._get_mapped_endpoint(endpoint, endpoint_type)
         
         # ✅ CORRECCIÓN v2.5.0: Respetar configuración del usuario
         # NO forzar Portal automáticamente
-        use_portal = (self.api_endpoint_type == 'portal')
+        use_portal = (endpoint_type == 'portal')
         
         # Lista de métodos que SOLO funcionan en Portal API
         portal_exclusive_methods = [
@@ -153,10 +346,7 @@ class PalletwaysApiClient(models.Model):
                     )
                     break
         
-        if use_portal:
-            base_url = 'https://portal.palletways.com/api/'
-        else:
-            base_url = 'https://api.palletways.com/'
+        base_url = palletways_http.ENDPOINT_BASE_URLS[endpoint_type]
         
         url = f"{base_url.rstrip('/')}/{mapped_endpoint}"
         
@@ -168,19 +358,25 @@ class PalletwaysApiClient(models.Model):
             base_params['outputformat'] = 'xml'
         
         try:
-            safe_params = base_params.copy()
-            if 'apikey' in safe_params:
-                safe_params['apikey'] = f"{safe_params['apikey'][:10]}..."
-            if 'data' in safe_params:
-                safe_params['data'] = f"{safe_params['data'][:50]}..."
+            # ✅ CORRECCIÓN v2.6.0: Diagnóstico por petición solo en DEBUG
+            debug = _logger.isEnabledFor(logging.DEBUG)
+            if debug:
+                safe_params = base_params.copy()
+                if 'apikey' in safe_params:
+                    safe_params['apikey'] = f"{safe_params['apikey'][:10]}..."
+                if 'data' in safe_params:
+                    safe_params['data'] = f"{safe_params['data'][:50]}..."
+                
+                _logger.debug(f"Palletways API {method} {url}")
+                _logger.debug(f"Endpoint usado: {'PORTAL' if use_portal else 'API GLOBAL'}")
+                _logger.debug(f"Método mapeado: {mapped_endpoint}")
+                _logger.debug(f"Parámetros: {safe_params}")
             
-            _logger.info(f"Palletways API {method} {url}")
-            _logger.info(f"Endpoint usado: {'PORTAL' if use_portal else 'API GLOBAL'}")
-            _logger.info(f"Método mapeado: {mapped_endpoint}")
-            _logger.info(f"Parámetros: {safe_params}")
+            session = self._get_http_session()
+            http_timeout = palletways_http.split_timeout(timeout)
             
             if method.upper() == 'GET':
-                response = requests.get(url, params=base_params, timeout=timeout)
+                request_kwargs = {'params': base_params}
                 
             elif method.upper() == 'POST':
                 headers = {}
@@ -195,76 +391,90 @@ class PalletwaysApiClient(models.Model):
                         else:
                             data_bytes = data
                         
-                        _logger.info(f"XML original length: {len(data)} chars")
-                        _logger.info(f"XML encoded length: {len(data_bytes)} bytes")
-                        _logger.info(f"XML inicio: {data[:200]}")
-                        _logger.info(f"XML final: {data[-200:]}")
+                        if debug:
+                            _logger.debug(f"XML original length: {len(data)} chars")
+                            _logger.debug(f"XML encoded length: {len(data_bytes)} bytes")
+                            _logger.debug(f"XML inicio: {data[:200]}")
+                            _logger.debug(f"XML final: {data[-200:]}")
                         
-                        _logger.info("="*80)
-                        _logger.info("VERIFICACIÓN FINAL PRE-ENVÍO:")
-                        _logger.info(f"URL: {url}")
-                        _logger.info(f"Params: {safe_params}")
-                        _logger.info(f"Headers: {headers}")
-                        _logger.info(f"Body size: {len(data_bytes)} bytes")
-                        _logger.info(f"Body type: {type(data_bytes)}")
+                            _logger.debug("="*80)
+                            _logger.debug("VERIFICACIÓN FINAL PRE-ENVÍO:")
+                            _logger.debug(f"URL: {url}")
+                            _logger.debug(f"Params: {safe_params}")
+                            _logger.debug(f"Headers: {headers}")
+                            _logger.debug(f"Body size: {len(data_bytes)} bytes")
+                            _logger.debug(f"Body type: {type(data_bytes)}")
                         
-                        try:
-                            body_preview = data_bytes.decode('utf-8')
-                            _logger.info(f"Body preview (primeros 500 chars):")
-                            _logger.info(body_preview[:500])
-                            _logger.info(f"Body preview (últimos 500 chars):")
-                            _logger.info(body_preview[-500:])
+                            try:
+                                body_preview = data_bytes.decode('utf-8')
+                                _logger.debug(f"Body preview (primeros 500 chars):")
+                                _logger.debug(body_preview[:500])
+                                _logger.debug(f"Body preview (últimos 500 chars):")
+                                _logger.debug(body_preview[-500:])
                             
-                            if not body_preview.strip().endswith('</Manifest>'):
-                                _logger.error("❌ ERROR: XML INCOMPLETO - No termina con </Manifest>")
-                                raise UserError("XML del manifest está incompleto")
+                                if not body_preview.strip().endswith('</Manifest>'):
+                                    _logger.error("❌ ERROR: XML INCOMPLETO - No termina con </Manifest>")
+                                    raise UserError("XML del manifest está incompleto")
                                 
-                        except Exception as e:
-                            _logger.error(f"Error verificando body: {e}")
+                            except Exception as e:
+                                _logger.error(f"Error verificando body: {e}")
                         
-                        _logger.info("="*80)
+                            _logger.debug("="*80)
                     else:
                         headers['Content-Type'] = 'application/json'
                         data_bytes = data if isinstance(data, bytes) else data.encode('utf-8')
                     
-                    _logger.info(f"POST data size: {len(data_bytes)} bytes")
-                    _logger.info(f"Content-Type: {headers['Content-Type']}")
-                    _logger.debug(f"POST body preview: {data_bytes[:500]}")
+                    if debug:
+                        _logger.debug(f"POST data size: {len(data_bytes)} bytes")
+                        _logger.debug(f"Content-Type: {headers['Content-Type']}")
+                        _logger.debug(f"POST body preview: {data_bytes[:500]}")
                     
-                    response = requests.post(
-                        url, 
-                        params=base_params,
-                        data=data_bytes,
-                        headers=headers,
-                        timeout=timeout
-                    )
+                    request_kwargs = {
+                        'params': base_params,
+                        'data': data_bytes,
+                        'headers': headers,
+                    }
                 else:
-                    response = requests.post(
-                        url,
-                        params=base_params,
-                        timeout=timeout
-                    )
+                    request_kwargs = {'params': base_params}
             else:
                 raise ValueError(f"Método HTTP no soportado: {method}")
             
-            _logger.info(f"Palletways API Response: {response.status_code}")
-            _logger.info(f"Response Content-Type: {response.headers.get('content-type', 'unknown')}")
-            _logger.info(f"Response preview: {response.text[:500]}")
+            if stream:
+                request_kwargs['stream'] = True
+            
+            response = self._send_with_retry(
+                session, method.upper(), url, mapped_endpoint, request_kwargs, http_timeout
+            )
+            
+            if debug:
+                _logger.debug(f"Palletways API Response: {response.status_code}")
+                _logger.debug(f"Response Content-Type: {response.headers.get('content-type', 'unknown')}")
+                if not stream:
+                    _logger.debug(f"Response preview: {response.text[:500]}")
             
             if response.status_code not in [200, 201]:
                 _logger.error(f"Error HTTP {response.status_code}: {response.text}")
                 
-                if response.status_code == 404 and _retry_with_portal and not use_portal:
-                    _logger.warning(f"Método {mapped_endpoint} no disponible en API Global, intentando con Portal...")
+                # ✅ CORRECCIÓN v2.6.0: Fallback en memoria, sin crear registros
+                if response.status_code == 404 and _retry_with_portal:
+                    alternate_type = palletways_http.alternate_endpoint_type(endpoint_type)
+                    palletways_http.forget_routes(session_key, method_name)
+                    _logger.warning(
+                        f"Método {mapped_endpoint} no disponible en {endpoint_type.upper()}, "
+                        f"intentando con {alternate_type.upper()}..."
+                    )
                     try:
-                        temp_client = self.copy({'api_endpoint_type': 'portal'})
-                        result = temp_client._make_api_request(
+                        result = self._make_api_request(
                             method, endpoint, data, params, timeout, 
-                            _retry_with_portal=False
+                            _retry_with_portal=False, endpoint_type=alternate_type, stream=stream,
+                            normalized=normalized
                         )
-                        return result
                     except Exception as e:
-                        _logger.warning(f"Portal tampoco disponible: {e}")
+                        _logger.warning(f"{alternate_type.upper()} tampoco disponible: {e}")
+                    else:
+                        if alternate_type != self.api_endpoint_type:
+                            palletways_http.remember_route(session_key, method_name, alternate_type)
+                        return result
                 
                 if response.status_code == 404:
                     raise UserError(
@@ -275,16 +485,21 @@ class PalletwaysApiClient(models.Model):
                 
                 raise UserError(f"Error HTTP {response.status_code}: {response.text}")
             
+            if stream:
+                return response
+            
             content_type = response.headers.get('content-type', '').lower()
             
             # ✅ CORRECCIÓN v2.3.1: Intentar parsear como XML primero
-            if 'xml' in content_type or response.text.strip().startswith('<?xml'):
+            if 'xml' in content_type or response.content.lstrip().startswith(b'<?xml'):
                 try:
                     root = ET.fromstring(response.content)
+                    if normalized:
+                        return palletways_normalizer.normalize(root)
                     xml_dict = self._xml_to_dict(root)
                     
-                    _logger.info(f"XML parseado exitosamente")
-                    _logger.debug(f"XML dict: {json.dumps(xml_dict, indent=2, default=str)}")
+                    if debug:
+                        _logger.debug(f"XML dict: {json.dumps(xml_dict, indent=2, default=str)}")
                     
                     return xml_dict
                     
@@ -296,7 +511,8 @@ class PalletwaysApiClient(models.Model):
             # Fallback a JSON
             try:
                 json_response = response.json() if response.content else {}
-                _logger.info(f"JSON parseado exitosamente")
+                if normalized:
+                    return palletways_normalizer.normalize(json_response)
                 return json_response
             except json.JSONDecodeError:
                 if 'application/pdf' in content_type:
@@ -313,33 +529,81 @@ class PalletwaysApiClient(models.Model):
             _logger.error(f"Error API Palletways: {e}")
             raise UserError(f"Error conectando con Palletways: {e}")
     
+    def _send_with_retry(self, session, method, url, mapped_endpoint, request_kwargs, timeout):
+        """
+        ✅ NUEVO v2.6.0:
+        Enviar la petición reintentando errores transitorios con backoff
+        exponencial y jitter (retry_max_attempts, retry_backoff_base/max)
+        • Métodos de consulta: timeout, error de conexión, HTTP 429 y 5xx
+        • createConsignment/pc_psief: solo si la petición no llegó a Palletways
+          o fue rechazada con 429, para no duplicar envíos
+        Cada reintento consume un token del rate limit
+        """
+        idempotent = palletways_http.is_idempotent(mapped_endpoint)
+        max_attempts = max(self.retry_max_attempts, 1)
+        attempt = 1
+        
+        while True:
+            try:
+                response = session.request(method, url, timeout=timeout, **request_kwargs)
+            except requests.exceptions.RequestException as e:
+                if attempt >= max_attempts or not palletways_http.is_retryable_error(e, idempotent):
+                    raise
+                reason = type(e).__name__
+                delay = palletways_http.backoff_delay(attempt, self.retry_backoff_base, self.retry_backoff_max)
+            else:
+                if attempt >= max_attempts or not palletways_http.is_retryable_status(response.status_code, idempotent):
+                    return response
+                reason = f"HTTP {response.status_code}"
+                delay = palletways_http.backoff_delay(
+                    attempt, self.retry_backoff_base, self.retry_backoff_max,
+                    retry_after=response.headers.get('Retry-After'),
+                )
+                response.close()
+            
+            _logger.warning(
+                f"Palletways {mapped_endpoint}: {reason}, "
+                f"reintento {attempt}/{max_attempts - 1} en {delay:.1f}s"
+            )
+            time.sleep(delay)
+            self._check_rate_limit()
+            attempt += 1
+    
     def _xml_to_dict(self, element):
         """
         ✅ NUEVO v2.3.0:
         Convertir elemento XML a diccionario para compatibilidad
         """
-        result = {}
-        
-        if element.text and element.text.strip():
-            result['_text'] = element.text.strip()
-        
-        if element.attrib:
-            result['_attributes'] = element.attrib
-        
-        for child in element:
-            child_data = self._xml_to_dict(child)
-            
-            if child.tag in result:
-                if not isinstance(result[child.tag], list):
-                    result[child.tag] = [result[child.tag]]
-                result[child.tag].append(child_data)
-            else: 
-                result[child.tag] = child_data
-        
-        if len(result) == 1 and '_text' in result:
-            return result['_text']
-        
-        return result
+        return palletways_http.element_to_dict(element)
+    
+    def _iter_api_records(self, endpoint, record_tag='Data', params=None, timeout=30):
+        """
+        ✅ NUEVO v2.6.0:
+        GET en streaming que devuelve uno a uno los registros <Data> de la
+        respuesta (iterparse liberando cada elemento), sin cargar el XML entero
+        ni construir el diccionario completo. Para respuestas grandes.
+        """
+        response = self._make_api_request('GET', endpoint, params=params, timeout=timeout, stream=True)
+        with response:
+            content_type = response.headers.get('content-type', '').lower()
+            try:
+                if 'json' not in content_type:
+                    response.raw.decode_content = True
+                    yield from palletways_http.iter_xml_records(response.raw, record_tag)
+                    return
+                
+                # Respuesta JSON: no admite streaming; ✅ CORRECCIÓN v2.6.0: se
+                # normaliza igual que el resto (Status/Detail como lista o dict)
+                data = palletways_normalizer.normalize(
+                    response.json() if response.content else {}, record_keys=(record_tag,))
+                if data.status.code and not data.ok:
+                    raise palletways_http.ResponseStatusError(data.status.description or data.status.code)
+                yield from (record.data or {'_text': record.text} for record in data.detail if record)
+            except palletways_http.ResponseStatusError as e:
+                raise UserError(f"Error Palletways en {endpoint}: {e}")
+            except (ET.ParseError, json.JSONDecodeError) as e:
+                _logger.error(f"Error parseando respuesta de {endpoint}: {e}")
+                raise UserError(f"Error parseando respuesta de Palletways: {e}")
     
     def create_consignment(self, shipment_data):
         """
@@ -347,19 +611,37 @@ class PalletwaysApiClient(models.Model):
         Crear consignación usando XML en parámetro 'data' de la URL
         Soporta tanto API Global como Portal API
         """
+        return self.create_consignments([shipment_data])
+    
+    def create_consignments(self, shipment_data_list):
+        """
+        ✅ NUEVO v2.6.0:
+        Crear varias consignaciones con un único Manifest y una sola petición
+        Cada elemento de `shipment_data_list` genera un <Consignment>
+        """
+        debug = _logger.isEnabledFor(logging.DEBUG)
         try: 
-            _logger.info("="*80)
-            _logger.info("DIAGNÓSTICO PRE-ENVÍO:")
-            _logger.info(f"  Cliente API: {self.name}")
-            _logger.info(f"  Account Code: '{self.account_code}'")
-            _logger.info(f"  Account Code type: {type(self.account_code)}")
-            _logger.info(f"  Account Code length: {len(str(self.account_code)) if self.account_code else 0}")
-            _logger.info(f"  Test Mode: {self.test_mode}")
-            _logger.info(f"  Endpoint: {self.api_endpoint}")
-            _logger.info(f"  Endpoint Type: {self.api_endpoint_type}")
-            _logger.info("="*80)
-            
-            manifest_xml = self._build_manifest(shipment_data)
+            if debug:
+                _logger.debug("="*80)
+                _logger.debug("DIAGNÓSTICO PRE-ENVÍO:")
+                _logger.debug(f"  Cliente API: {self.name}")
+                _logger.debug(f"  Account Code: '{self.account_code}'")
+                _logger.debug(f"  Test Mode: {self.test_mode}")
+                _logger.debug(f"  Endpoint: {self.api_endpoint}")
+                _logger.debug(f"  Endpoint Type: {self.api_endpoint_type}")
+                _logger.debug(f"  Consignaciones: {len(shipment_data_list)}")
+                _logger.debug("="*80)
+            
+            manifest_xml = self._build_manifest(shipment_data_list)
+            
+            # ✅ NUEVO v2.6.0: Validación local contra XSD antes de la petición
+            if self.validate_manifest:
+                errors = palletways_manifest.validate_manifest(manifest_xml)
+                if errors:
+                    _logger.error("Manifest no válido según XSD:\n" + "\n".join(errors))
+                    raise UserError(
+                        "❌ El Manifest no cumple el esquema de Palletways:\n\n" + "\n".join(errors[:20])
+                    )
             
             commit_param = 'no' if self.test_mode else 'yes'
             
@@ -372,13 +654,10 @@ class PalletwaysApiClient(models.Model):
                 'data': manifest_xml,  # ✅ XML SIN codificar - requests lo codificará automáticamente
             }
             
-            _logger.info("="*80)
-            _logger.info("CREANDO CONSIGNACIÓN (requests codificará automáticamente)")
-            _logger.info(f"Endpoint Type: {self.api_endpoint_type}")
-            _logger.info(f"Test Mode: {self.test_mode}")
-            _logger.info(f"Commit: {commit_param}")
-            _logger.info(f"XML size: {len(manifest_xml)} caracteres")
-            _logger.info("="*80)
+            _logger.info(
+                f"createConsignment: {len(shipment_data_list)} consignaciones, "
+                f"{len(manifest_xml)} caracteres, commit={commit_param}"
+            )
             
             endpoint = 'createConsignment'
             
@@ -390,10 +669,8 @@ class PalletwaysApiClient(models.Model):
                 timeout=60
             )
             
-            _logger.info("="*80)
-            _logger.info("RESPUESTA RECIBIDA DE PALLETWAYS:")
-            _logger.info(json.dumps(response, indent=2, default=str))
-            _logger.info("="*80)
+            if debug:
+                _logger.debug(f"RESPUESTA RECIBIDA DE PALLETWAYS:\n{json.dumps(response, indent=2, default=str)}")
             
             return response
             
@@ -401,10 +678,11 @@ class PalletwaysApiClient(models.Model):
             _logger.error(f"Error creando consignación Palletways: {e}")
             raise UserError(f"Error creando consignación: {e}")
 
-    def _build_manifest(self, shipment_data):
+    def _build_manifest(self, shipment_data_list):
         """
-        ✅ CORRECCIÓN v2.5.0:
+        ✅ CORRECCIÓN v2.6.0:
         Construir manifest en formato XML según documentación oficial PDF página 3-4
+        Acepta un dict (un envío) o una lista de dicts (un <Consignment> por envío)
         ESTRUCTURA CORRECTA:
         1. Manifest (root)
         2. Date, Time, Confirm
@@ -432,179 +710,189 @@ class PalletwaysApiClient(models.Model):
         
         _logger.info(f"✓ Account Code válido: {self.account_code}")
         
-        collection_addr = shipment_data.get('collection_address')
-        delivery_addr = shipment_data.get('delivery_address')
+        if isinstance(shipment_data_list, dict):
+            shipment_data_list = [shipment_data_list]
         
-        # ✅ CORRECCIÓN v2.5.0: Construir XML con estructura CORRECTA
-        manifest = ET.Element('Manifest')
+        # ✅ CORRECCIÓN v2.6.0: Serializar en streaming (misma salida que ET.tostring)
+        # La estructura se valida al construir: cierres y elementos obligatorios
+        writer = palletways_manifest.ManifestWriter()
+        confirm_value = "no" if self.test_mode else "yes"
         
-        # 1. Date, Time, Confirm (opcionales pero recomendados)
-        ET.SubElement(manifest, 'Date').text = fields.Date.today().strftime('%Y-%m-%d')
-        ET.SubElement(manifest, 'Time').text = datetime.now().strftime('%H:%M:%S')
+        try:
+            writer.start('Manifest')
+            
+            # 1. Date, Time, Confirm (opcionales pero recomendados)
+            writer.element('Date', fields.Date.today().strftime('%Y-%m-%d'))
+            writer.element('Time', datetime.now().strftime('%H:%M:%S'))
+            writer.element('Confirm', confirm_value)
+            
+            # 2. Depot > Account > Code (⚠️ ESTRUCTURA OBLIGATORIA)
+            writer.start('Depot')
+            writer.start('Account')
+            writer.element('Code', str(self.account_code).strip(), required=True)
+            
+            # 3. Consignment (dentro de Account), uno por envío
+            for shipment_data in shipment_data_list:
+                self._write_manifest_consignment(writer, shipment_data)
+            
+            writer.end('Account')
+            writer.end('Depot')
+            writer.end('Manifest')
+            xml_string = writer.getvalue()
+        except palletways_manifest.ManifestError as e:
+            _logger.error(f"❌ ERROR CRÍTICO construyendo Manifest: {e}")
+            raise UserError(f"❌ ERROR: XML incompleto o malformado: {e}")
         
-        confirm_value = "no" if self.test_mode else "yes"
-        ET.SubElement(manifest, 'Confirm').text = confirm_value
+        _logger.info(
+            f"Manifest construido: {len(xml_string)} caracteres, Account Code {self.account_code}, "
+            f"Confirm {confirm_value}, {len(shipment_data_list)} consignaciones"
+        )
+        if _logger.isEnabledFor(logging.DEBUG):
+            _logger.debug(f"XML COMPLETO:\n{xml_string}")
         
-        # 2. Depot > Account > Code (⚠️ ESTRUCTURA OBLIGATORIA)
-        depot = ET.SubElement(manifest, 'Depot')
-        account = ET.SubElement(depot, 'Account')
+        return xml_string
+    
+    def _write_address(self, writer, address_type, partner):
+        """Escribir un bloque <Address> del tipo indicado"""
+        writer.start('Address')
+        writer.element('Type', address_type)
+        writer.element('ContactName', partner.name or '')
+        writer.element('Telephone', partner.phone or partner.mobile or '')
+        if partner.fax:
+            writer.element('Fax', partner.fax)
+        writer.element('CompanyName', partner.commercial_company_name or partner.name or '')
         
-        # ⚠️ CRÍTICO: El elemento <Code> es OBLIGATORIO
-        if not self.account_code:
-            raise UserError(
-                "❌ ERROR CRÍTICO: No hay código de cliente configurado.\n\n"
-                "El campo 'Código Cliente' es OBLIGATORIO según Palletways.\n\n"
-                "Solución:\n"
-                "1. Ir a: Inventario > Palletways > Configuración > Clientes API\n"
-                "2. Editar el cliente API\n"
-                "3. Completar el campo 'Código Cliente' (ej: 434481 o D518-1-DAYO)\n"
-                "4. Guardar y volver a intentar"
-            )
+        if partner.street:
+            writer.element('Line', partner.street)
+        if partner.street2:
+            writer.element('Line', partner.street2)
         
-        code_element = ET.SubElement(account, 'Code')
-        code_element.text = str(self.account_code).strip()
-        _logger.info(f"✓ <Code> añadido con valor: {self.account_code}")
+        writer.element('Town', partner.city or '')
+        writer.element('County', partner.state_id.name if partner.state_id else '')
+        writer.element('PostCode', partner.zip or '')
+        writer.element('Country', partner.country_id.code if partner.country_id else 'ES')
+        writer.end('Address')
+    
+    def _write_manifest_consignment(self, writer, shipment_data):
+        """Escribir un elemento <Consignment> dentro del <Account> abierto"""
+        collection_addr = shipment_data.get('collection_address')
+        delivery_addr = shipment_data.get('delivery_address')
         
-        # 3. Consignment (dentro de Account)
-        consignment = ET.SubElement(account, 'Consignment')
+        writer.start('Consignment')
         
         # 4. Datos del consignment
-        ET.SubElement(consignment, 'Type').text = shipment_data.get('type', 'D')
-        ET.SubElement(consignment, 'ImportID').text = shipment_data.get('import_id', '')
-        ET.SubElement(consignment, 'Number').text = shipment_data.get('reference', '')
-        ET.SubElement(consignment, 'Reference').text = shipment_data.get('client_reference', '')
-        ET.SubElement(consignment, 'Lifts').text = str(shipment_data.get('pallets', 1))
-        ET.SubElement(consignment, 'Weight').text = str(int(shipment_data.get('weight', 1)))
-        
-        ET.SubElement(consignment, 'Handball').text = "yes" if shipment_data.get('handball') else "no"
-        ET.SubElement(consignment, 'TailLift').text = "yes" if shipment_data.get('taillift') else "no"
-        ET.SubElement(consignment, 'Classification').text = shipment_data.get('classification', 'B2B')
-        ET.SubElement(consignment, 'BookInRequest').text = "yes" if shipment_data.get('book_in_request') else "no"
+        writer.element('Type', shipment_data.get('type', 'D'))
+        writer.element('ImportID', shipment_data.get('import_id', ''))
+        writer.element('Number', shipment_data.get('reference', ''))
+        writer.element('Reference', shipment_data.get('client_reference', ''))
+        writer.element('Lifts', str(shipment_data.get('pallets', 1)))
+        writer.element('Weight', str(int(shipment_data.get('weight', 1))))
+        
+        writer.element('Handball', "yes" if shipment_data.get('handball') else "no")
+        writer.element('TailLift', "yes" if shipment_data.get('taillift') else "no")
+        writer.element('Classification', shipment_data.get('classification', 'B2B'))
+        writer.element('BookInRequest', "yes" if shipment_data.get('book_in_request') else "no")
         
         if shipment_data.get('book_in_request'):
-            ET.SubElement(consignment, 'BookInContactName').text = shipment_data.get('contact_name', '')
-            ET.SubElement(consignment, 'BookInContactPhone').text = shipment_data.get('contact_phone', '')
-            ET.SubElement(consignment, 'BookInInstructions').text = shipment_data.get('book_in_instructions', '')
+            writer.element('BookInContactName', shipment_data.get('contact_name', ''))
+            writer.element('BookInContactPhone', shipment_data.get('contact_phone', ''))
+            writer.element('BookInInstructions', shipment_data.get('book_in_instructions', ''))
         
-        ET.SubElement(consignment, 'ManifestNote').text = shipment_data.get('manifest_note', '')
-        ET.SubElement(consignment, 'CollectionDate').text = shipment_data.get('collection_date', '')
-        ET.SubElement(consignment, 'DeliveryDate').text = shipment_data.get('delivery_date', '')
+        writer.element('ManifestNote', shipment_data.get('manifest_note', ''))
+        writer.element('CollectionDate', shipment_data.get('collection_date', ''))
+        writer.element('DeliveryDate', shipment_data.get('delivery_date', ''))
         
         # 5. Service
-        service = ET.SubElement(consignment, 'Service')
-        ET.SubElement(service, 'Type').text = 'Delivery'
-        ET.SubElement(service, 'Code').text = shipment_data.get('service_code', 'B')
-        ET.SubElement(service, 'Surcharge').text = shipment_data.get('service_code', 'B')
+        writer.start('Service')
+        writer.element('Type', 'Delivery')
+        writer.element('Code', shipment_data.get('service_code', 'B'))
+        writer.element('Surcharge', shipment_data.get('service_code', 'B'))
+        writer.end('Service')
         
         # 6. ⚠️ CRÍTICO: Address DELIVERY PRIMERO (según documentación)
         if delivery_addr:
-            address_delivery = ET.SubElement(consignment, 'Address')
-            ET.SubElement(address_delivery, 'Type').text = 'Delivery'
-            ET.SubElement(address_delivery, 'ContactName').text = delivery_addr.name or ''
-            ET.SubElement(address_delivery, 'Telephone').text = delivery_addr.phone or delivery_addr.mobile or ''
-            if delivery_addr.fax:
-                ET.SubElement(address_delivery, 'Fax').text = delivery_addr.fax
-            ET.SubElement(address_delivery, 'CompanyName').text = delivery_addr.commercial_company_name or delivery_addr.name or ''
-            
-            if delivery_addr.street:
-                ET.SubElement(address_delivery, 'Line').text = delivery_addr.street
-            if delivery_addr.street2:
-                ET.SubElement(address_delivery, 'Line').text = delivery_addr.street2
-            
-            ET.SubElement(address_delivery, 'Town').text = delivery_addr.city or ''
-            ET.SubElement(address_delivery, 'County').text = delivery_addr.state_id.name if delivery_addr.state_id else ''
-            ET.SubElement(address_delivery, 'PostCode').text = delivery_addr.zip or ''
-            ET.SubElement(address_delivery, 'Country').text = delivery_addr.country_id.code if delivery_addr.country_id else 'ES'
+            self._write_address(writer, 'Delivery', delivery_addr)
         
         # 7. ⚠️ CRÍTICO: Address COLLECTION DESPUÉS (según documentación)
         if collection_addr:
-            address_collection = ET.SubElement(consignment, 'Address')
-            ET.SubElement(address_collection, 'Type').text = 'Collection'
-            ET.SubElement(address_collection, 'ContactName').text = collection_addr.name or ''
-            ET.SubElement(address_collection, 'Telephone').text = collection_addr.phone or collection_addr.mobile or ''
-            if collection_addr.fax:
-                ET.SubElement(address_collection, 'Fax').text = collection_addr.fax
-            ET.SubElement(address_collection, 'CompanyName').text = collection_addr.commercial_company_name or collection_addr.name or ''
-            
-            if collection_addr.street:
-                ET.SubElement(address_collection, 'Line').text = collection_addr.street
-            if collection_addr.street2:
-                ET.SubElement(address_collection, 'Line').text = collection_addr.street2
-            
-            ET.SubElement(address_collection, 'Town').text = collection_addr.city or ''
-            ET.SubElement(address_collection, 'County').text = collection_addr.state_id.name if collection_addr.state_id else ''
-            ET.SubElement(address_collection, 'PostCode').text = collection_addr.zip or ''
-            ET.SubElement(address_collection, 'Country').text = collection_addr.country_id.code if collection_addr.country_id else 'ES'
+            self._write_address(writer, 'Collection', collection_addr)
         
         # 8. BillUnit
-        bill_unit = ET.SubElement(consignment, 'BillUnit')
-        ET.SubElement(bill_unit, 'Type').text = shipment_data.get('bill_unit_type', 'FP')
-        ET.SubElement(bill_unit, 'Amount').text = str(shipment_data.get('bill_unit_amount', 1))
+        writer.start('BillUnit')
+        writer.element('Type', shipment_data.get('bill_unit_type', 'FP'))
+        writer.element('Amount', str(shipment_data.get('bill_unit_amount', 1)))
+        writer.end('BillUnit')
         
         # 9. NotificationSet (si existe)
         if shipment_data.get('notification_emails'):
-            notification_set = ET.SubElement(consignment, 'NotificationSet')
-            ET.SubElement(notification_set, 'SysGroup').text = '1'
-            ET.SubElement(notification_set, 'SysGroup').text = '3'
-            ET.SubElement(notification_set, 'Email').text = shipment_data.get('notification_emails')
-        
-        # ✅ CORRECCIÓN v2.5.0: Generar XML con declaración correcta
-        xml_bytes = ET.tostring(manifest, encoding='utf-8', xml_declaration=True)
-        xml_string = xml_bytes.decode('utf-8')
-        
-        _logger.info("="*80)
-        _logger.info("MANIFEST XML CONSTRUIDO:")
-        _logger.info(f"  Longitud total: {len(xml_string)} caracteres")
-        _logger.info(f"  Account Code: {self.account_code}")
-        _logger.info(f"  Confirm: {confirm_value}")
-        _logger.info(f"  Type: {shipment_data.get('type', 'D')}")
-        _logger.info("="*80)
-        
-        # ✅ VERIFICACIÓN CRÍTICA: Verificar que <Code> está presente
-        if f'<Code>{self.account_code}</Code>' not in xml_string:
-            _logger.error("❌ ERROR CRÍTICO: El XML no contiene <Code> con el account_code")
-            _logger.error(f"XML generado:\n{xml_string}")
-            raise UserError(
-                "❌ ERROR INTERNO: El XML no contiene el elemento <Code> obligatorio.\n"
-                "Contacte con soporte técnico."
-            )
+            writer.start('NotificationSet')
+            writer.element('SysGroup', '1')
+            writer.element('SysGroup', '3')
+            writer.element('Email', shipment_data.get('notification_emails'))
+            writer.end('NotificationSet')
         
-        # ✅ VERIFICACIÓN: Verificar que termina correctamente
-        if not xml_string.strip().endswith('</Manifest>'):
-            _logger.error("❌ ERROR CRÍTICO: El XML no termina con </Manifest>")
-            raise UserError("❌ ERROR: XML incompleto o malformado")
-        
-        _logger.info("XML COMPLETO:")
-        _logger.info(xml_string)
-        _logger.info("="*80)
-        
-        return xml_string
+        writer.end('Consignment')
     
-    def get_available_services(self, origin_country, origin_postal, destination_country, destination_postal, con_type='D'):
+    def get_available_services(self, origin_country, origin_postal, destination_country, destination_postal,
+                               con_type='D', use_cache=True):
         """
         Obtener servicios disponibles según documentación oficial página 13
+        
+        ✅ NUEVO v2.6.0: Caché por ruta, primero en memoria (LRU del worker) y
+        después en palletways.service.cache, con vigencia service_cache_ttl
         """
+        self.ensure_one()
+        cache_model = self.env['palletways.service.cache']
+        route_key = cache_model._route_key(
+            con_type, origin_country, origin_postal, destination_country, destination_postal)
+        memory_key = self._get_service_memory_key(route_key)
+        
+        if use_cache:
+            services = self._get_cached_services(
+                origin_country, origin_postal, destination_country, destination_postal, con_type)
+            if services is not None:
+                return services
+        
         try:
             endpoint = f"availableServices/{con_type}/{origin_country}/{origin_postal}/{destination_country}/{destination_postal}"
             
-            response = self._make_api_request('GET', endpoint)
+            response = self._make_api_request('GET', endpoint, normalized=True)
             
-            if response.get('Status', {}).get('Code') == 'OK':
-                detail = response.get('Detail', {})
-                services = detail.get('Data', [])
+            if response.ok:
+                services = [record.data for record in response.detail if record.data]
                 
-                if isinstance(services, dict):
-                    services = [services]
+                if self.service_cache_ttl > 0:
+                    cache_model._store(self, route_key, services, self.service_cache_ttl)
+                    palletways_http.service_cache.put(memory_key, services, self.service_cache_ttl * 3600)
                 
-                return services
+                return list(services)
             else:
-                error_msg = response.get('Status', {}).get('Description', 'Error desconocido')
+                error_msg = response.status.description or 'Error desconocido'
                 raise UserError(f"Error obteniendo servicios: {error_msg}")
                 
         except Exception as e:
             _logger.error(f"Error obteniendo servicios disponibles: {e}")
             raise UserError(f"Error obteniendo servicios: {e}")
     
+    def _get_cached_services(self, origin_country, origin_postal, destination_country, destination_postal,
+                             con_type='D'):
+        """Servicios de la ruta desde la caché, sin llamar a la API (None si no hay datos vigentes)"""
+        self.ensure_one()
+        if self.service_cache_ttl <= 0:
+            return None
+        cache_model = self.env['palletways.service.cache']
+        route_key = cache_model._route_key(
+            con_type, origin_country, origin_postal, destination_country, destination_postal)
+        memory_key = self._get_service_memory_key(route_key)
+        
+        services = palletways_http.service_cache.get(memory_key)
+        if services is None:
+            services, remaining = cache_model._lookup(self, route_key)
+            if services is None:
+                return None
+            palletways_http.service_cache.put(memory_key, services, remaining)
+        return list(services)
+    
     def get_consignment_status(self, tracking_id):
         """
         Obtener estado de consignación según documentación oficial página 9
@@ -612,7 +900,7 @@ class PalletwaysApiClient(models.Model):
         try:
             endpoint = f"getConsignment/{tracking_id}"
             
-            response = self._make_api_request('GET', endpoint)
+            response = self._make_api_request('GET', endpoint, normalized=True)
             
             return response
             
@@ -671,6 +959,28 @@ class PalletwaysApiClient(models.Model):
             _logger.error(f"Error obteniendo notas {tracking_id}: {e}")
             raise UserError(f"Error obteniendo notas: {e}")
     
+    def iter_notes(self, tracking_id):
+        """Notas del envío en streaming, un diccionario por <Data>"""
+        return self._iter_api_records(f"getNotes/trackingId/{tracking_id}")
+    
+    def get_notes_since(self, tracking_id, since=None):
+        """
+        ✅ NUEVO v2.6.0:
+        Notas con fecha igual o posterior a `since` (marca de agua del envío)
+        como lista de (fecha, texto); las anteriores se descartan mientras se
+        lee la respuesta. Las notas sin fecha reconocible se devuelven siempre.
+        """
+        notes = []
+        for note in self.iter_notes(tracking_id):
+            text = note.get('NoteText')
+            if not text:
+                continue
+            note_at = palletways_shipment_note.parse_note_datetime(note.get('NoteDate'), note.get('NoteTime'))
+            if since and note_at and note_at < since:
+                continue
+            notes.append((note_at, text))
+        return notes
+    
     def action_test_connection(self):
         """
         ✅ CORRECCIÓN v2.5.0:
@@ -681,13 +991,17 @@ class PalletwaysApiClient(models.Model):
         try:
             _logger.info(f"Probando endpoint configurado: {self.api_endpoint}")
             
+            # Tipo configurado explícito: el diagnóstico no debe pasar por la
+            # ruta aprendida (fallback 404), que podría ocultar un endpoint roto
             if self.api_endpoint_type == 'portal':
-                response = self._make_api_request('GET', 'version', _retry_with_portal=False)
+                response = self._make_api_request(
+                    'GET', 'version', _retry_with_portal=False, endpoint_type=self.api_endpoint_type)
             else:
                 response = self._make_api_request(
                     'GET', 
                     'availableServices/D/ES/28001/ES/28002',
-                    _retry_with_portal=False
+                    _retry_with_portal=False,
+                    endpoint_type=self.api_endpoint_type
                 )
             
             if response:
@@ -699,21 +1013,21 @@ class PalletwaysApiClient(models.Model):
             error_msg = str(e)[:150]
             messages.append(f"✗ Error en {self.api_endpoint_type.upper()}: {error_msg}")
         
-        other_type = 'portal' if self.api_endpoint_type == 'api' else 'api'
-        other_url = 'https://portal.palletways.com/api/' if other_type == 'portal' else 'https://api.palletways.com/'
+        other_type = palletways_http.alternate_endpoint_type(self.api_endpoint_type)
+        other_url = palletways_http.ENDPOINT_BASE_URLS[other_type]
         
         try:
             _logger.info(f"Probando endpoint alternativo: {other_url}")
             
-            temp_client = self.copy({'api_endpoint_type': other_type})
-            
             if other_type == 'portal':
-                response = temp_client._make_api_request('GET', 'version', _retry_with_portal=False)
+                response = self._make_api_request(
+                    'GET', 'version', _retry_with_portal=False, endpoint_type=other_type)
             else:
-                response = temp_client._make_api_request(
+                response = self._make_api_request(
                     'GET', 
                     'availableServices/D/ES/28001/ES/28002',
-                    _retry_with_portal=False
+                    _retry_with_portal=False,
+                    endpoint_type=other_type
                 )
             
             if response:
@@ -0,0 +1,170 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+# Reintentos con espera exponencial: 1, 2, 4, 8, 16... minutos (máx. 2 horas)
+JOB_MAX_ATTEMPTS = 8
+JOB_BACKOFF_BASE = 1
+JOB_BACKOFF_MAX = 120
+
+
+class PalletwaysConsignmentJob(models.Model):
+    """
+    Cola persistente de createConsignment.
+    Con envío asíncrono, validar el albarán solo encola un trabajo; el cron
+    lo envía a Palletways con reintentos, sin bloquear al usuario del muelle.
+    """
+    _name = 'palletways.consignment.job'
+    _description = 'Trabajo de Envío Palletways'
+    _order = 'id desc'
+    _rec_name = 'picking_id'
+
+    picking_id = fields.Many2one('stock.picking', string='Albarán',
+                                 required=True, ondelete='cascade', index=True)
+    carrier_id = fields.Many2one('delivery.carrier', string='Transportista', required=True)
+    company_id = fields.Many2one('res.company', related='picking_id.company_id', store=True)
+    state = fields.Selection([
+        ('pending', 'Pendiente'),
+        ('sent', 'Enviado'),
+        ('failed', 'Fallido'),
+    ], string='Estado', default='pending', required=True, index=True)
+    attempts = fields.Integer('Intentos', default=0)
+    next_attempt_at = fields.Datetime('Próximo Intento', default=lambda self: fields.Datetime.now())
+    last_error = fields.Text('Último Error')
+    shipment_id = fields.Many2one('palletways.shipment', string='Envío Palletways', readonly=True)
+    tracking_id = fields.Char(related='shipment_id.tracking_id', string='Tracking ID')
+
+    @api.model
+    def _enqueue(self, pickings):
+        """Encolar los albaranes que aún no tienen envío ni trabajo activo"""
+        existing = self.search([
+            ('picking_id', 'in', pickings.ids),
+            ('state', 'in', ('pending', 'sent')),
+        ]).mapped('picking_id')
+        to_enqueue = pickings.filtered(lambda p: not p.palletways_shipment_id) - existing
+
+        jobs = self.create([{
+            'picking_id': picking.id,
+            'carrier_id': picking.carrier_id.id,
+        } for picking in to_enqueue])
+
+        for job in jobs:
+            job.picking_id.message_post(
+                body="⏳ Envío Palletways encolado. Se creará en segundo plano.",
+                message_type='comment'
+            )
+        return jobs
+
+    @api.model
+    def cron_process_jobs(self):
+        """
+        Cron: enviar los trabajos pendientes cuyo próximo intento ha vencido
+        Los trabajos de un mismo transportista se envían juntos, un Manifest por lote
+        """
+        batch_size = int(self.env['ir.config_parameter'].sudo().get_param(
+            'palletways.consignment_job_batch_size', 100))
+
+        jobs = self.search([
+            ('state', '=', 'pending'),
+            ('next_attempt_at', '<=', fields.Datetime.now()),
+        ], order='next_attempt_at, id', limit=batch_size)
+
+        _logger.info(f"Procesando {len(jobs)} trabajos de envío Palletways")
+
+        jobs_by_carrier = defaultdict(lambda: self.browse())
+        for job in jobs:
+            jobs_by_carrier[job.carrier_id] |= job
+
+        for carrier, carrier_jobs in jobs_by_carrier.items():
+            carrier_jobs._process_batch(carrier)
+            self.env.cr.commit()
+
+        return True
+
+    def _process_batch(self, carrier):
+        """Enviar juntos los trabajos de `carrier` y registrar el resultado de cada uno"""
+        already_sent = self.filtered(lambda j: j.picking_id.palletways_shipment_id)
+        for job in already_sent:
+            job._mark_sent()
+
+        to_send = self - already_sent
+        if not to_send:
+            return
+
+        # Sin savepoint: lo que Palletways ya ha reservado debe quedar registrado
+        # aunque falle algo después; _palletways_send_shipping_batch solo marca
+        # como error sin resultado los albaranes que no llegaron a reservarse
+        try:
+            outcomes = carrier._palletways_send_shipping_batch(to_send.mapped('picking_id'))
+        except Exception as e:
+            for job in to_send:
+                if job.picking_id.palletways_shipment_id:
+                    job._mark_sent()
+                else:
+                    job._register_failure(e)
+            return
+
+        for job in to_send:
+            result, error = outcomes.get(job.picking_id.id, (None, "Sin resultado"))
+            if result and error:
+                job._mark_needs_review(error)
+            elif error:
+                job._register_failure(error)
+            else:
+                job._mark_sent()
+
+    def _mark_sent(self):
+        self.write({
+            'state': 'sent',
+            'shipment_id': self.picking_id.palletways_shipment_id.id,
+            'last_error': False,
+        })
+
+    def _mark_needs_review(self, error):
+        """Reservado en Palletways pero no registrado: sin reintento automático"""
+        _logger.error(f"Trabajo Palletways {self.id} ({self.picking_id.name}) requiere revisión: {error}")
+        self.write({
+            'state': 'failed',
+            'attempts': self.attempts + 1,
+            'last_error': str(error),
+        })
+
+    def _register_failure(self, error):
+        """Reintento con espera exponencial hasta JOB_MAX_ATTEMPTS"""
+        attempts = self.attempts + 1
+        vals = {
+            'attempts': attempts,
+            'last_error': str(error),
+        }
+
+        if attempts >= JOB_MAX_ATTEMPTS:
+            vals['state'] = 'failed'
+            _logger.error(f"Trabajo Palletways {self.id} ({self.picking_id.name}) fallido definitivamente: {error}")
+            self.picking_id.message_post(
+                body=f"❌ No se pudo crear el envío Palletways tras {attempts} intentos:<br/>{error}",
+                message_type='comment'
+            )
+        else:
+            delay = min(JOB_BACKOFF_BASE * 2 ** (attempts - 1), JOB_BACKOFF_MAX)
+            vals['next_attempt_at'] = fields.Datetime.now() + timedelta(minutes=delay)
+            _logger.warning(
+                f"Trabajo Palletways {self.id} ({self.picking_id.name}) intento {attempts} fallido, "
+                f"reintento en {delay} min: {error}"
+            )
+
+        self.write(vals)
+
+    def action_retry(self):
+        """Volver a poner en cola los trabajos fallidos"""
+        if self.filtered(lambda j: j.state == 'sent'):
+            raise UserError("No se pueden reintentar trabajos ya enviados")
+        self.write({
+            'state': 'pending',
+            'attempts': 0,
+            'next_attempt_at': fields.Datetime.now(),
+        })
+        return True
@@ -0,0 +1,345 @@
+"""
+Capa HTTP de bajo nivel para el cliente API Palletways.
+
+Este módulo no depende del ORM: guarda estado a nivel de proceso (sesiones
+HTTP reutilizables, token buckets, rutas aprendidas, caché de servicios) y
+puede usarse desde cualquier hilo del worker.
+"""
+import logging
+import random
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+_logger = logging.getLogger(__name__)
+
+# Timeouts (segundos): conexión corta, lectura según el método llamado
+CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 30
+
+# Tamaño del pool de conexiones keep-alive por host
+POOL_CONNECTIONS = 2
+POOL_MAXSIZE = 10
+
+# URL base de cada tipo de endpoint
+ENDPOINT_BASE_URLS = {
+    'api': 'https://api.palletways.com/',
+    'portal': 'https://portal.palletways.com/api/',
+}
+
+# Vigencia (segundos) de una ruta aprendida tras un fallback
+ROUTE_TTL = 3600
+
+# Reintentos: códigos HTTP transitorios y métodos que crean datos en Palletways
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+NON_IDEMPOTENT_METHODS = frozenset({
+    'createconsignment',
+    'createconsignmenttest',
+    'pc_psief',
+    'pc_psief_test',
+    'pc_confirm',
+})
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+_routes = {}
+_routes_lock = threading.Lock()
+
+
+def _new_session():
+    """Crear sesión con adaptador afinado para api/portal.palletways.com"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=0,
+        pool_block=False,
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Connection': 'keep-alive'})
+    return session
+
+
+def get_session(key, fingerprint):
+    """
+    Obtener la sesión HTTP del registro `key` (db, id del cliente API).
+
+    `fingerprint` resume la configuración que afecta a las peticiones
+    (api_key, tipo de endpoint); si cambia, la sesión anterior se cierra
+    y se crea una nueva.
+    """
+    with _sessions_lock:
+        entry = _sessions.get(key)
+        if entry and entry[0] == fingerprint:
+            return entry[1]
+        if entry:
+            entry[1].close()
+        session = _new_session()
+        _sessions[key] = (fingerprint, session)
+        _logger.debug(f"Nueva sesión HTTP Palletways para {key}")
+        return session
+
+
+def invalidate_session(key):
+    """Cerrar y olvidar la sesión HTTP del registro `key`"""
+    with _sessions_lock:
+        entry = _sessions.pop(key, None)
+    if entry:
+        entry[1].close()
+
+
+def is_idempotent(endpoint):
+    """False para los métodos que no se pueden repetir sin riesgo de duplicar el envío"""
+    method = endpoint.split('/', 1)[0].split('?', 1)[0].lower()
+    return method not in NON_IDEMPOTENT_METHODS
+
+
+def request_never_sent(error):
+    """True si la petición falló antes de llegar al servidor (reintento seguro)"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        return isinstance(getattr(error.args[0], 'reason', None), NewConnectionError)
+    return False
+
+
+def is_retryable_error(error, idempotent):
+    """Decidir si una excepción de requests merece reintento"""
+    if not idempotent:
+        return request_never_sent(error)
+    return isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError))
+
+
+def is_retryable_status(status_code, idempotent):
+    """Decidir si un código HTTP merece reintento (429 nunca se procesó en servidor)"""
+    if not idempotent:
+        return status_code == 429
+    return status_code in RETRYABLE_STATUS_CODES
+
+
+def backoff_delay(attempt, base, cap, retry_after=None):
+    """
+    Espera antes del reintento `attempt` (1, 2, ...): backoff exponencial con
+    "full jitter". Si el servidor envía Retry-After (segundos) se respeta.
+    """
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0.0), cap)
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def split_timeout(timeout):
+    """Convertir un timeout simple en (conexión, lectura)"""
+    if isinstance(timeout, tuple):
+        return timeout
+    return (CONNECT_TIMEOUT, timeout or DEFAULT_READ_TIMEOUT)
+
+
+class TokenBucket:
+    """
+    Token bucket en memoria (por worker), seguro entre hilos.
+
+    `capacity` tokens se reponen de forma continua durante `period` segundos.
+    """
+
+    def __init__(self, capacity, period):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._stamp
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._stamp = now
+
+    def take(self):
+        """Consumir un token; devuelve 0 o los segundos a esperar para el siguiente"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    @property
+    def level(self):
+        """Tokens disponibles ahora mismo"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+def get_bucket(key, capacity, period):
+    """Obtener (o recrear si cambia la capacidad) el bucket del registro `key`"""
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None or bucket.capacity != capacity or bucket.rate != capacity / period:
+            bucket = TokenBucket(capacity, period)
+            _buckets[key] = bucket
+        return bucket
+
+
+def route_method(endpoint):
+    """Nombre del método API (sin parámetros de ruta) para la tabla de rutas"""
+    return endpoint.split('/', 1)[0]
+
+
+def alternate_endpoint_type(endpoint_type):
+    """El otro tipo de endpoint ('api' <-> 'portal')"""
+    return 'api' if endpoint_type == 'portal' else 'portal'
+
+
+def get_route(key, method):
+    """Tipo de endpoint aprendido para `method` del registro `key`, o None"""
+    with _routes_lock:
+        entry = _routes.get((key, method))
+        if not entry:
+            return None
+        if entry[1] < time.monotonic():
+            del _routes[(key, method)]
+            return None
+        return entry[0]
+
+
+def remember_route(key, method, endpoint_type, ttl=ROUTE_TTL):
+    """Recordar que `method` funciona en `endpoint_type` durante `ttl` segundos"""
+    with _routes_lock:
+        _routes[(key, method)] = (endpoint_type, time.monotonic() + ttl)
+
+
+def forget_routes(key, method=None):
+    """Olvidar las rutas aprendidas de `key` (todas o solo las de `method`)"""
+    with _routes_lock:
+        for route_key in [k for k in _routes if k[0] == key and (method is None or k[1] == method)]:
+            del _routes[route_key]
+
+
+class TTLCache:
+    """
+    Caché LRU en memoria con caducidad por entrada, segura entre hilos.
+
+    Guarda como máximo `maxsize` entradas; al superarlo descarta la usada
+    hace más tiempo.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Valor vigente de `key` o None"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, ttl):
+        """Guardar `value` durante `ttl` segundos"""
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, predicate=None):
+        """Borrar las claves que cumplen `predicate` (todas si no se indica)"""
+        with self._lock:
+            if predicate is None:
+                self._data.clear()
+                return
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+
+# Servicios disponibles por ruta: {(clave del cliente, versión, ruta): [servicios]}
+SERVICE_CACHE_SIZE = 2048
+service_cache = TTLCache(SERVICE_CACHE_SIZE)
+
+
+def forget_services(key):
+    """Olvidar los servicios cacheados en memoria del registro `key`"""
+    service_cache.discard(lambda k: k[0] == key)
+
+
+class ResponseStatusError(ValueError):
+    """La respuesta XML trae <Status><Code> distinto de OK"""
+
+
+def element_to_dict(element):
+    """Convertir un elemento XML a diccionario ('_text', '_attributes', hijos)"""
+    result = {}
+
+    if element.text and element.text.strip():
+        result['_text'] = element.text.strip()
+
+    if element.attrib:
+        result['_attributes'] = dict(element.attrib)
+
+    for child in element:
+        child_data = element_to_dict(child)
+
+        if child.tag in result:
+            if not isinstance(result[child.tag], list):
+                result[child.tag] = [result[child.tag]]
+            result[child.tag].append(child_data)
+        else:
+            result[child.tag] = child_data
+
+    if len(result) == 1 and '_text' in result:
+        return result['_text']
+
+    return result
+
+
+def iter_xml_records(source, record_tag='Data', status_tag='Status', detail_tag='Detail'):
+    """
+    Recorrer una respuesta XML en streaming y devolver cada <record_tag>
+    hijo directo de <detail_tag> como diccionario, liberando los elementos
+    ya procesados. Un registro solo con texto se devuelve como {'_text': ...}.
+
+    `source` es un fichero o flujo binario (p.ej. response.raw). Si aparece
+    un <Status> con <Code> distinto de OK se lanza ResponseStatusError.
+    """
+    stack = []
+    for event, element in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            stack.append(element)
+            continue
+        stack.pop()
+        parent = stack[-1] if stack else None
+        if element.tag == record_tag and parent is not None and parent.tag == detail_tag:
+            record = element_to_dict(element)
+            yield record if isinstance(record, dict) else {'_text': record}
+        elif element.tag == status_tag and len(stack) <= 1:
+            status = element_to_dict(element)
+            if isinstance(status, dict) and status.get('Code', 'OK') != 'OK':
+                raise ResponseStatusError(status.get('Description') or status['Code'])
+        else:
+            continue
+        # Soltar el elemento ya procesado para que no crezca el árbol en memoria
+        if parent is not None:
+            parent.remove(element)
+        element.clear()
@@ -0,0 +1,315 @@
+import hashlib
+import io
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import ExitStack
+from datetime import timedelta
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from odoo.tools import split_every
+from odoo.tools.pdf import PdfFileReader, PdfFileWriter
+
+_logger = logging.getLogger(__name__)
+
+
+class PalletwaysLabelBatch(models.Model):
+    """
+    Lote de etiquetas para imprimir de una vez (p. ej. el cierre del día).
+    Descarga en paralelo las etiquetas que faltan y las une en un único PDF.
+    Los lotes grandes se procesan en segundo plano y el progreso queda aquí.
+    """
+    _name = 'palletways.label.batch'
+    _description = 'Lote de Etiquetas Palletways'
+    _order = 'id desc'
+
+    name = fields.Char('Nombre', required=True,
+                       default=lambda self: f"Etiquetas {fields.Datetime.now():%Y-%m-%d %H:%M}")
+    shipment_ids = fields.Many2many('palletways.shipment', string='Envíos')
+    state = fields.Selection([
+        ('pending', 'Pendiente'),
+        ('running', 'En Proceso'),
+        ('done', 'Terminado'),
+        ('partial', 'Parcial'),
+        ('failed', 'Fallido'),
+    ], string='Estado', default='pending', required=True, index=True)
+    is_stale = fields.Boolean('Atascado', compute='_compute_is_stale')
+    total_count = fields.Integer('Envíos', readonly=True)
+    done_count = fields.Integer('Etiquetas Listas', readonly=True)
+    failed_count = fields.Integer('Errores', readonly=True)
+    progress = fields.Float('Progreso', compute='_compute_progress')
+    last_error = fields.Text('Errores', readonly=True)
+    merged_pdf = fields.Binary('PDF Etiquetas', attachment=True, readonly=True)
+    merged_filename = fields.Char('Nombre PDF', compute='_compute_merged_filename')
+
+    @api.depends('total_count', 'done_count', 'failed_count')
+    def _compute_progress(self):
+        for batch in self:
+            processed = batch.done_count + batch.failed_count
+            batch.progress = 100.0 * processed / batch.total_count if batch.total_count else 0.0
+
+    def _compute_is_stale(self):
+        stale = self.filtered_domain(self._stale_running_domain())
+        for batch in self:
+            batch.is_stale = batch in stale
+
+    @api.depends('name')
+    def _compute_merged_filename(self):
+        for batch in self:
+            batch.merged_filename = f"etiquetas_{batch.id or 'lote'}.pdf"
+
+    @api.model
+    def _create_for(self, shipments):
+        """Lote para `shipments`, sin los envíos TEST (no tienen etiqueta)"""
+        shipments = shipments.filtered(lambda s: not s.tracking_id.startswith(('TEST-', 'TEMP-')))
+        if not shipments:
+            raise UserError("Ninguno de los envíos seleccionados tiene etiquetas disponibles (envíos TEST)")
+        return self.create({
+            'shipment_ids': [(6, 0, shipments.ids)],
+            'total_count': len(shipments),
+        })
+
+    @api.model
+    def _stale_running_domain(self):
+        """
+        Lotes 'running' sin progreso en palletways.label_batch_timeout_minutes
+        (el worker murió o se reinició a mitad del lote)
+        """
+        minutes = int(self.env['ir.config_parameter'].sudo().get_param(
+            'palletways.label_batch_timeout_minutes', 60))
+        return [
+            ('state', '=', 'running'),
+            ('write_date', '<', fields.Datetime.now() - timedelta(minutes=minutes)),
+        ]
+
+    @api.model
+    def cron_process_batches(self):
+        """Cron: procesar los lotes pendientes, uno detrás de otro"""
+        stale = self.search(self._stale_running_domain())
+        if stale:
+            _logger.warning(f"Lotes de etiquetas atascados, se reintentan: {stale.mapped('name')}")
+            stale.write({'state': 'pending'})
+        for batch in self.search([('state', '=', 'pending')], order='id'):
+            batch._run(commit=True)
+        return True
+
+    def _run(self, commit=False):
+        """Descargar las etiquetas que faltan y generar el PDF unido"""
+        self.ensure_one()
+        self.write({'state': 'running', 'done_count': 0, 'failed_count': 0, 'last_error': False})
+        if commit:
+            self.env.cr.commit()
+
+        try:
+            with tempfile.TemporaryFile() as output:
+                errors = self._fetch_labels(commit=commit)
+                pages, skipped = self._merge_labels(output)
+                self.write({
+                    'merged_pdf': False,
+                    'done_count': self.done_count - len(skipped),
+                    'failed_count': self.failed_count + len(skipped),
+                })
+                if pages:
+                    self._attach_merged_pdf(output)
+        except Exception as e:
+            _logger.error(f"Lote de etiquetas {self.name} fallido: {e}")
+            self.write({'state': 'failed', 'last_error': str(e)})
+            if commit:
+                self.env.cr.commit()
+            return False
+
+        errors += skipped
+        if not pages:
+            state = 'failed'
+        elif errors:
+            state = 'partial'
+        else:
+            state = 'done'
+        self.write({
+            'state': state,
+            'last_error': '\n'.join(errors) or (False if pages else "No se obtuvo ninguna etiqueta"),
+        })
+        if commit:
+            self.env.cr.commit()
+        _logger.info(f"Lote de etiquetas {self.name}: {self.done_count} listas, {self.failed_count} errores")
+        return bool(pages)
+
+    def _fetch_labels(self, commit=False):
+        """
+        Descargar en paralelo (limitado por el token bucket de cada cliente)
+        las etiquetas de los envíos que aún no la tienen guardada.
+        Devuelve la lista de errores.
+        """
+        params = self.env['ir.config_parameter'].sudo()
+        chunk_size = int(params.get_param('palletways.label_batch_chunk_size', 50))
+        max_workers = int(params.get_param('palletways.label_batch_workers', 4))
+
+        cached = self.shipment_ids.filtered('label_fetched_at')
+        self.done_count = len(cached)
+
+        errors = []
+        shipments_by_client = {}
+        for shipment in self.shipment_ids - cached:
+            try:
+                client = shipment._get_api_client()
+            except UserError as e:
+                errors.append(f"{shipment.tracking_id}: {e}")
+                continue
+            shipments_by_client[client] = shipments_by_client.get(client, shipment.browse()) | shipment
+        self.failed_count = len(errors)
+
+        for client, client_shipments in shipments_by_client.items():
+            for chunk in split_every(chunk_size, client_shipments.ids, client_shipments.browse):
+                results = client._call_concurrent(
+                    'get_labels',
+                    [(shipment.tracking_id,) for shipment in chunk],
+                    max_workers=max_workers,
+                )
+                fetched = chunk.browse()
+                for shipment, (pdf_data, error) in zip(chunk, results):
+                    if error:
+                        errors.append(f"{shipment.tracking_id}: {error}")
+                        continue
+                    shipment._store_document('label_pdf', pdf_data, shipment.label_filename)
+                    fetched |= shipment
+                fetched.write({'label_fetched_at': fields.Datetime.now()})
+                self.write({
+                    'done_count': self.done_count + len(fetched),
+                    'failed_count': self.failed_count + len(chunk) - len(fetched),
+                })
+                if commit:
+                    self.env.cr.commit()
+        return errors
+
+    @api.model
+    def _open_attachment(self, attachment):
+        """Flujo de lectura del adjunto: el fichero del filestore si existe"""
+        if attachment.store_fname:
+            return open(attachment._full_path(attachment.store_fname), 'rb')
+        return io.BytesIO(attachment.raw)
+
+    def _merge_labels(self, output):
+        """
+        Unir las etiquetas guardadas en un único PDF escrito en `output`
+        (fichero binario). Las etiquetas se leen desde el filestore en bloques
+        de palletways.label_batch_merge_chunk: cada bloque se escribe en un
+        fichero temporal y se cierran sus ficheros antes de abrir el siguiente.
+        Devuelve (páginas, errores de las etiquetas que no se pudieron unir).
+        """
+        self.ensure_one()
+        chunk_size = int(self.env['ir.config_parameter'].sudo().get_param(
+            'palletways.label_batch_merge_chunk', 100))
+
+        labels = []
+        skipped = []
+        for shipment in self.shipment_ids.filtered('label_fetched_at'):
+            attachment = shipment._get_document_attachment('label_pdf')
+            if attachment:
+                labels.append((shipment, attachment))
+            else:
+                skipped.append(f"{shipment.tracking_id}: etiqueta no encontrada")
+
+        if len(labels) <= chunk_size:
+            return self._write_labels_pdf(labels, output, skipped), skipped
+
+        pages = 0
+        with ExitStack() as stack:
+            parts = []
+            for chunk in split_every(chunk_size, labels):
+                part = stack.enter_context(tempfile.TemporaryFile())
+                chunk_pages = self._write_labels_pdf(chunk, part, skipped)
+                if chunk_pages:
+                    pages += chunk_pages
+                    parts.append(part)
+            if pages:
+                writer = PdfFileWriter()
+                for part in parts:
+                    part.seek(0)
+                    reader = PdfFileReader(part, strict=False)
+                    for page in range(reader.getNumPages()):
+                        writer.addPage(reader.getPage(page))
+                writer.write(output)
+        return pages, skipped
+
+    @api.model
+    def _write_labels_pdf(self, labels, output, skipped):
+        """Escribir en `output` las páginas de `labels` [(envío, adjunto)]; devuelve las páginas"""
+        writer = PdfFileWriter()
+        pages = 0
+        with ExitStack() as stack:
+            for shipment, attachment in labels:
+                try:
+                    reader = PdfFileReader(stack.enter_context(self._open_attachment(attachment)), strict=False)
+                    label_pages = [reader.getPage(page) for page in range(reader.getNumPages())]
+                except Exception as e:
+                    _logger.warning(f"Etiqueta de {shipment.tracking_id} no se puede unir: {e}")
+                    skipped.append(f"{shipment.tracking_id}: etiqueta no se puede unir ({e})")
+                    continue
+                for page in label_pages:
+                    writer.addPage(page)
+                pages += len(label_pages)
+            if pages:
+                writer.write(output)
+        return pages
+
+    def _attach_merged_pdf(self, output):
+        """
+        Adjuntar el PDF unido desde el fichero `output`: con almacenamiento en
+        filestore se copia tal cual al fichero del adjunto, sin cargarlo en memoria
+        """
+        self.ensure_one()
+        Attachment = self.env['ir.attachment'].sudo()
+        vals = {
+            'name': self.merged_filename,
+            'res_model': self._name,
+            'res_field': 'merged_pdf',
+            'res_id': self.id,
+            'mimetype': 'application/pdf',
+        }
+        output.seek(0)
+        if Attachment._storage() != 'file':
+            vals['raw'] = output.read()
+        else:
+            sha = hashlib.sha1()
+            size = 0
+            for block in iter(lambda: output.read(1 << 16), b''):
+                sha.update(block)
+                size += len(block)
+            checksum = sha.hexdigest()
+            fname = f"{checksum[:2]}/{checksum}"
+            full_path = Attachment._full_path(fname)
+            if not os.path.exists(full_path):
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                output.seek(0)
+                with open(full_path, 'wb') as target:
+                    shutil.copyfileobj(output, target)
+                # Borrar el fichero si la transacción no llega a confirmarse
+                Attachment._mark_for_gc(fname)
+            vals.update({'store_fname': fname, 'checksum': checksum, 'file_size': size})
+        Attachment.create(vals)
+        self.invalidate_recordset(['merged_pdf'])
+
+    def action_download(self):
+        """Descargar el PDF unido directamente desde el filestore"""
+        self.ensure_one()
+        attachment = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', '=', 'merged_pdf'),
+            ('res_id', '=', self.id),
+        ], limit=1)
+        if not attachment:
+            raise UserError("El lote todavía no tiene PDF de etiquetas")
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f'/web/content/{attachment.id}?download=true',
+            'target': 'new',
+        }
+
+    def action_retry(self):
+        """Volver a procesar el lote en segundo plano (también los atascados en 'running')"""
+        if self.filtered(lambda b: b.state == 'running' and not b.is_stale):
+            raise UserError("El lote se está procesando")
+        self.write({'state': 'pending'})
+        self.env.ref('palletways_service_integration.cron_process_palletways_label_batches')._trigger()
+        return True
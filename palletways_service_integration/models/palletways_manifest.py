@@ -0,0 +1,116 @@
+"""
+Serializador rápido del Manifest XML de createConsignment.
+
+Escribe el XML directamente como texto, sin construir un árbol ElementTree,
+y produce exactamente la misma salida que
+``ET.tostring(manifest, encoding='utf-8', xml_declaration=True)``.
+La estructura se valida mientras se construye (etiquetas abiertas/cerradas
+y campos obligatorios), no buscando subcadenas en el resultado.
+
+Incluye también la validación opcional contra el XSD del Manifest
+(data/palletways_manifest.xsd), que se compila una vez por proceso.
+
+No depende del ORM.
+"""
+import os
+import threading
+
+from lxml import etree
+
+XML_DECLARATION = "<?xml version='1.0' encoding='utf-8'?>\n"
+
+MANIFEST_XSD_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'palletways_manifest.xsd')
+
+_schemas = {}
+_schemas_lock = threading.Lock()
+
+_ESCAPE_TABLE = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;'})
+
+
+class ManifestError(ValueError):
+    """Manifest estructuralmente incorrecto"""
+
+
+def escape_text(value):
+    """Escapar texto de un elemento igual que ElementTree"""
+    text = value if isinstance(value, str) else str(value)
+    if '&' in text or '<' in text or '>' in text:
+        return text.translate(_ESCAPE_TABLE)
+    return text
+
+
+class ManifestWriter:
+    """
+    Escritor en streaming de elementos XML sin atributos.
+
+    Las partes se añaden a `stream` (cualquier objeto con ``write``) o, si no
+    se indica, a una lista interna que devuelve ``getvalue()``. Así pueden
+    volcarse muchas consignaciones en un mismo Manifest sin mantener un árbol.
+    """
+
+    def __init__(self, stream=None):
+        self._parts = []
+        self._write = stream.write if stream is not None else self._parts.append
+        self._open = []
+        self._write(XML_DECLARATION)
+
+    def start(self, tag):
+        """Abrir `tag`"""
+        self._write(f'<{tag}>')
+        self._open.append(tag)
+
+    def end(self, tag):
+        """Cerrar `tag`, que debe ser el último elemento abierto"""
+        if not self._open or self._open[-1] != tag:
+            raise ManifestError(
+                f"Cierre de <{tag}> inesperado (abierto: {self._open[-1] if self._open else 'ninguno'})")
+        self._open.pop()
+        self._write(f'</{tag}>')
+
+    def element(self, tag, value=None, required=False):
+        """Elemento hoja; vacío (``<Tag />``) si `value` es falso salvo que sea obligatorio"""
+        if not self._open:
+            raise ManifestError(f"<{tag}> fuera del elemento raíz")
+        if not value:
+            if required:
+                raise ManifestError(f"El elemento <{tag}> es obligatorio dentro de <{self._open[-1]}>")
+            self._write(f'<{tag} />')
+        else:
+            self._write(f'<{tag}>{escape_text(value)}</{tag}>')
+
+    def getvalue(self):
+        """XML completo; falla si queda algún elemento sin cerrar"""
+        if self._open:
+            raise ManifestError(f"XML incompleto: elementos sin cerrar {self._open}")
+        return ''.join(self._parts)
+
+
+def get_schema(path=MANIFEST_XSD_PATH):
+    """XMLSchema compilado de `path`, cacheado por proceso"""
+    schema = _schemas.get(path)
+    if schema is None:
+        with _schemas_lock:
+            schema = _schemas.get(path)
+            if schema is None:
+                schema = etree.XMLSchema(etree.parse(path))
+                _schemas[path] = schema
+    return schema
+
+
+def validate_manifest(xml_string, path=MANIFEST_XSD_PATH):
+    """
+    Validar el Manifest contra el XSD.
+    Devuelve la lista de errores ("ruta del campo: mensaje"), vacía si es válido.
+    """
+    try:
+        document = etree.fromstring(xml_string.encode('utf-8'))
+    except etree.XMLSyntaxError as e:
+        return [f"XML mal formado: {e}"]
+
+    schema = get_schema(path)
+    if schema.validate(document):
+        return []
+    return [
+        f"{error.path}: {error.message}"
+        for error in schema.error_log
+    ]
@@ -0,0 +1,225 @@
+"""
+Normalizador de respuestas Palletways.
+
+La API devuelve Status, Detail y Data indistintamente como dict, lista,
+texto o elemento XML. Este módulo lo reduce siempre a la misma forma:
+
+    PwResponse.status   -> PwStatus(code, description)
+    PwResponse.detail   -> PwDetail(records, message)
+    PwDetail.records    -> tupla de PwRecord (ImportDetail o Data)
+
+Acepta el diccionario que devuelve _make_api_request, response.json() o
+Response.dict() (con o sin la raíz 'Response') y también el elemento raíz
+de ElementTree; en ese caso solo convierte los nodos que se leen, sin
+pasar el documento entero por _xml_to_dict.
+
+No depende del ORM: es el único normalizador de los addons Palletways
+(palletways_shipping_integration lo importa de aquí). La comparación de
+rendimiento con el recorrido manual está en tests/test_palletways_normalizer.py.
+"""
+import xml.etree.ElementTree as ET
+
+RECORD_KEYS = ('ImportDetail', 'Data')
+
+
+def _first(value):
+    """Primer elemento si `value` es lista; el propio valor si no"""
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+def _as_list(value):
+    if value is None or value == '' or value == {}:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _element_to_value(element):
+    """Elemento XML a dict/texto (mismo formato que _xml_to_dict)"""
+    children = list(element)
+    text = element.text.strip() if element.text else ''
+    if not children and not element.attrib:
+        return text if text else {}
+    result = {}
+    if text:
+        result['_text'] = text
+    if element.attrib:
+        result['_attributes'] = dict(element.attrib)
+    for child in children:
+        value = _element_to_value(child)
+        previous = result.get(child.tag)
+        if previous is None:
+            result[child.tag] = value
+        elif isinstance(previous, list):
+            previous.append(value)
+        else:
+            result[child.tag] = [previous, value]
+    return result
+
+
+class PwStatus:
+    """<Status> de la respuesta"""
+    __slots__ = ('code', 'description')
+
+    def __init__(self, code='', description=''):
+        self.code = code
+        self.description = description
+
+    @property
+    def ok(self):
+        return self.code == 'OK'
+
+    def __repr__(self):
+        return f"PwStatus({self.code!r}, {self.description!r})"
+
+
+class PwRecord:
+    """Un registro <ImportDetail>/<Data>; acceso tipo dict con texto plano como respaldo"""
+    __slots__ = ('data', 'text')
+
+    def __init__(self, value):
+        if isinstance(value, dict):
+            self.data = value
+            # '_text' (_xml_to_dict) o 'value' (Response.dict() del módulo heredado)
+            self.text = value.get('_text', value.get('value', ''))
+        else:
+            self.data = {}
+            self.text = str(value) if value is not None else ''
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __bool__(self):
+        return bool(self.data or self.text)
+
+    def __repr__(self):
+        return f"PwRecord({self.data or self.text!r})"
+
+
+EMPTY_RECORD = PwRecord({})
+
+
+class PwDetail:
+    """<Detail> de la respuesta con sus registros ya desenvueltos"""
+    __slots__ = ('records', 'message')
+
+    def __init__(self, records=(), message=''):
+        self.records = tuple(records)
+        self.message = message
+
+    @property
+    def first(self):
+        """Primer registro o un registro vacío"""
+        return self.records[0] if self.records else EMPTY_RECORD
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+
+class PwResponse:
+    """Respuesta completa normalizada; `raw` da el diccionario original (se calcula al pedirlo)"""
+    __slots__ = ('status', 'detail', '_source', '_raw')
+
+    def __init__(self, status, detail, source):
+        self.status = status
+        self.detail = detail
+        self._source = source
+        self._raw = None
+
+    @property
+    def ok(self):
+        return self.status.ok
+
+    @property
+    def raw(self):
+        if self._raw is None:
+            source = self._source
+            self._raw = source if isinstance(source, dict) else _element_to_value(source)
+        return self._raw
+
+
+def _status_from_value(status):
+    status = _first(status)
+    if isinstance(status, dict):
+        return PwStatus(str(status.get('Code', status.get('_text', '')) or ''),
+                        status.get('Description', '') or '')
+    if status:
+        return PwStatus(str(status), '')
+    return PwStatus()
+
+
+def _normalize_dict(payload, record_keys, detail_as_record):
+    if 'Status' not in payload and isinstance(payload.get('Response'), dict):
+        payload_root = payload['Response']
+    else:
+        payload_root = payload
+
+    status = _status_from_value(payload_root.get('Status'))
+
+    records = []
+    message = ''
+    for detail in _as_list(payload_root.get('Detail')):
+        if not isinstance(detail, dict):
+            records.append(PwRecord(detail))
+            continue
+        message = message or detail.get('Message', detail.get('_text', ''))
+        for key in record_keys:
+            values = _as_list(detail.get(key))
+            if values:
+                records.extend(PwRecord(value) for value in values)
+                break
+        else:
+            if detail_as_record and detail:
+                records.append(PwRecord(detail))
+    return PwResponse(status, PwDetail(records, message), payload)
+
+
+def _normalize_element(root, record_keys, detail_as_record):
+    status_element = root.find('Status')
+    if status_element is None:
+        status = PwStatus()
+    else:
+        code = status_element.findtext('Code')
+        if code is None:
+            code = (status_element.text or '').strip()
+        status = PwStatus(code.strip(), (status_element.findtext('Description') or '').strip())
+
+    records = []
+    message = ''
+    for detail in root.iterfind('Detail'):
+        message = message or (detail.findtext('Message') or (detail.text or '')).strip()
+        for key in record_keys:
+            elements = detail.findall(key)
+            if elements:
+                records.extend(PwRecord(_element_to_value(element)) for element in elements)
+                break
+        else:
+            if detail_as_record and len(detail):
+                records.append(PwRecord(_element_to_value(detail)))
+    return PwResponse(status, PwDetail(records, message), root)
+
+
+def normalize(payload, record_keys=RECORD_KEYS, detail_as_record=False):
+    """
+    Normalizar una respuesta Palletways (dict o elemento raíz XML).
+    Los registros se toman de la primera clave de `record_keys` presente en
+    Detail; con `detail_as_record` un Detail sin ninguna de ellas cuenta como
+    registro único.
+    """
+    if isinstance(payload, PwResponse):
+        return payload
+    if isinstance(payload, ET.Element):
+        return _normalize_element(payload, record_keys, detail_as_record)
+    if isinstance(payload, dict):
+        return _normalize_dict(payload, record_keys, detail_as_record)
+    return PwResponse(PwStatus(), PwDetail(), {})
@@ -0,0 +1,66 @@
+import logging
+from odoo import models, fields, api
+from odoo.modules.registry import Registry
+
+_logger = logging.getLogger(__name__)
+
+# Espacio de claves para pg_advisory_xact_lock(int, int)
+ADVISORY_LOCK_NAMESPACE = 0x50570001
+
+
+class PalletwaysRateLimit(models.Model):
+    """
+    Token bucket compartido entre workers (backend 'database').
+    Cada operación se hace en un cursor propio y se confirma al momento,
+    sin bloquear la transacción de negocio ni la fila palletways.api.client.
+    """
+    _name = 'palletways.rate.limit'
+    _description = 'Límite de peticiones Palletways (compartido)'
+    _log_access = False
+    _rec_name = 'client_id'
+
+    client_id = fields.Many2one('palletways.api.client', string='Cliente API',
+                                required=True, ondelete='cascade')
+    tokens = fields.Float('Tokens disponibles')
+    refilled_at = fields.Datetime('Última reposición')
+
+    _sql_constraints = [
+        ('client_uniq', 'unique(client_id)', 'Solo puede haber un bucket por cliente API'),
+    ]
+
+    @api.model
+    def _take_token(self, dbname, client_id, capacity, period, consume=True):
+        """
+        Consumir un token del bucket compartido del cliente.
+        Devuelve (segundos a esperar, tokens restantes); espera 0 = token obtenido.
+        """
+        rate = capacity / period
+        with Registry(dbname).cursor() as cr:
+            cr.execute("SELECT pg_advisory_xact_lock(%s, %s)", (ADVISORY_LOCK_NAMESPACE, client_id))
+            cr.execute("""
+                INSERT INTO palletways_rate_limit (client_id, tokens, refilled_at)
+                VALUES (%s, %s, clock_timestamp() AT TIME ZONE 'UTC')
+                ON CONFLICT (client_id) DO NOTHING
+            """, (client_id, capacity))
+            cr.execute("""
+                SELECT tokens,
+                       EXTRACT(EPOCH FROM (clock_timestamp() AT TIME ZONE 'UTC') - refilled_at)
+                  FROM palletways_rate_limit
+                 WHERE client_id = %s
+            """, (client_id,))
+            tokens, elapsed = cr.fetchone()
+            tokens = min(capacity, (tokens or 0.0) + max(float(elapsed or 0.0), 0.0) * rate)
+
+            wait = 0.0
+            if consume:
+                if tokens >= 1:
+                    tokens -= 1
+                else:
+                    wait = (1 - tokens) / rate
+
+            cr.execute("""
+                UPDATE palletways_rate_limit
+                   SET tokens = %s, refilled_at = clock_timestamp() AT TIME ZONE 'UTC'
+                 WHERE client_id = %s
+            """, (tokens, client_id))
+        return wait, tokens
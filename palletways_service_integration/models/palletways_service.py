@@ -1,3 +1,4 @@
+from collections import defaultdict
 from odoo import models, fields, api
 
 
@@ -18,3 +19,64 @@ class PalletwayService(models.Model):
         if self.sale_order_id:
             self.sale_order_id.write({'palletways_service_id': self.id})
         return True
+
+    @api.model
+    def _prepare_service_vals(self, service):
+        """Valores del registro a partir de un elemento de availableServices"""
+        return {
+            'service_group_code': service.get('ServiceGroupCode', ''),
+            'service_code': service.get('ServiceCode', ''),
+            'service_name': service.get('ServiceName', ''),
+            'service_group_name': service.get('ServiceGroupName', ''),
+            'service_days_min': str(service.get('ServiceDaysMin', '')),
+            'service_days_max': str(service.get('ServiceDaysMax', '')),
+        }
+
+    @api.model
+    def _sync_order_services(self, services_by_order):
+        """
+        Sincronizar los servicios de varios pedidos con la respuesta de la API
+        `services_by_order`: {sale.order: [servicio API, ...]}
+
+        Por (grupo, código): conserva las filas sin cambios, actualiza las
+        modificadas, crea las nuevas en un único create y borra las que ya
+        no se ofrecen. Los ids conservados mantienen palletways_service_id.
+        """
+        orders = self.env['sale.order'].browse([order.id for order in services_by_order])
+        existing_by_key = {}
+        to_unlink = self.browse()
+        for record in self.search([('sale_order_id', 'in', orders.ids)]):
+            key = (record.sale_order_id.id, record.service_group_code or '', record.service_code or '')
+            if key in existing_by_key:
+                to_unlink |= record
+            else:
+                existing_by_key[key] = record
+
+        to_create = []
+        to_write = defaultdict(lambda: self.browse())
+        for order, services in services_by_order.items():
+            for service in services:
+                vals = self._prepare_service_vals(service)
+                key = (order.id, vals['service_group_code'], vals['service_code'])
+                record = existing_by_key.pop(key, None)
+                if record is None:
+                    vals['sale_order_id'] = order.id
+                    to_create.append(vals)
+                    continue
+                changed = {name: value for name, value in vals.items() if (record[name] or '') != value}
+                if changed:
+                    to_write[tuple(sorted(changed.items()))] |= record
+
+        for record in existing_by_key.values():
+            to_unlink |= record
+
+        to_unlink.unlink()
+        for changed, records in to_write.items():
+            records.write(dict(changed))
+        created = self.create(to_create)
+
+        return {
+            'created': len(created),
+            'updated': sum(len(records) for records in to_write.values()),
+            'deleted': len(to_unlink),
+        }
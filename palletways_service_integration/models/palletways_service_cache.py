@@ -0,0 +1,175 @@
+import json
+import logging
+from datetime import timedelta
+from odoo import models, fields, api
+from odoo.tools.sql import create_index
+
+_logger = logging.getLogger(__name__)
+
+
+class PalletwaysServiceCache(models.Model):
+    """
+    Caché persistente de availableServices por ruta (origen/destino).
+    Compartida entre workers; cada worker mantiene además una copia LRU
+    en memoria (palletways_http.service_cache).
+    """
+    _name = 'palletways.service.cache'
+    _description = 'Caché de Servicios Palletways'
+    _log_access = False
+    _order = 'fetched_at desc'
+    _rec_name = 'route_key'
+
+    api_client_id = fields.Many2one('palletways.api.client', string='Cliente API',
+                                    required=True, ondelete='cascade')
+    route_key = fields.Char('Ruta', required=True, index=True)
+    services_json = fields.Text('Servicios (JSON)')
+    service_count = fields.Integer('Nº Servicios')
+    fetched_at = fields.Datetime('Consultado')
+    expires_at = fields.Datetime('Caduca', index=True)
+
+    _sql_constraints = [
+        ('route_uniq', 'unique(api_client_id, route_key)', 'La ruta ya está en caché para este cliente API'),
+    ]
+
+    def init(self):
+        # Búsquedas por prefijo de ruta (todas las rutas de un origen: 'D/ES/28001/%')
+        create_index(self.env.cr, 'palletways_service_cache_route_prefix_idx', self._table,
+                     ['api_client_id', 'route_key text_pattern_ops'])
+
+    @api.model
+    def _route_key(self, con_type, origin_country, origin_postal, destination_country, destination_postal):
+        """Clave normalizada de la ruta: D/ES/28001/ES/28002"""
+        parts = (con_type, origin_country, origin_postal, destination_country, destination_postal)
+        return '/'.join(str(part or '').replace(' ', '').upper() for part in parts)
+
+    @api.model
+    def _lookup(self, client, route_key):
+        """Devolver (servicios, segundos de vigencia restantes) o (None, 0) si no hay entrada vigente"""
+        self.env.cr.execute("""
+            SELECT services_json,
+                   EXTRACT(EPOCH FROM expires_at - (now() AT TIME ZONE 'UTC'))
+              FROM palletways_service_cache
+             WHERE api_client_id = %s AND route_key = %s
+               AND expires_at > (now() AT TIME ZONE 'UTC')
+        """, (client.id, route_key))
+        row = self.env.cr.fetchone()
+        if not row:
+            return None, 0
+        return json.loads(row[0] or '[]'), float(row[1])
+
+    @api.model
+    def _store(self, client, route_key, services, ttl_hours):
+        """Guardar (o sustituir) los servicios de la ruta"""
+        now = fields.Datetime.now()
+        self.env.cr.execute("""
+            INSERT INTO palletways_service_cache
+                   (api_client_id, route_key, services_json, service_count, fetched_at, expires_at)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (api_client_id, route_key) DO UPDATE
+               SET services_json = EXCLUDED.services_json,
+                   service_count = EXCLUDED.service_count,
+                   fetched_at = EXCLUDED.fetched_at,
+                   expires_at = EXCLUDED.expires_at
+        """, (client.id, route_key, json.dumps(services), len(services),
+              now, now + timedelta(hours=ttl_hours)))
+        self.invalidate_model()
+
+    @api.model
+    def _invalidate(self, clients):
+        """Vaciar la caché persistente de los clientes indicados"""
+        self.env.cr.execute(
+            "DELETE FROM palletways_service_cache WHERE api_client_id IN %s",
+            (tuple(clients.ids) or (0,),))
+        self.invalidate_model()
+
+    @api.model
+    def _fresh_route_keys(self, client, route_prefix, valid_until):
+        """Rutas con prefijo `route_prefix` que siguen vigentes en `valid_until`"""
+        self.env.cr.execute("""
+            SELECT route_key
+              FROM palletways_service_cache
+             WHERE api_client_id = %s AND route_key LIKE %s AND expires_at > %s
+        """, (client.id, route_prefix.replace('%', '') + '%', valid_until))
+        return {row[0] for row in self.env.cr.fetchall()}
+
+    @api.model
+    def _get_customer_postcodes(self):
+        """(país, CP) distintos de las direcciones de entrega de clientes activos"""
+        self.env.cr.execute("""
+            SELECT DISTINCT country.code, upper(replace(partner.zip, ' ', ''))
+              FROM res_partner partner
+              JOIN res_country country ON country.id = partner.country_id
+             WHERE partner.active
+               AND coalesce(partner.zip, '') != ''
+               AND (partner.type = 'delivery' OR partner.customer_rank > 0)
+        """)
+        return self.env.cr.fetchall()
+
+    @api.model
+    def cron_precompute_routes(self):
+        """
+        Cron nocturno: precargar availableServices para cada CP de almacén
+        hacia todos los CP de clientes activos (sin duplicados).
+        Incremental: solo consulta rutas nuevas o que caducarían antes de
+        palletways.route_precompute_margin_hours; como mucho
+        palletways.route_precompute_max_per_run consultas por ejecución.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        max_per_run = int(ICP.get_param('palletways.route_precompute_max_per_run', 3000))
+        margin_hours = int(ICP.get_param('palletways.route_precompute_margin_hours', 12))
+        chunk_size = int(ICP.get_param('palletways.status_refresh_chunk_size', 200))
+        workers = int(ICP.get_param('palletways.status_refresh_workers', 4))
+        valid_until = fields.Datetime.now() + timedelta(hours=margin_hours)
+
+        destinations = self._get_customer_postcodes()
+        origins = {
+            (partner.country_id.code, partner.zip.replace(' ', '').upper())
+            for partner in self.env['stock.warehouse'].search([]).mapped('partner_id')
+            if partner.zip and partner.country_id
+        }
+        clients = self.env['delivery.carrier'].search([
+            ('delivery_type', '=', 'palletways'),
+            ('palletways_api_client_id', '!=', False),
+        ]).mapped('palletways_api_client_id').filtered(lambda c: c.active and c.service_cache_ttl > 0)
+
+        _logger.info(
+            f"Precarga de rutas Palletways: {len(clients)} clientes, {len(origins)} orígenes, "
+            f"{len(destinations)} destinos"
+        )
+
+        budget = max_per_run
+        for client in clients:
+            pending = []
+            for origin_country, origin_postal in sorted(origins):
+                prefix = self._route_key('D', origin_country, origin_postal, '', '')[:-1]
+                fresh = self._fresh_route_keys(client, prefix, valid_until)
+                for destination_country, destination_postal in destinations:
+                    route_key = self._route_key(
+                        'D', origin_country, origin_postal, destination_country, destination_postal)
+                    if route_key not in fresh:
+                        pending.append((origin_country, origin_postal,
+                                        destination_country, destination_postal, 'D', False))
+
+            pending = pending[:budget]
+            budget -= len(pending)
+            failed = 0
+            for chunk_start in range(0, len(pending), chunk_size):
+                chunk = pending[chunk_start:chunk_start + chunk_size]
+                results = client._call_concurrent('get_available_services', chunk, max_workers=workers)
+                failed += sum(1 for result, error in results if error)
+
+            _logger.info(
+                f"Precarga de rutas {client.name}: {len(pending) - failed} rutas actualizadas, {failed} con error"
+            )
+            if budget <= 0:
+                _logger.info("Precarga de rutas Palletways: límite por ejecución alcanzado")
+                break
+
+        return True
+
+    @api.autovacuum
+    def _gc_expired(self):
+        """Borrar entradas caducadas"""
+        self.env.cr.execute(
+            "DELETE FROM palletways_service_cache WHERE expires_at < (now() AT TIME ZONE 'UTC')")
+        _logger.info(f"Caché de servicios Palletways: {self.env.cr.rowcount} entradas caducadas eliminadas")
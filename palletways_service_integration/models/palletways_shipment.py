@@ -1,12 +1,83 @@
+import hashlib
 import json
-import base64
 import logging
+from collections import defaultdict
 from datetime import datetime, timedelta
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
+from odoo.tools import split_every, sql
+from . import palletways_normalizer
 
 _logger = logging.getLogger(__name__)
 
+# Mapear códigos de estado Palletways según documentación oficial página 14
+PALLETWAYS_STATUS_MAPPING = {
+    # Estados de recogida
+    '15': 'error',        # REJECTED - Petición de recogida rechazada
+    '25': 'created',      # TO REQUEST - Petición de recogida a ser solicitada
+    '30': 'created',      # AWAITING ACCEPT - Petición de recogida esperando aceptación
+    '50': 'confirmed',    # REQUESTED - Petición de recogida aceptada
+    
+    # Estados de procesamiento
+    '100': 'confirmed',   # NOT BARCODED - Sin código de barras
+    '300': 'collected',   # IN COLLECTION DEPOT - En Depot de recogida
+    '350': 'in_transit',  # TRUNKED TO HUB - De camino al HUB
+    '500': 'in_transit',  # AT THE HUB - En HUB
+    '525': 'in_transit',  # AT INTERNATIONAL HUB - En HUB internacional
+    '530': 'in_transit',  # DEPART INTERNATIONAL HUB - Salió del HUB internacional
+    '550': 'in_transit',  # DEPARTED HUB - Salió del HUB
+    
+    # Estados de entrega
+    '675': 'at_depot',    # STOCK HELD - Bloqueado en destino
+    '700': 'at_depot',    # AT DELIVERY DEPOT - En Depot de entrega
+    '800': 'out_delivery', # OUT FOR DELIVERY - En reparto
+    '900': 'delivered',   # JOB COMPLETE - Trabajo finalizado
+}
+
+# Intervalo de consulta (minutos) según código PW: más frecuente cuanto más
+# probable es un cambio de estado inminente
+POLL_INTERVAL_BY_CODE = {
+    '800': 30,            # OUT FOR DELIVERY
+    '700': 120,           # AT DELIVERY DEPOT
+    '675': 240,           # STOCK HELD
+    '550': 240,           # DEPARTED HUB
+    '530': 240,           # DEPART INTERNATIONAL HUB
+    '525': 240,           # AT INTERNATIONAL HUB
+    '500': 240,           # AT THE HUB
+    '350': 240,           # TRUNKED TO HUB
+    '300': 240,           # IN COLLECTION DEPOT
+}
+
+# Intervalo por estado local si el código PW no está en la tabla anterior
+POLL_INTERVAL_BY_STATUS = {
+    'created': 360,
+    'confirmed': 360,
+    'collected': 240,
+    'in_transit': 240,
+    'at_depot': 120,
+    'out_delivery': 30,
+}
+
+POLL_FINAL_STATUSES = ('delivered', 'error')
+POLL_STALE_DAYS = 7           # Sin cambios en 7 días: consulta diaria
+POLL_STALE_INTERVAL = 1440
+POLL_GIVE_UP_DAYS = 30        # Sin cambios en 30 días: dejar de consultar
+POLL_ERROR_INTERVAL = 60      # Reintento tras error de consulta
+
+# Valores de estado propios de cada envío: se escriben aparte (una UPDATE por
+# columna) para que el resto se pueda agrupar en un write por combinación
+STATUS_PER_RECORD_COLUMNS = {
+    'status_hash': 'varchar',
+    'consignment_number': 'varchar',
+    'actual_delivery_date': 'timestamp',
+}
+
+# Descarga automática de POD: reintentos con espera creciente mientras
+# Palletways no lo publica (30 min, 1 h, 2 h... máx. 1 día)
+POD_MAX_ATTEMPTS = 10
+POD_BACKOFF_BASE = 30
+POD_BACKOFF_MAX = 1440
+
 class PalletwaysShipment(models.Model):
     _name = 'palletways.shipment'
     _description = 'Envío Palletways'
@@ -41,21 +112,43 @@ class PalletwaysShipment(models.Model):
     pallets = fields.Integer('Pallets')
     bill_unit_type = fields.Char('Tipo Unidad Facturable')
     
-    # Respuestas API
+    # Respuestas API (solo datos antiguos: ahora se guardan en event_ids)
     api_response = fields.Text('Respuesta API Creación')
     last_status_response = fields.Text('Última Respuesta Estado')
+    event_ids = fields.One2many('palletways.shipment.event', 'shipment_id', string='Historial')
     notes = fields.Text('Notas')
+    note_ids = fields.One2many('palletways.shipment.note', 'shipment_id', string='Notas Palletways')
+    notes_high_water = fields.Datetime('Última Nota Sincronizada', copy=False, readonly=True)
+    notes_synced_at = fields.Datetime('Notas Consultadas', copy=False, readonly=True)
     
-    # Archivos
-    label_pdf = fields.Binary('Etiqueta PDF')
-    label_filename = fields.Char('Nombre Etiqueta', compute='_compute_fil enames')
-    pod_pdf = fields.Binary('Comprobante Entrega')
+    # Archivos (adjuntos en filestore, ver _store_document)
+    label_pdf = fields.Binary('Etiqueta PDF', attachment=True)
+    label_filename = fields.Char('Nombre Etiqueta', compute='_compute_filenames')
+    label_fetched_at = fields.Datetime('Etiqueta Descargada', readonly=True)
+    pod_pdf = fields.Binary('Comprobante Entrega', attachment=True)
     pod_filename = fields.Char('Nombre POD', compute='_compute_filenames')
+    pod_fetched_at = fields.Datetime('POD Descargado', readonly=True)
+    pod_state = fields.Selection([
+        ('pending', 'Pendiente'),
+        ('done', 'Descargado'),
+        ('failed', 'No Disponible'),
+    ], string='Estado POD', copy=False, readonly=True, index=True)
+    pod_attempts = fields.Integer('Intentos POD', copy=False, readonly=True)
+    pod_next_attempt_at = fields.Datetime('Próximo Intento POD', copy=False, readonly=True)
     
     # Estados detallados Palletways según documentación oficial página 14
     palletways_status_code = fields.Char('Código Estado PW')
     palletways_status_desc = fields.Char('Descripción Estado PW')
     last_update = fields.Datetime('Última Actualización')
+    last_checked = fields.Datetime('Última Consulta', copy=False, readonly=True)
+    status_hash = fields.Char('Huella Estado', copy=False, readonly=True,
+                              help='Huella del registro Data de la última respuesta aplicada')
+    
+    # Planificación de consultas de estado
+    # Sin default: la columna nueva debe quedar NULL al actualizar el módulo
+    # para que init() calcule los valores de los envíos existentes (ver create)
+    next_poll_at = fields.Datetime('Próxima Consulta', copy=False)
+    status_changed_at = fields.Datetime('Último Cambio de Estado', copy=False)
     
     # Información adicional
     collection_date = fields.Date('Fecha Recogida')
@@ -66,6 +159,48 @@ class PalletwaysShipment(models.Model):
     company_id = fields.Many2one('res.company', related='picking_id.company_id', store=True)
     partner_id = fields.Many2one('res.partner', related='picking_id.partner_id', store=True)
     
+    def init(self):
+        """
+        Índice parcial para la selección del cron y planificación inicial de
+        envíos existentes. Los estados finales ya tienen next_poll_at vacío
+        (_get_next_poll_at), así que el índice no filtra por estado: el ORM
+        traduce 'status not in' a '(... OR status IS NULL)', que no casaría
+        con un predicado sobre status y PostgreSQL no usaría el índice.
+        """
+        sql.drop_index(self.env.cr, 'palletways_shipment_next_poll_at_open_idx', self._table)
+        sql.create_index(
+            self.env.cr,
+            'palletways_shipment_next_poll_at_idx',
+            self._table,
+            ['next_poll_at'],
+            where="next_poll_at IS NOT NULL",
+        )
+        sql.create_index(
+            self.env.cr,
+            'palletways_shipment_pod_next_attempt_at_pending_idx',
+            self._table,
+            ['pod_next_attempt_at'],
+            where="pod_state = 'pending'",
+        )
+        self.env.cr.execute("""
+            UPDATE palletways_shipment
+               SET status_changed_at = COALESCE(last_update, create_date),
+                   next_poll_at = CASE
+                       WHEN status NOT IN ('delivered', 'error')
+                        AND COALESCE(last_update, create_date) >= (now() AT TIME ZONE 'UTC') - interval '30 days'
+                       THEN now() AT TIME ZONE 'UTC'
+                   END
+             WHERE status_changed_at IS NULL
+        """)
+    
+    @api.model_create_multi
+    def create(self, vals_list):
+        now = fields.Datetime.now()
+        for vals in vals_list:
+            vals.setdefault('status_changed_at', now)
+            vals.setdefault('next_poll_at', now)
+        return super().create(vals_list)
+    
     @api.depends('service_code')
     def _compute_service_name(self):
         for record in self:
@@ -161,17 +296,14 @@ class PalletwaysShipment(models.Model):
                 client = shipment._get_api_client()
                 status_data = client.get_consignment_status(shipment.tracking_id)
                 
-                # ✅ CORRECCIÓN v2.1.7: Manejar Status como lista o dict
+                # ✅ CORRECCIÓN v2.6.0: Status/Detail/Data normalizados
                 if status_data:
-                    status = status_data.get('Status', {})
-                    if isinstance(status, list):
-                        status = status[0] if status else {}
-                    
-                    if status.get('Code') == 'OK':
+                    status_data = palletways_normalizer.normalize(status_data)
+                    if status_data.ok:
                         shipment._update_status_from_api(status_data)
                         updated_count += 1
                     else:
-                        error_msg = status.get('Description', 'Error desconocido')
+                        error_msg = status_data.status.description or 'Error desconocido'
                         _logger.error(f"Error API para {shipment.tracking_id}: {error_msg}")
                         error_count += 1
                 else:
@@ -180,7 +312,7 @@ class PalletwaysShipment(models.Model):
             except Exception as e:
                 error_count += 1
                 _logger.error(f"Error actualizando estado {shipment.tracking_id}: {e}")
-                shipment.message_post(
+                shipment.picking_id.message_post(
                     body=f"Error actualizando estado: {e}",
                     message_type='comment'
                 )
@@ -211,63 +343,58 @@ class PalletwaysShipment(models.Model):
         Actualizar estado local desde respuesta API
         Maneja Status, Detail y Data como lista o dict
         """
+        update_vals = self._prepare_status_vals(api_data)
+        if update_vals:
+            self._write_status_vals([(self, update_vals)], self._prepare_status_events(api_data, update_vals))
+    
+    def _prepare_status_events(self, api_data, update_vals):
+        """Evento de historial si la consulta trae un cambio de estado; lista vacía si no"""
+        if 'status_changed_at' not in update_vals:
+            return []
+        record = palletways_normalizer.normalize(api_data).detail.first
+        return [self.env['palletways.shipment.event']._prepare_status_event(self, update_vals, record)]
+    
+    def _prepare_status_vals(self, api_data):
+        """Valores a escribir en el envío a partir de la respuesta getConsignment"""
         if not api_data:
-            return
-        
-        # ✅ CORRECCIÓN v2.1.7: Status puede ser lista o dict
-        status = api_data.get('Status', {})
-        if isinstance(status, list):
-            status = status[0] if status else {}
+            return {}
         
-        if status.get('Code') != 'OK':
-            return
+        # ✅ CORRECCIÓN v2.6.0: Status, Detail y Data (lista o dict) normalizados
+        response = palletways_normalizer.normalize(api_data)
+        if not response.ok:
+            return {}
         
-        # ✅ CORRECCIÓN v2.1.7: Detail puede ser lista o dict
-        detail = api_data.get('Detail', {})
-        if isinstance(detail, list):
-            detail = detail[0] if detail else {}
-        
-        # ✅ CORRECCIÓN v2.1.7: Data puede ser lista o dict
-        data = detail.get('Data', {})
-        if isinstance(data, list):
-            data = data[0] if data else {}
-        
-        # Mapear códigos de estado Palletways según documentación oficial página 14
-        status_mapping = {
-            # Estados de recogida
-            '15': 'error',        # REJECTED - Petición de recogida rechazada
-            '25': 'created',      # TO REQUEST - Petición de recogida a ser solicitada
-            '30': 'created',      # AWAITING ACCEPT - Petición de recogida esperando aceptación
-            '50': 'confirmed',    # REQUESTED - Petición de recogida aceptada
-            
-            # Estados de procesamiento
-            '100': 'confirmed',   # NOT BARCODED - Sin código de barras
-            '300': 'collected',   # IN COLLECTION DEPOT - En Depot de recogida
-            '350': 'in_transit',  # TRUNKED TO HUB - De camino al HUB
-            '500': 'in_transit',  # AT THE HUB - En HUB
-            '525': 'in_transit',  # AT INTERNATIONAL HUB - En HUB internacional
-            '530': 'in_transit',  # DEPART INTERNATIONAL HUB - Salió del HUB internacional
-            '550': 'in_transit',  # DEPARTED HUB - Salió del HUB
-            
-            # Estados de entrega
-            '675': 'at_depot',    # STOCK HELD - Bloqueado en destino
-            '700': 'at_depot',    # AT DELIVERY DEPOT - En Depot de entrega
-            '800': 'out_delivery', # OUT FOR DELIVERY - En reparto
-            '900': 'delivered',   # JOB COMPLETE - Trabajo finalizado
-        }
+        data = response.detail.first
         
         pw_status = str(data.get('StatusCode', ''))
-        new_status = status_mapping.get(pw_status, self.status)
+        new_status = PALLETWAYS_STATUS_MAPPING.get(pw_status, self.status)
+        now = fields.Datetime.now()
+        
+        # ✅ NUEVO v2.6.0: Respuesta idéntica a la última aplicada: solo se
+        # anota la consulta y la siguiente, sin reescribir el envío
+        status_hash = self._get_status_hash(data)
+        if status_hash == self.status_hash:
+            return {
+                'last_checked': now,
+                'next_poll_at': self._get_next_poll_at(self.status, pw_status, self.status_changed_at),
+            }
         
         # Datos adicionales
         update_vals = {
             'status': new_status,
             'palletways_status_code': pw_status,
             'palletways_status_desc': data.get('StatusDescription', ''),
-            'last_update': fields.Datetime.now(),
-            'last_status_response': json.dumps(api_data),
+            'last_update': now,
+            'last_checked': now,
+            'status_hash': status_hash,
         }
         
+        status_changed_at = self.status_changed_at
+        if new_status != self.status or pw_status != self.palletways_status_code:
+            status_changed_at = update_vals['last_update']
+            update_vals['status_changed_at'] = status_changed_at
+        update_vals['next_poll_at'] = self._get_next_poll_at(new_status, pw_status, status_changed_at)
+        
         # Actualizar número de consignación si viene
         if data.get('ConNo'):
             update_vals['consignment_number'] = data.get('ConNo')
@@ -283,15 +410,139 @@ class PalletwaysShipment(models.Model):
             except (ValueError, TypeError):
                 pass
         
-        self.write(update_vals)
+        return update_vals
+    
+    @api.model
+    def _get_status_hash(self, record):
+        """Huella del registro Data de getConsignment para detectar respuestas sin cambios"""
+        payload = json.dumps(record.data or record.text, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    
+    def _write_status_vals(self, shipment_vals, event_vals=()):
+        """
+        Escribir una lista de (envío, valores) agrupando los envíos con
+        valores idénticos en un único write (las consultas sin cambios solo
+        traen last_checked/next_poll_at y se agrupan casi todas), añadir los
+        eventos de historial en un único create y avisar en el albarán de
+        los que cambian de estado
+        """
+        previous_status = {shipment.id: shipment.status for shipment, vals in shipment_vals}
+        
+        groups = defaultdict(lambda: self.browse())
+        per_record = defaultdict(list)
+        for shipment, vals in shipment_vals:
+            shared_vals = {}
+            for field_name, value in vals.items():
+                if field_name in STATUS_PER_RECORD_COLUMNS:
+                    per_record[field_name].append((shipment.id, value))
+                else:
+                    shared_vals[field_name] = value
+            groups[tuple(sorted(shared_vals.items()))] |= shipment
+        for key, shipments in groups.items():
+            shipments.write(dict(key))
+        for field_name, values in per_record.items():
+            self._write_per_record_column(field_name, values)
+        
+        if event_vals:
+            self.env['palletways.shipment.event'].create(list(event_vals))
         
-        # Mensaje en picking si hay cambio de estado
-        if new_status != self.status:
-            status_names = dict(self._fields['status'].selection)
-            self.picking_id.message_post(
-                body=f"Estado Palletways actualizado: {status_names.get(new_status, new_status)}<br/>"
-                     f"Código PW: {pw_status} - {data.get('StatusDescription', '')}"
+        status_names = dict(self._fields['status'].selection)
+        delivered = self.browse()
+        for shipment, vals in shipment_vals:
+            new_status = vals.get('status', previous_status[shipment.id])
+            if new_status != previous_status[shipment.id]:
+                shipment.picking_id.message_post(
+                    body=f"Estado Palletways actualizado: {status_names.get(new_status, new_status)}<br/>"
+                         f"Código PW: {vals['palletways_status_code']} - {vals['palletways_status_desc']}"
+                )
+                if new_status == 'delivered':
+                    delivered |= shipment
+        
+        if delivered:
+            delivered._enqueue_pod()
+    
+    @api.model
+    def _write_per_record_column(self, field_name, values):
+        """
+        Escribir un valor distinto por envío en una sola UPDATE (por cada
+        1000 envíos), a través del cursor de Odoo.
+        Solo para columnas sin campos dependientes (STATUS_PER_RECORD_COLUMNS);
+        write_date/write_uid ya los actualiza el write agrupado.
+        """
+        self.flush_model([field_name])
+        template = f"(%s, %s::{STATUS_PER_RECORD_COLUMNS[field_name]})"
+        for chunk in split_every(1000, values):
+            rows = ', '.join(
+                self.env.cr.mogrify(template, (record_id, value or None)).decode()
+                for record_id, value in chunk
             )
+            self.env.cr.execute(f"""
+                UPDATE palletways_shipment AS shipment
+                   SET {field_name} = new.value
+                  FROM (VALUES {rows}) AS new(id, value)
+                 WHERE shipment.id = new.id
+            """)
+        self.browse([record_id for record_id, value in values]).invalidate_recordset([field_name])
+    
+    def _enqueue_pod(self):
+        """
+        ✅ NUEVO v2.6.0:
+        Poner en cola la descarga del POD de los envíos recién entregados
+        y lanzar el cron de descarga
+        """
+        to_enqueue = self.filtered(lambda s: not s.pod_fetched_at and not s.tracking_id.startswith(('TEST-', 'TEMP-')))
+        if not to_enqueue:
+            return
+        to_enqueue.write({
+            'pod_state': 'pending',
+            'pod_attempts': 0,
+            'pod_next_attempt_at': fields.Datetime.now(),
+        })
+        self.env.ref('palletways_service_integration.cron_harvest_palletways_pods')._trigger()
+    
+    def _get_document_attachment(self, field_name):
+        """Adjunto ir.attachment que guarda el campo binario `field_name`"""
+        self.ensure_one()
+        return self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', '=', field_name),
+            ('res_id', '=', self.id),
+        ], limit=1)
+    
+    def _store_document(self, field_name, content, filename):
+        """
+        ✅ NUEVO v2.6.0: Guardar un PDF descargado en el adjunto del campo,
+        con los bytes tal cual (sin pasar por base64). Si el contenido no ha
+        cambiado (mismo checksum) no se reescribe nada.
+        Devuelve el adjunto.
+        """
+        attachment = self._get_document_attachment(field_name)
+        checksum = self.env['ir.attachment']._compute_checksum(content)
+        
+        if attachment and attachment.checksum == checksum:
+            _logger.info(f"{field_name} de {self.tracking_id} sin cambios, no se reescribe")
+        elif attachment:
+            attachment.write({'raw': content, 'name': filename})
+        else:
+            attachment = self.env['ir.attachment'].sudo().create({
+                'name': filename,
+                'raw': content,
+                'res_model': self._name,
+                'res_field': field_name,
+                'res_id': self.id,
+                'mimetype': 'application/pdf',
+            })
+        # El campo binario lee del adjunto: invalidar la caché del registro
+        self.invalidate_recordset([field_name])
+        return attachment
+    
+    def _document_url(self, attachment):
+        """Descarga servida directamente desde el filestore"""
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f'/web/content/{attachment.id}?download=true',
+            'target': 'new',
+        }
     
     def action_download_labels(self):
         """Descargar etiquetas PDF según documentación oficial página 12"""
@@ -305,29 +556,56 @@ class PalletwaysShipment(models.Model):
                 "Configure su API Key con permisos de creación y desactive el modo test."
             )
         
+        # ✅ NUEVO v2.6.0: La etiqueta ya descargada se sirve sin volver a pedirla
+        # (contexto palletways_force_download para forzar la descarga)
+        attachment = self._get_document_attachment('label_pdf')
+        if attachment and self.label_fetched_at and not self.env.context.get('palletways_force_download'):
+            return self._document_url(attachment)
+        
         try:
             client = self._get_api_client()
             pdf_data = client.get_labels(self.tracking_id)
             
-            self.write({
-                'label_pdf': base64.b64encode(pdf_data),
-            })
+            attachment = self._store_document('label_pdf', pdf_data, self.label_filename)
+            self.label_fetched_at = fields.Datetime.now()
             
-            self.message_post(
+            self.picking_id.message_post(
                 body="Etiquetas descargadas correctamente",
                 message_type='comment'
             )
             
-            return {
-                'type': 'ir.actions.act_url',
-                'url': f'/web/content/palletways.shipment/{self.id}/label_pdf/{self.label_filename}?download=true',
-                'target': 'new',
-            }
+            return self._document_url(attachment)
             
         except Exception as e:
             _logger.error(f"Error descargando etiquetas {self.tracking_id}: {e}")
             raise UserError(f"Error descargando etiquetas: {e}")
     
+    def action_download_labels_batch(self):
+        """
+        ✅ NUEVO v2.6.0:
+        Etiquetas de varios envíos en un único PDF listo para imprimir.
+        Hasta palletways.label_batch_sync_limit envíos se genera al momento;
+        los lotes mayores se procesan en segundo plano y se abre el lote
+        para seguir su progreso.
+        """
+        batch = self.env['palletways.label.batch']._create_for(self)
+        sync_limit = int(self.env['ir.config_parameter'].sudo().get_param(
+            'palletways.label_batch_sync_limit', 20))
+        
+        if batch.total_count <= sync_limit:
+            if not batch._run():
+                raise UserError(f"No se pudieron obtener las etiquetas:\n{batch.last_error}")
+            return batch.action_download()
+        
+        self.env.ref('palletways_service_integration.cron_process_palletways_label_batches')._trigger()
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': 'palletways.label.batch',
+            'res_id': batch.id,
+            'view_mode': 'form',
+            'target': 'current',
+        }
+    
     def action_download_pod(self):
         """Descargar comprobante de entrega según documentación oficial página 12"""
         self.ensure_one()
@@ -343,24 +621,28 @@ class PalletwaysShipment(models.Model):
         if self.status != 'delivered':
             raise UserError("El comprobante de entrega solo está disponible cuando el envío ha sido entregado")
         
+        # ✅ NUEVO v2.6.0: El POD no cambia una vez emitido; no se vuelve a pedir
+        attachment = self._get_document_attachment('pod_pdf')
+        if attachment and self.pod_fetched_at and not self.env.context.get('palletways_force_download'):
+            return self._document_url(attachment)
+        
         try:
             client = self._get_api_client()
             pod_data = client.get_pod(self.tracking_id)
             
+            attachment = self._store_document('pod_pdf', pod_data, self.pod_filename)
             self.write({
-                'pod_pdf': base64.b64encode(pod_data),
+                'pod_fetched_at': fields.Datetime.now(),
+                'pod_state': 'done',
+                'pod_next_attempt_at': False,
             })
             
-            self.message_post(
+            self.picking_id.message_post(
                 body="Comprobante de entrega descargado correctamente",
                 message_type='comment'
             )
             
-            return {
-                'type': 'ir.actions.act_url', 
-                'url': f'/web/content/palletways.shipment/{self.id}/pod_pdf/{self.pod_filename}?download=true',
-                'target': 'new',
-            }
+            return self._document_url(attachment)
             
         except Exception as e:
             _logger.error(f"Error descargando POD {self.tracking_id}: {e}")
@@ -389,29 +671,206 @@ class PalletwaysShipment(models.Model):
         
         return carrier.palletways_api_client_id
     
+    @api.model
+    def _get_next_poll_at(self, status, pw_status, status_changed_at):
+        """
+        ✅ NUEVO v2.6.0:
+        Calcular la próxima consulta según estado, código PW y antigüedad
+        del último cambio. False = no volver a consultar
+        """
+        if status in POLL_FINAL_STATUSES:
+            return False
+        
+        now = fields.Datetime.now()
+        idle = now - (status_changed_at or now)
+        
+        if idle >= timedelta(days=POLL_GIVE_UP_DAYS):
+            return False
+        if idle >= timedelta(days=POLL_STALE_DAYS):
+            minutes = POLL_STALE_INTERVAL
+        else:
+            minutes = POLL_INTERVAL_BY_CODE.get(pw_status) or POLL_INTERVAL_BY_STATUS.get(status, POLL_STALE_INTERVAL)
+        
+        return now + timedelta(minutes=minutes)
+    
     @api.model
     def cron_update_shipment_status(self):
-        """Cron para actualizar estados automáticamente"""
-        # Buscar envíos no entregados de los últimos 30 días
+        """
+        ✅ CORRECCIÓN v2.6.0:
+        Cron para actualizar estados automáticamente
+        Solo consulta los envíos cuya próxima consulta (next_poll_at) ha
+        vencido, por orden de vencimiento y hasta palletways.status_refresh_max_per_run
+        """
+        max_per_run = int(self.env['ir.config_parameter'].sudo().get_param(
+            'palletways.status_refresh_max_per_run', 2000))
+        
         domain = [
-            ('status', 'not in', ['delivered', 'error']),
-            ('create_date', '>=', fields.Datetime.now() - timedelta(days=30))
+            ('next_poll_at', '!=', False),
+            ('next_poll_at', '<=', fields.Datetime.now()),
+            ('status', 'not in', list(POLL_FINAL_STATUSES)),
         ]
         
-        shipments = self.search(domain, limit=50)  # Limitar para no exceder rate limit
+        shipments = self.search(domain, order='next_poll_at, id', limit=max_per_run or None)
         
         _logger.info(f"Actualizando {len(shipments)} envíos Palletways")
         
-        for shipment in shipments:
+        updated_count, error_count = shipments._refresh_status_batch(commit=True)
+        
+        _logger.info(f"Estados Palletways: {updated_count} actualizados, {error_count} errores")
+        return True
+    
+    def _refresh_status_batch(self, commit=False):
+        """
+        ✅ NUEVO v2.6.0:
+        Motor de refresco de estados por lotes
+        1. Agrupa los envíos por cliente API
+        2. Consulta getConsignment en paralelo (hilos limitados por el token bucket)
+        3. Aplica los resultados con writes agrupados
+        4. Hace commit cada `palletways.status_refresh_chunk_size` envíos si `commit`
+        
+        Devuelve (actualizados, errores)
+        """
+        params = self.env['ir.config_parameter'].sudo()
+        chunk_size = int(params.get_param('palletways.status_refresh_chunk_size', 200))
+        max_workers = int(params.get_param('palletways.status_refresh_workers', 4))
+        
+        updated_count = 0
+        error_count = 0
+        
+        test_shipments = self.filtered(lambda s: s.tracking_id.startswith(('TEST-', 'TEMP-')))
+        for shipment in test_shipments:
+            shipment._simulate_test_status_update()
+            updated_count += 1
+        
+        shipments_by_client = defaultdict(lambda: self.browse())
+        for shipment in self - test_shipments:
             try:
-                shipment.action_update_status()
-                self.env.cr.commit()  # Commit individual para evitar rollback total
-            except Exception as e:
-                _logger.error(f"Error en cron actualizando {shipment.tracking_id}: {e}")
+                shipments_by_client[shipment._get_api_client()] |= shipment
+            except UserError as e:
+                error_count += 1
+                _logger.error(f"Envío {shipment.tracking_id} sin cliente API: {e}")
+        
+        for client, client_shipments in shipments_by_client.items():
+            for chunk in split_every(chunk_size, client_shipments.ids, self.browse):
+                results = client._call_concurrent(
+                    'get_consignment_status',
+                    [(shipment.tracking_id,) for shipment in chunk],
+                    max_workers=max_workers,
+                )
+                chunk_updated, chunk_errors = chunk._apply_status_results(results)
+                updated_count += chunk_updated
+                error_count += chunk_errors
+                
+                if commit:
+                    self.env.cr.commit()
+        
+        return updated_count, error_count
+    
+    def _apply_status_results(self, results):
+        """Aplicar resultados (respuesta, error) alineados con self; devuelve (ok, errores)"""
+        shipment_vals = []
+        event_vals = []
+        failed = self.browse()
+        
+        for shipment, (status_data, error) in zip(self, results):
+            if error:
+                failed |= shipment
+                _logger.error(f"Error actualizando estado {shipment.tracking_id}: {error}")
+                continue
+            
+            status_data = palletways_normalizer.normalize(status_data)
+            if not status_data.ok:
+                failed |= shipment
+                _logger.error(f"Error API para {shipment.tracking_id}: {status_data.status.description or 'Error desconocido'}")
                 continue
+            
+            update_vals = shipment._prepare_status_vals(status_data)
+            if update_vals:
+                shipment_vals.append((shipment, update_vals))
+                event_vals.extend(shipment._prepare_status_events(status_data, update_vals))
+        
+        if shipment_vals:
+            self._write_status_vals(shipment_vals, event_vals)
+        
+        # No reintentar en cada ejecución los envíos que fallan
+        if failed:
+            failed.write({
+                'next_poll_at': fields.Datetime.now() + timedelta(minutes=POLL_ERROR_INTERVAL),
+            })
+        
+        return len(shipment_vals), len(failed)
+    
+    @api.model
+    def cron_harvest_pods(self):
+        """
+        ✅ NUEVO v2.6.0:
+        Cron: descargar los POD pendientes cuyo próximo intento ha vencido,
+        hasta palletways.pod_harvest_max_per_run por ejecución.
+        Las descargas van en paralelo por cliente API, en bloques de
+        palletways.pod_harvest_chunk_size con palletways.pod_harvest_workers
+        hilos y el token bucket compartido; se hace commit tras cada bloque.
+        """
+        params = self.env['ir.config_parameter'].sudo()
+        max_per_run = int(params.get_param('palletways.pod_harvest_max_per_run', 500))
+        chunk_size = int(params.get_param('palletways.pod_harvest_chunk_size', 50))
+        max_workers = int(params.get_param('palletways.pod_harvest_workers', 4))
+        
+        shipments = self.search([
+            ('pod_state', '=', 'pending'),
+            ('pod_next_attempt_at', '<=', fields.Datetime.now()),
+        ], order='pod_next_attempt_at, id', limit=max_per_run or None)
+        
+        _logger.info(f"Descargando POD de {len(shipments)} envíos Palletways")
         
+        shipments_by_client = defaultdict(lambda: self.browse())
+        for shipment in shipments:
+            try:
+                shipments_by_client[shipment._get_api_client()] |= shipment
+            except UserError as e:
+                shipment._register_pod_failure(e)
+        
+        fetched_count = 0
+        for client, client_shipments in shipments_by_client.items():
+            for chunk in split_every(chunk_size, client_shipments.ids, self.browse):
+                results = client._call_concurrent(
+                    'get_pod',
+                    [(shipment.tracking_id,) for shipment in chunk],
+                    max_workers=max_workers,
+                )
+                fetched = self.browse()
+                for shipment, (pod_data, error) in zip(chunk, results):
+                    if error:
+                        shipment._register_pod_failure(error)
+                        continue
+                    shipment._store_document('pod_pdf', pod_data, shipment.pod_filename)
+                    fetched |= shipment
+                
+                fetched.write({
+                    'pod_fetched_at': fields.Datetime.now(),
+                    'pod_state': 'done',
+                    'pod_next_attempt_at': False,
+                })
+                fetched_count += len(fetched)
+                self.env.cr.commit()
+        
+        _logger.info(f"POD Palletways: {fetched_count} descargados de {len(shipments)}")
         return True
     
+    def _register_pod_failure(self, error):
+        """POD aún no publicado o error: reintento con espera creciente hasta POD_MAX_ATTEMPTS"""
+        attempts = self.pod_attempts + 1
+        vals = {'pod_attempts': attempts}
+        
+        if attempts >= POD_MAX_ATTEMPTS:
+            vals.update({'pod_state': 'failed', 'pod_next_attempt_at': False})
+            _logger.error(f"POD de {self.tracking_id} no disponible tras {attempts} intentos: {error}")
+        else:
+            delay = min(POD_BACKOFF_BASE * 2 ** (attempts - 1), POD_BACKOFF_MAX)
+            vals['pod_next_attempt_at'] = fields.Datetime.now() + timedelta(minutes=delay)
+            _logger.info(f"POD de {self.tracking_id} intento {attempts} fallido, reintento en {delay} min: {error}")
+        
+        self.write(vals)
+    
     def _simulate_test_status_update(self):
         """Simular actualización de estado para envíos TEST"""
         import random
@@ -430,6 +889,8 @@ class PalletwaysShipment(models.Model):
                 'palletways_status_code': f'TEST-{random.randint(100, 900)}',
                 'palletways_status_desc': f'Estado simulado: {new_status.upper()}',
                 'last_update': fields.Datetime.now(),
+                'status_changed_at': fields.Datetime.now(),
+                'next_poll_at': self._get_next_poll_at(new_status, False, fields.Datetime.now()),
             })
             
             status_names = dict(self._fields['status'].selection)
@@ -439,41 +900,163 @@ class PalletwaysShipment(models.Model):
             )
     
     def action_get_notes(self):
-        """Obtener notas del envío desde Palletways según documentación oficial página 11"""
-        self.ensure_one()
-        
+        """
+        ✅ CORRECCIÓN v2.6.0:
+        Sincronizar las notas del envío desde Palletways (página 11).
+        Solo se guardan y publican las notas nuevas desde la última sincronización.
+        """
         try:
-            client = self._get_api_client()
-            notes_data = client.get_notes(self.tracking_id)
-            
-            if notes_data.get('Status', {}).get('Code') == 'OK':
-                detail = notes_data.get('Detail', {}).get('Data', [])
-                if not isinstance(detail, list):
-                    detail = [detail] if detail else []
-                
-                notes_text = []
-                for note in detail: 
-                    note_date = note.get('NoteDate', '')
-                    note_time = note.get('NoteTime', '')
-                    note_text = note.get('NoteText', '')
-                    
-                    if note_text:
-                        notes_text.append(f"{note_date} {note_time}: {note_text}")
-                
-                if notes_text:
-                    self.notes = '\n'.join(notes_text)
-                    self.message_post(
-                        body=f"Notas actualizadas desde Palletways:\n{self.notes}",
-                        message_type='comment'
-                    )
-                else:
-                    self.message_post(
-                        body="No hay notas disponibles en Palletways",
-                        message_type='comment'
-                    )
-            else:
-                raise UserError("Error obteniendo notas desde Palletways")
-                
+            new_counts, errors = self._sync_notes_batch()
         except Exception as e:
-            _logger.error(f"Error obteniendo notas {self.tracking_id}: {e}")
+            _logger.error(f"Error obteniendo notas {self.mapped('tracking_id')}: {e}")
             raise UserError(f"Error obteniendo notas: {e}")
+        
+        if errors and len(self) == 1:
+            raise UserError(f"Error obteniendo notas: {errors[self.id]}")
+        
+        for shipment in self:
+            if shipment.id in errors:
+                shipment.picking_id.message_post(
+                    body=f"Error obteniendo notas: {errors[shipment.id]}",
+                    message_type='comment'
+                )
+            elif not new_counts.get(shipment.id):
+                shipment.picking_id.message_post(
+                    body="No hay notas nuevas en Palletways",
+                    message_type='comment'
+                )
+        
+        new_total = sum(new_counts.values())
+        if not errors:
+            message = f'Notas sincronizadas: {new_total} nuevas'
+            msg_type = 'success'
+        else:
+            failed = self.browse(list(errors)).mapped('tracking_id')
+            message = f'{new_total} notas nuevas, {len(errors)} errores ({", ".join(failed)})'
+            msg_type = 'warning' if new_counts else 'danger'
+        
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'message': message,
+                'type': msg_type,
+            }
+        }
+    
+    @api.model
+    def cron_sync_notes(self):
+        """
+        ✅ NUEVO v2.6.0:
+        Cron: sincronizar notas de los envíos abiertos (y de los entregados
+        en los últimos POLL_STALE_DAYS días), empezando por los consultados
+        hace más tiempo, hasta palletways.notes_sync_max_per_run
+        """
+        max_per_run = int(self.env['ir.config_parameter'].sudo().get_param(
+            'palletways.notes_sync_max_per_run', 1000))
+        
+        domain = [
+            ('tracking_id', 'not like', 'TEST-%'),
+            ('tracking_id', 'not like', 'TEMP-%'),
+            '|',
+            ('status', 'not in', list(POLL_FINAL_STATUSES)),
+            ('status_changed_at', '>=', fields.Datetime.now() - timedelta(days=POLL_STALE_DAYS)),
+        ]
+        shipments = self.search(domain, order='notes_synced_at asc nulls first, id', limit=max_per_run or None)
+        
+        _logger.info(f"Sincronizando notas de {len(shipments)} envíos Palletways")
+        new_counts, errors = shipments._sync_notes_batch(commit=True)
+        _logger.info(f"Notas Palletways: {sum(new_counts.values())} nuevas, {len(errors)} errores")
+        return True
+    
+    def _sync_notes_batch(self, commit=False):
+        """
+        Consultar getNotes en paralelo por cliente API pidiendo solo las notas
+        desde la marca de agua de cada envío, crear las nuevas en un único
+        create por bloque y publicar en cada envío solo las añadidas.
+        Devuelve ({id envío: notas nuevas}, {id envío: error})
+        """
+        params = self.env['ir.config_parameter'].sudo()
+        chunk_size = int(params.get_param('palletways.status_refresh_chunk_size', 200))
+        max_workers = int(params.get_param('palletways.status_refresh_workers', 4))
+        
+        new_counts = {}
+        errors = {}
+        shipments_by_client = defaultdict(lambda: self.browse())
+        for shipment in self.filtered(lambda s: not s.tracking_id.startswith(('TEST-', 'TEMP-'))):
+            try:
+                shipments_by_client[shipment._get_api_client()] |= shipment
+            except UserError as e:
+                errors[shipment.id] = str(e)
+        
+        for client, client_shipments in shipments_by_client.items():
+            for chunk in split_every(chunk_size, client_shipments.ids, self.browse):
+                results = client._call_concurrent(
+                    'get_notes_since',
+                    [(shipment.tracking_id, shipment.notes_high_water) for shipment in chunk],
+                    max_workers=max_workers,
+                )
+                for shipment, (notes, error) in zip(chunk, results):
+                    if error:
+                        errors[shipment.id] = str(error)
+                        _logger.error(f"Error obteniendo notas {shipment.tracking_id}: {error}")
+                new_counts.update(chunk._apply_notes(results))
+                
+                if commit:
+                    self.env.cr.commit()
+        
+        return new_counts, errors
+    
+    def _apply_notes(self, results):
+        """Guardar las notas nuevas de `results` (alineados con self); devuelve {id envío: nuevas}"""
+        now = fields.Datetime.now()
+        
+        # Notas ya guardadas desde la marca de agua (o sin fecha), para no duplicar
+        # las que comparten fecha con la última sincronizada
+        domain = [('shipment_id', 'in', self.ids)]
+        if all(self.mapped('notes_high_water')):
+            domain += ['|', ('note_at', '=', False), ('note_at', '>=', min(self.mapped('notes_high_water')))]
+        # sudo: las notas las crea la sincronización, no el usuario (solo lectura)
+        Note = self.env['palletways.shipment.note'].sudo()
+        existing = {
+            (note['shipment_id'][0], note['note_at'], note['text'])
+            for note in Note.search_read(domain, ['shipment_id', 'note_at', 'text'])
+        }
+        
+        note_vals = []
+        new_by_shipment = defaultdict(list)
+        high_water = {}
+        for shipment, (notes, error) in zip(self, results):
+            if error:
+                continue
+            for note_at, text in notes or []:
+                # search_read devuelve False (no None) para las notas sin fecha
+                key = (shipment.id, note_at or False, text)
+                if key in existing:
+                    continue
+                existing.add(key)
+                note_vals.append({'shipment_id': shipment.id, 'note_at': note_at, 'text': text})
+                new_by_shipment[shipment].append((note_at, text))
+                current = high_water.get(shipment) or shipment.notes_high_water
+                if note_at and (not current or note_at > current):
+                    high_water[shipment] = note_at
+        
+        if note_vals:
+            Note.create(note_vals)
+        
+        synced = self.browse([shipment.id for shipment, (notes, error) in zip(self, results) if not error])
+        synced.write({'notes_synced_at': now})
+        for shipment, note_at in high_water.items():
+            shipment.notes_high_water = note_at
+        
+        for shipment, notes in new_by_shipment.items():
+            lines = '<br/>'.join(
+                f"{fields.Datetime.to_string(note_at) if note_at else ''} {text}".strip()
+                for note_at, text in notes
+            )
+            shipment.picking_id.message_post(
+                body=f"Notas nuevas de Palletways ({len(notes)}):<br/>{lines}",
+                message_type='comment'
+            )
+        
+        return {shipment.id: len(new_by_shipment.get(shipment, [])) for shipment in synced}
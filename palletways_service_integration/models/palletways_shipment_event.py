@@ -0,0 +1,108 @@
+import logging
+from datetime import timedelta
+from odoo import models, fields, api
+from . import palletways_normalizer
+
+_logger = logging.getLogger(__name__)
+
+# Claves del registro Data de getConsignment con el depot actual
+EVENT_DEPOT_KEYS = ('Depot', 'CurrentDepot', 'DepotName', 'DeliveryDepot')
+
+
+class PalletwaysShipmentEvent(models.Model):
+    """
+    Historial de estados de un envío (solo se añaden filas).
+    Se registra un evento por creación y por cada cambio de estado, con el
+    registro Data de la respuesta como JSONB compacto; las consultas sin
+    cambios no escriben nada aquí.
+    """
+    _name = 'palletways.shipment.event'
+    _description = 'Evento de Envío Palletways'
+    _order = 'event_at desc, id desc'
+    _rec_name = 'palletways_status_code'
+
+    shipment_id = fields.Many2one('palletways.shipment', string='Envío',
+                                  required=True, ondelete='cascade', index=True, readonly=True)
+    event_at = fields.Datetime('Fecha', required=True, index=True, readonly=True,
+                               default=lambda self: fields.Datetime.now())
+    kind = fields.Selection([
+        ('created', 'Creación'),
+        ('status', 'Cambio de Estado'),
+    ], string='Tipo', required=True, default='status', readonly=True)
+    status = fields.Selection(selection='_get_status_selection', string='Estado', readonly=True)
+    palletways_status_code = fields.Char('Código Estado PW', readonly=True)
+    palletways_status_desc = fields.Char('Descripción Estado PW', readonly=True)
+    depot = fields.Char('Depot', readonly=True)
+    payload = fields.Json('Respuesta', readonly=True)
+
+    @api.model
+    def _get_status_selection(self):
+        return self.env['palletways.shipment']._fields['status'].selection
+
+    @api.model
+    def _record_payload(self, record):
+        """Registro normalizado (PwRecord) a algo serializable y compacto"""
+        return record.data or ({'text': record.text} if record.text else None)
+
+    @api.model
+    def _prepare_status_event(self, shipment, update_vals, record):
+        """Valores del evento para un cambio de estado (`record`: Data de getConsignment)"""
+        return {
+            'shipment_id': shipment.id,
+            'event_at': update_vals.get('last_update') or fields.Datetime.now(),
+            'kind': 'status',
+            'status': update_vals.get('status'),
+            'palletways_status_code': update_vals.get('palletways_status_code'),
+            'palletways_status_desc': update_vals.get('palletways_status_desc'),
+            'depot': next((str(record.get(key)) for key in EVENT_DEPOT_KEYS if record.get(key)), False),
+            'payload': self._record_payload(record),
+        }
+
+    @api.model
+    def _prepare_creation_event(self, api_response, tracking_id):
+        """
+        Evento de creación con solo el ImportDetail de este envío, no la
+        respuesta completa (que en un lote incluye todas las consignaciones)
+        """
+        detail = palletways_normalizer.normalize(api_response, detail_as_record=True).detail
+        record = next(
+            (record for record in detail if str(record.get('TrackingID', '')) == str(tracking_id)),
+            detail.first,
+        )
+        return {
+            'kind': 'created',
+            'status': 'created',
+            'payload': self._record_payload(record),
+        }
+
+    @api.autovacuum
+    def _gc_old_payloads(self):
+        """
+        Compactar: borrar las respuestas guardadas con más de
+        palletways.event_payload_retention_days días (los eventos se conservan),
+        y los antiguos volcados de texto de los envíos
+        """
+        days = int(self.env['ir.config_parameter'].sudo().get_param(
+            'palletways.event_payload_retention_days', 90))
+        if days <= 0:
+            return
+        cutoff = fields.Datetime.now() - timedelta(days=days)
+
+        self.env.cr.execute("""
+            UPDATE palletways_shipment_event
+               SET payload = NULL
+             WHERE payload IS NOT NULL
+               AND event_at < %s
+        """, [cutoff])
+        events = self.env.cr.rowcount
+        self.env.cr.execute("""
+            UPDATE palletways_shipment
+               SET last_status_response = NULL,
+                   api_response = NULL
+             WHERE (last_status_response IS NOT NULL OR api_response IS NOT NULL)
+               AND create_date < %s
+        """, [cutoff])
+        shipments = self.env.cr.rowcount
+        self.invalidate_model(['payload'])
+        self.env['palletways.shipment'].invalidate_model(['last_status_response', 'api_response'])
+        _logger.info(f"Respuestas Palletways compactadas: {events} eventos, {shipments} envíos")
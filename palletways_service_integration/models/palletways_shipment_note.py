@@ -0,0 +1,33 @@
+from datetime import datetime
+from odoo import models, fields
+
+NOTE_DATETIME_FORMATS = (
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%d/%m/%Y %H:%M:%S',
+    '%d/%m/%Y %H:%M',
+)
+
+
+def parse_note_datetime(note_date, note_time):
+    """NoteDate/NoteTime de getNotes a datetime; None si no se reconoce el formato"""
+    value = f"{(note_date or '').strip()} {(note_time or '00:00').strip()}"
+    for date_format in NOTE_DATETIME_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    return None
+
+
+class PalletwaysShipmentNote(models.Model):
+    """Nota de seguimiento de Palletways (getNotes), una línea por nota"""
+    _name = 'palletways.shipment.note'
+    _description = 'Nota de Envío Palletways'
+    _order = 'note_at, id'
+    _rec_name = 'text'
+
+    shipment_id = fields.Many2one('palletways.shipment', string='Envío',
+                                  required=True, ondelete='cascade', index=True)
+    note_at = fields.Datetime('Fecha')
+    text = fields.Text('Nota', required=True)
@@ -2,6 +2,7 @@ from odoo.exceptions import ValidationError
 from odoo import models, fields, api, _
 import datetime
 import json
+from collections import defaultdict
 import logging
 import time
 
@@ -16,11 +17,23 @@ class SaleOrder(models.Model):
     palletways_service_id = fields.Many2one("palletways.service", string="Palletways Service",
                                             help="palletways service", copy=False, ondelete='set null')
 
-    def get_service(self):
-        """Obtener servicios disponibles usando el nuevo cliente API"""
-        order = self
-        recipient_address = order.partner_shipping_id
-        sender_address = order and order.warehouse_id and order.warehouse_id.partner_id
+    @api.model
+    def _get_palletways_quote_carrier(self):
+        """Transportista Palletways con cliente API usado para consultar servicios"""
+        palletways_carrier = self.env['delivery.carrier'].search([
+            ('delivery_type', '=', 'palletways'),
+            ('palletways_api_client_id', '!=', False)
+        ], limit=1)
+        
+        if not palletways_carrier:
+            raise ValidationError("No hay transportista Palletways configurado con cliente API")
+        return palletways_carrier
+
+    def _get_palletways_route(self):
+        """(país origen, CP origen, país destino, CP destino) del pedido"""
+        self.ensure_one()
+        recipient_address = self.partner_shipping_id
+        sender_address = self.warehouse_id.partner_id
 
         if not sender_address.zip or not sender_address.country_id:
             raise ValidationError(
@@ -29,76 +42,103 @@ class SaleOrder(models.Model):
             raise ValidationError(
                 "Para obtener servicios se requiere código postal y país del destinatario")
 
-        # Buscar transportista Palletways configurado
-        palletways_carrier = self.env['delivery.carrier'].search([
-            ('delivery_type', '=', 'palletways'),
-            ('palletways_api_client_id', '!=', False)
-        ], limit=1)
-        
-        if not palletways_carrier:
-            raise ValidationError("No hay transportista Palletways configurado con cliente API")
+        return (
+            sender_address.country_id.code,
+            sender_address.zip.replace(' ', '').upper(),
+            recipient_address.country_id.code,
+            recipient_address.zip.replace(' ', '').upper(),
+        )
+
+    def action_palletways_quote_services(self):
+        """
+        ✅ NUEVO v2.6.0: Consultar servicios Palletways de varios pedidos a la vez
+        Las rutas repetidas se consultan una sola vez, las distintas en paralelo
+        (respetando el rate limit), y el resultado se guarda en un único lote
+        """
+        palletways_carrier = self._get_palletways_quote_carrier()
+        api_client = palletways_carrier.palletways_api_client_id
+        workers = int(self.env['ir.config_parameter'].sudo().get_param(
+            'palletways.status_refresh_workers', 4))
+
+        errors = []
+        orders_by_route = defaultdict(lambda: self.browse())
+        for order in self:
+            try:
+                orders_by_route[order._get_palletways_route()] |= order
+            except ValidationError as e:
+                errors.append(f"{order.name}: {e}")
+
+        services_by_route = {}
+        to_fetch = []
+        for route in orders_by_route:
+            services = api_client._get_cached_services(*route)
+            if services is None:
+                to_fetch.append(route)
+            else:
+                services_by_route[route] = services
+
+        results = api_client._call_concurrent(
+            'get_available_services', [(*route, 'D', False) for route in to_fetch], max_workers=workers)
+        for route, (services, error) in zip(to_fetch, results):
+            if error:
+                errors.extend(f"{order.name}: {error}" for order in orders_by_route[route])
+            else:
+                services_by_route[route] = services
+
+        services_by_order = {
+            order: services
+            for route, services in services_by_route.items()
+            for order in orders_by_route[route]
+        }
+        stats = self.env['palletways.service'].sudo()._sync_order_services(services_by_order)
+
+        _logger.info(
+            f"Consulta múltiple Palletways: {len(services_by_order)} pedidos, {len(orders_by_route)} rutas "
+            f"({len(to_fetch)} consultadas a la API), {stats['created']} servicios creados, "
+            f"{stats['updated']} actualizados, {stats['deleted']} eliminados, {len(errors)} errores"
+        )
+
+        message = f"Servicios actualizados en {len(services_by_order)} pedidos ({len(orders_by_route)} rutas distintas)"
+        if errors:
+            message += "\nErrores:\n" + "\n".join(errors[:20])
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Servicios Palletways',
+                'message': message,
+                'type': 'warning' if errors else 'success',
+                'sticky': bool(errors),
+            },
+        }
+
+    def get_service(self):
+        """Obtener servicios disponibles usando el nuevo cliente API"""
+        order = self
+        route = order._get_palletways_route()
+        palletways_carrier = self._get_palletways_quote_carrier()
 
         try:
             # Usar el nuevo cliente API
             api_client = palletways_carrier.palletways_api_client_id
-            services_data = api_client.get_available_services(
-                sender_address.country_id.code,
-                sender_address.zip,
-                recipient_address.country_id.code,
-                recipient_address.zip,
-                'D'  # Delivery
-            )
+            available_services = api_client.get_available_services(*route, 'D')  # Delivery
             
-            _logger.info(f"Respuesta servicios: {json.dumps(services_data, indent=2)}")
-            
-            # CAMBIO PRINCIPAL: Manejar respuesta directa como lista
-            available_services = []
-            
-            if isinstance(services_data, list):
-                # Respuesta directa como lista (formato actual)
-                available_services = services_data
-            elif isinstance(services_data, dict):
-                # Formato estándar con Status/Detail
-                if services_data.get('Status', {}).get('Code') == 'OK':
-                    detail = services_data.get('Detail', {})
-                    available_services = detail.get('Data', [])
-                    
-                    # Manejar tanto lista como objeto único
-                    if isinstance(available_services, dict):
-                        available_services = [available_services]
-                else:
-                    error_msg = services_data.get('Status', {}).get('Description', 'Error desconocido')
-                    raise ValidationError(f"Error Palletways: {error_msg}")
-            else:
-                raise ValidationError("Formato de respuesta inesperado de la API")
+            if _logger.isEnabledFor(logging.DEBUG):
+                _logger.debug(f"Respuesta servicios: {json.dumps(available_services, indent=2)}")
             
             if not available_services:
                 raise ValidationError("No se encontraron servicios disponibles para esta ruta")
             
-            # Limpiar servicios existentes
-            existing_records = self.env['palletways.service'].search([
-                ('sale_order_id', '=', self.id)
-            ])
-            existing_records.sudo().unlink()
-            
-            # Crear registros de servicios
-            for service in available_services:
-                service_data = {
-                    'service_group_code': service.get('ServiceGroupCode', ''),
-                    'service_code': service.get('ServiceCode', ''),
-                    'service_name': service.get('ServiceName', ''),
-                    'service_group_name': service.get('ServiceGroupName', ''),
-                    'service_days_min': str(service.get('ServiceDaysMin', '')),
-                    'service_days_max': str(service.get('ServiceDaysMax', '')),
-                    'sale_order_id': self.id
-                }
-                
-                _logger.info(f"Creando servicio: {service_data}")
-                self.env['palletways.service'].sudo().create(service_data)
+            # Sincronizar servicios: conservar, actualizar, crear en lote y borrar los que ya no existen
+            stats = self.env['palletways.service'].sudo()._sync_order_services({order: available_services})
+            _logger.info(
+                f"Servicios pedido {order.name}: {stats['created']} creados, "
+                f"{stats['updated']} actualizados, {stats['deleted']} eliminados"
+            )
                 
             # Mensaje de éxito
             self.message_post(
-                body=f"Se encontraron {len(available_services)} servicios disponibles para la ruta {sender_address.zip} -> {recipient_address.zip}"
+                body=f"Se encontraron {len(available_services)} servicios disponibles para la ruta {route[1]} -> {route[3]}"
             )
                 
         except Exception as e:
@@ -36,6 +36,14 @@ class StockPicking(models.Model):
         compute='_compute_palletways_tracking_url'
     )
 
+    palletways_job_ids = fields.One2many('palletways.consignment.job', 'picking_id',
+                                         string='Trabajos Envío Palletways')
+    palletways_job_state = fields.Selection([
+        ('pending', 'Pendiente'),
+        ('sent', 'Enviado'),
+        ('failed', 'Fallido'),
+    ], string='Estado Envío Asíncrono', compute='_compute_palletways_job_state')
+
     def _compute_delivery_type(self):
         """Calcular tipo de entrega de forma segura sin @depends problemático"""
         for picking in self:
@@ -62,6 +70,12 @@ class StockPicking(models.Model):
             else:
                 picking.palletways_tracking_url = False
 
+    @api.depends('palletways_job_ids.state')
+    def _compute_palletways_job_state(self):
+        for picking in self:
+            jobs = picking.palletways_job_ids.sorted('id', reverse=True)
+            picking.palletways_job_state = jobs[:1].state or False
+
     def button_validate(self):
         """
         ✅ CORRECCIÓN v2.1.8: Capturar excepción correctamente con 'as e'
@@ -79,6 +93,15 @@ class StockPicking(models.Model):
         """
         _logger.info(f"button_validate() iniciado para {self.name}")
         
+        # ✅ NUEVO v2.6.0: Modo asíncrono - validar y encolar el envío
+        if self.carrier_id and self.carrier_id.delivery_type == 'palletways' \
+                and self.carrier_id.palletways_async_send:
+            res = super().button_validate()
+            done_pickings = self.filtered(lambda p: p.state == 'done')
+            if done_pickings:
+                self.env['palletways.consignment.job']._enqueue(done_pickings)
+            return res
+        
         # Verificar si este picking tiene transportista Palletways
         if self.carrier_id and self.carrier_id.delivery_type == 'palletways':
             _logger.info(f"Picking {self.name} usa transportista Palletways")
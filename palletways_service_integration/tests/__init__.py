@@ -0,0 +1,8 @@
+from . import test_palletways_shipment
+from . import test_palletways_api_client
+from . import test_palletways_shipment_note
+from . import test_palletways_normalizer
+from . import test_palletways_label_batch
+from . import test_delivery_carrier
+from . import test_palletways_service
+from . import test_palletways_consignment_job
@@ -0,0 +1,63 @@
+from contextlib import contextmanager
+from unittest.mock import patch
+from odoo.tests.common import TransactionCase
+
+
+class PalletwaysTestCommon(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partner = cls.env['res.partner'].create({'name': 'Cliente Palletways Test'})
+        cls.picking_type = cls.env.ref('stock.picking_type_out')
+        cls.api_client = cls.env['palletways.api.client'].create({
+            'name': 'Cliente API Test',
+            'api_key': 'test-key',
+            'account_code': 'TEST',
+        })
+        cls.carrier = cls.env['delivery.carrier'].create({
+            'name': 'Palletways Test',
+            'delivery_type': 'palletways',
+            'palletways_api_client_id': cls.api_client.id,
+            'product_id': cls.env['product.product'].create({
+                'name': 'Envío Palletways Test',
+                'type': 'service',
+            }).id,
+        })
+
+    @classmethod
+    def _create_picking(cls):
+        return cls.env['stock.picking'].create({
+            'partner_id': cls.partner.id,
+            'picking_type_id': cls.picking_type.id,
+            'location_id': cls.picking_type.default_location_src_id.id,
+            'location_dest_id': cls.env.ref('stock.stock_location_customers').id,
+            'carrier_id': cls.carrier.id,
+        })
+
+    @classmethod
+    def _create_shipment(cls, tracking_id, **vals):
+        return cls.env['palletways.shipment'].create(dict({
+            'tracking_id': tracking_id,
+            'picking_id': cls._create_picking().id,
+        }, **vals))
+
+    @contextmanager
+    def _inline_api_calls(self):
+        """
+        _call_concurrent en el hilo del test (los hilos abren cursores propios
+        que no ven los datos del test) y sin commits intermedios de los crons
+        """
+        def call_inline(client, method_name, args_list, max_workers=4):
+            results = []
+            for args in args_list:
+                try:
+                    results.append((getattr(client, method_name)(*args), None))
+                except Exception as e:
+                    results.append((None, e))
+            return results
+
+        Client = self.env.registry['palletways.api.client']
+        with patch.object(Client, '_call_concurrent', call_inline), \
+                patch.object(self.env.cr, 'commit'):
+            yield
@@ -0,0 +1,62 @@
+from unittest.mock import patch
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+from .common import PalletwaysTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestPalletwaysBatchSend(PalletwaysTestCommon):
+
+    @staticmethod
+    def _manifest_response(import_details):
+        return {'Status': {'Code': 'OK', 'Description': 'OK'}, 'Detail': {'ImportDetail': import_details}}
+
+    def test_response_ids_follow_import_id(self):
+        shipment_data_list = [{'import_id': 'A'}, {'import_id': 'B'}, {'import_id': 'C'}]
+        response = self._manifest_response([
+            {'ImportID': 'B', 'ResponseID': 'PW-2'},
+            {'ImportID': 'A', 'ResponseID': 'PW-1'},
+        ])
+        self.assertEqual(
+            self.carrier._process_batch_api_response(response, shipment_data_list, self.api_client),
+            ['PW-1', 'PW-2', ''],
+        )
+
+    def test_response_ids_by_position_without_import_id(self):
+        shipment_data_list = [{'import_id': 'A'}, {'import_id': 'B'}]
+        response = self._manifest_response([{'ResponseID': 'PW-1'}, {'ResponseID': 'PW-2'}])
+        self.assertEqual(
+            self.carrier._process_batch_api_response(response, shipment_data_list, self.api_client),
+            ['PW-1', 'PW-2'],
+        )
+
+    def test_error_status_raises(self):
+        response = {'Status': {'Code': 'ERR', 'Description': 'Cuenta no válida'}, 'Detail': {}}
+        with self.assertRaisesRegex(UserError, 'Cuenta no válida'):
+            self.carrier._process_batch_api_response(response, [{'import_id': 'A'}], self.api_client)
+
+    def _send_batch(self, pickings, import_details):
+        Carrier = self.env.registry['delivery.carrier']
+        Client = self.env.registry['palletways.api.client']
+        with patch.object(Carrier, '_validate_palletways_picking', autospec=True), \
+                patch.object(Carrier, '_prepare_palletways_shipment_data', autospec=True,
+                             side_effect=lambda carrier, picking: {'import_id': picking.name, 'weight': 100}), \
+                patch.object(Client, 'create_consignments', autospec=True,
+                             return_value=self._manifest_response(import_details)):
+            return self.carrier.palletways_send_shipping(pickings)
+
+    def test_booked_pickings_kept_when_others_fail(self):
+        booked, missing = self._create_picking(), self._create_picking()
+
+        results = self._send_batch(booked | missing, [{'ImportID': booked.name, 'ResponseID': 'PW-BOOKED'}])
+
+        self.assertEqual([result['tracking_number'] for result in results], ['PW-BOOKED', False])
+        self.assertEqual(booked.palletways_shipment_id.tracking_id, 'PW-BOOKED')
+        self.assertEqual(booked.carrier_tracking_ref, 'PW-BOOKED')
+        self.assertFalse(missing.palletways_shipment_id)
+        self.assertIn('No se recibió ResponseID', missing.message_ids[0].body)
+
+    def test_all_pickings_failed_raises(self):
+        pickings = self._create_picking() | self._create_picking()
+        with self.assertRaises(UserError):
+            self._send_batch(pickings, [{'ImportID': 'OTRO', 'ResponseID': 'PW-X'}])
@@ -0,0 +1,163 @@
+import io
+from unittest.mock import Mock, patch
+import requests
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+from odoo.addons.palletways_service_integration.models import palletways_api_client, palletways_http
+from .common import PalletwaysTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestPalletwaysServiceCache(PalletwaysTestCommon):
+
+    def test_clear_cache_invalidates_other_workers(self):
+        """Vaciar la caché deja obsoleta la LRU en memoria aunque no sea la del worker que la vacía"""
+        route = ('ES', '28001', 'ES', '08001')
+        route_key = self.env['palletways.service.cache']._route_key('D', *route)
+        services = [{'Code': 'B'}]
+        self.env['palletways.service.cache']._store(self.api_client, route_key, services, 24)
+        palletways_http.service_cache.put(self.api_client._get_service_memory_key(route_key), services, 3600)
+        self.assertEqual(self.api_client._get_cached_services(*route), services)
+
+        # Otro worker: su LRU no se entera de forget_services
+        with patch.object(palletways_http, 'forget_services'):
+            self.api_client._clear_service_cache()
+
+        self.assertIsNone(self.api_client._get_cached_services(*route))
+
+
+@tagged('post_install', '-at_install')
+class TestPalletwaysXmlRecords(PalletwaysTestCommon):
+
+    def test_only_detail_children_are_records(self):
+        xml = b"""<?xml version="1.0"?>
+            <Response>
+                <Status><Code>OK</Code></Status>
+                <Detail>
+                    <Data><NoteText>Uno</NoteText><Sub><Data>interno</Data></Sub></Data>
+                    <Data>solo texto</Data>
+                    <Data><NoteText>Dos</NoteText><Status>Abierto</Status></Data>
+                </Detail>
+            </Response>"""
+        records = list(palletways_http.iter_xml_records(io.BytesIO(xml)))
+        self.assertEqual(records, [
+            {'NoteText': 'Uno', 'Sub': {'Data': 'interno'}},
+            {'_text': 'solo texto'},
+            {'NoteText': 'Dos', 'Status': 'Abierto'},
+        ])
+
+    def test_error_status_raises(self):
+        xml = b"<Response><Status><Code>ERR</Code><Description>No existe</Description></Status></Response>"
+        with self.assertRaisesRegex(palletways_http.ResponseStatusError, 'No existe'):
+            list(palletways_http.iter_xml_records(io.BytesIO(xml)))
+
+
+@tagged('post_install', '-at_install')
+class TestPalletwaysRetry(PalletwaysTestCommon):
+
+    @staticmethod
+    def _response(status_code, headers=None):
+        return Mock(status_code=status_code, headers=headers or {})
+
+    def _send(self, endpoint, outcomes):
+        """_send_with_retry con una sesión que devuelve (o lanza) `outcomes` por orden"""
+        session = Mock()
+        session.request.side_effect = outcomes
+        Client = self.env.registry['palletways.api.client']
+        with patch.object(palletways_api_client.time, 'sleep') as sleep, \
+                patch.object(palletways_http.random, 'uniform', return_value=0.5), \
+                patch.object(Client, '_check_rate_limit', autospec=True) as check_rate_limit:
+            try:
+                return self.api_client._send_with_retry(session, 'GET', 'https://test', endpoint, {}, (5, 30))
+            finally:
+                self.requests = session.request.call_count
+                self.sleeps = [call.args[0] for call in sleep.call_args_list]
+                self.assertEqual(check_rate_limit.call_count, len(self.sleeps), "Cada reintento consume un token")
+
+    def test_queries_retry_transient_errors(self):
+        response = self._send('getConsignment/PW1', [
+            self._response(503), requests.exceptions.ReadTimeout(), self._response(200),
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.requests, 3)
+
+    def test_attempts_are_capped(self):
+        self.api_client.retry_max_attempts = 2
+        response = self._send('getConsignment/PW1', [self._response(503)] * 5)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.requests, 2)
+
+    def test_create_consignment_is_not_repeated_once_sent(self):
+        """5xx o timeout de lectura: Palletways pudo haber creado el envío"""
+        response = self._send('createConsignment', [self._response(503), self._response(200)])
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.requests, 1)
+
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            self._send('pc_psief', [requests.exceptions.ReadTimeout(), self._response(200)])
+        self.assertEqual(self.requests, 1)
+
+    def test_create_consignment_retries_429_and_unsent_requests(self):
+        response = self._send('createConsignment', [
+            self._response(429), requests.exceptions.ConnectTimeout(), self._response(200),
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.requests, 3)
+
+    def test_retry_after_is_honoured(self):
+        self._send('getConsignment/PW1', [self._response(429, {'Retry-After': '7'}), self._response(200)])
+        self.assertEqual(self.sleeps, [7.0])
+
+        self.api_client.retry_backoff_max = 5
+        self._send('getConsignment/PW1', [self._response(429, {'Retry-After': '120'}), self._response(200)])
+        self.assertEqual(self.sleeps, [5.0], "Retry-After limitado a retry_backoff_max")
+
+        self._send('getConsignment/PW1', [self._response(503), self._response(200)])
+        self.assertEqual(self.sleeps, [0.5], "Sin Retry-After: backoff con jitter")
+
+
+@tagged('post_install', '-at_install')
+class TestPalletwaysRateLimit(PalletwaysTestCommon):
+
+    def _new_client(self, **vals):
+        return self.env['palletways.api.client'].create(dict({
+            'name': 'Cliente Rate Limit',
+            'api_key': 'rate-key',
+            'account_code': 'RATE',
+            'rate_limit_max_wait': 0,
+        }, **vals))
+
+    def test_token_bucket_refills_over_time(self):
+        bucket = palletways_http.TokenBucket(2, 60)
+        self.assertEqual(bucket.take(), 0)
+        self.assertEqual(bucket.take(), 0)
+        self.assertAlmostEqual(bucket.take(), 30, delta=0.5, msg="2 por minuto: siguiente token en 30 s")
+
+        bucket._stamp -= 30
+        self.assertEqual(bucket.take(), 0)
+
+    def test_memory_backend_per_client(self):
+        client = self._new_client(rate_limit_per_minute=2)
+        other = self._new_client(rate_limit_per_minute=2)
+        client._check_rate_limit()
+        client._check_rate_limit()
+        with self.assertRaises(UserError):
+            client._check_rate_limit()
+        other._check_rate_limit()
+
+    def test_database_backend_is_shared(self):
+        """El bucket 'database' vive en palletways.rate.limit, no en el worker"""
+        # Los cursores propios de _take_token comparten la transacción del test
+        self.registry.enter_test_mode(self.env.cr)
+        self.addCleanup(self.registry.leave_test_mode)
+        client = self._new_client(rate_limit_per_minute=2, rate_limit_backend='database')
+
+        client._check_rate_limit()
+        client._check_rate_limit()
+        with self.assertRaises(UserError):
+            client._check_rate_limit()
+
+        bucket = self.env['palletways.rate.limit'].search([('client_id', '=', client.id)])
+        self.assertEqual(len(bucket), 1)
+        self.assertLess(bucket.tokens, 1)
+        self.assertNotIn(client._get_http_session_key(), palletways_http._buckets)
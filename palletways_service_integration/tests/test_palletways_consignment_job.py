@@ -0,0 +1,98 @@
+from datetime import timedelta
+from unittest.mock import patch
+from odoo import fields
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+from odoo.addons.palletways_service_integration.models.palletways_consignment_job import JOB_MAX_ATTEMPTS
+from .common import PalletwaysTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestPalletwaysConsignmentJob(PalletwaysTestCommon):
+
+    def _book(self, picking, tracking_id):
+        """Lo que hace _create_booked_shipments: envío creado y enlazado al albarán"""
+        shipment = self.env['palletways.shipment'].create({'tracking_id': tracking_id, 'picking_id': picking.id})
+        picking.palletways_shipment_id = shipment
+        return {'exact_price': 0.0, 'tracking_number': tracking_id, 'labels': []}
+
+    def _run_cron(self, side_effect):
+        Carrier = self.env.registry['delivery.carrier']
+        with self._inline_api_calls(), \
+                patch.object(Carrier, '_palletways_send_shipping_batch', autospec=True,
+                             side_effect=side_effect) as send_batch:
+            self.env['palletways.consignment.job'].cron_process_jobs()
+        return send_batch
+
+    def test_enqueue_skips_sent_and_queued_pickings(self):
+        Job = self.env['palletways.consignment.job']
+        new, queued, booked = self._create_picking(), self._create_picking(), self._create_picking()
+        Job._enqueue(queued)
+        self._book(booked, 'PW-BOOKED')
+
+        jobs = Job._enqueue(new | queued | booked)
+
+        self.assertEqual(jobs.picking_id, new)
+        self.assertEqual(jobs.state, 'pending')
+
+    def test_outcomes_drive_job_state(self):
+        sent, transient, unregistered = self._create_picking(), self._create_picking(), self._create_picking()
+        jobs = self.env['palletways.consignment.job']._enqueue(sent | transient | unregistered)
+
+        def send_batch(carrier, pickings):
+            return {
+                sent.id: (self._book(sent, 'PW-SENT'), None),
+                transient.id: (None, 'Timeout conectando con Palletways API'),
+                unregistered.id: ({'tracking_number': 'PW-ORPHAN'}, 'reservado pero no registrado'),
+            }
+
+        self._run_cron(send_batch)
+        job_sent, job_transient, job_unregistered = jobs
+
+        self.assertEqual(job_sent.state, 'sent')
+        self.assertEqual(job_sent.tracking_id, 'PW-SENT')
+
+        self.assertEqual(job_transient.state, 'pending')
+        self.assertEqual(job_transient.attempts, 1)
+        self.assertGreater(job_transient.next_attempt_at, fields.Datetime.now())
+
+        self.assertEqual(job_unregistered.state, 'failed', "Reservado sin registrar: sin reintento automático")
+        self.assertIn('no registrado', job_unregistered.last_error)
+
+        # El pendiente no vuelve a enviarse hasta su próximo intento
+        send_batch_mock = self._run_cron(send_batch)
+        self.assertFalse(send_batch_mock.called)
+
+    def test_batch_exception_keeps_booked_pickings(self):
+        booked, lost = self._create_picking(), self._create_picking()
+        jobs = self.env['palletways.consignment.job']._enqueue(booked | lost)
+
+        def send_batch(carrier, pickings):
+            self._book(booked, 'PW-PARTIAL')
+            raise RuntimeError('fallo después de reservar')
+
+        self._run_cron(send_batch)
+
+        self.assertEqual(jobs.mapped('state'), ['sent', 'pending'])
+        self.assertEqual(jobs[1].attempts, 1)
+
+    def test_gives_up_after_max_attempts(self):
+        job = self.env['palletways.consignment.job']._enqueue(self._create_picking())
+        job.attempts = JOB_MAX_ATTEMPTS - 1
+
+        self._run_cron(lambda carrier, pickings: {job.picking_id.id: (None, 'HTTP 503')})
+
+        self.assertEqual(job.state, 'failed')
+        self.assertEqual(job.attempts, JOB_MAX_ATTEMPTS)
+        job.action_retry()
+        self.assertEqual((job.state, job.attempts), ('pending', 0))
+        self.assertLessEqual(job.next_attempt_at, fields.Datetime.now() + timedelta(seconds=1))
+
+    def test_sent_jobs_cannot_be_retried(self):
+        picking = self._create_picking()
+        job = self.env['palletways.consignment.job']._enqueue(picking)
+        self._run_cron(lambda carrier, pickings: {picking.id: (self._book(picking, 'PW-DONE'), None)})
+
+        self.assertEqual(job.state, 'sent')
+        with self.assertRaises(UserError):
+            job.action_retry()
@@ -0,0 +1,101 @@
+import io
+from datetime import timedelta
+from unittest.mock import patch
+from odoo import fields
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+from odoo.tools.pdf import PdfFileReader, PdfFileWriter
+from .common import PalletwaysTestCommon
+
+
+def _pdf(pages=1):
+    writer = PdfFileWriter()
+    for _i in range(pages):
+        writer.addBlankPage(100, 100)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+@tagged('post_install', '-at_install')
+class TestPalletwaysLabelBatch(PalletwaysTestCommon):
+
+    def _shipments(self, count, prefix):
+        shipments = self.env['palletways.shipment'].browse()
+        for index in range(count):
+            shipments |= self._create_shipment(f'{prefix}-{index}')
+        return shipments
+
+    def _run(self, batch, labels):
+        """Procesar `batch` con get_labels devolviendo labels[tracking_id] (o lanzándolo si es excepción)"""
+        def get_labels(client, tracking_id):
+            label = labels[tracking_id]
+            if isinstance(label, Exception):
+                raise label
+            return label
+
+        Client = self.env.registry['palletways.api.client']
+        with self._inline_api_calls(), \
+                patch.object(Client, 'get_labels', autospec=True, side_effect=get_labels):
+            return batch._run()
+
+    def _merged_pages(self, batch):
+        attachment = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', batch._name),
+            ('res_field', '=', 'merged_pdf'),
+            ('res_id', '=', batch.id),
+        ])
+        self.assertEqual(len(attachment), 1)
+        return PdfFileReader(io.BytesIO(attachment.raw)).getNumPages()
+
+    def test_failed_download_marks_batch_partial(self):
+        shipments = self._shipments(3, 'PW-LB')
+        batch = self.env['palletways.label.batch']._create_for(shipments)
+        labels = {'PW-LB-0': _pdf(), 'PW-LB-1': ValueError('timeout'), 'PW-LB-2': _pdf(2)}
+
+        self.assertTrue(self._run(batch, labels))
+
+        self.assertEqual(batch.state, 'partial')
+        self.assertEqual((batch.done_count, batch.failed_count), (2, 1))
+        self.assertIn('PW-LB-1', batch.last_error)
+        self.assertEqual(self._merged_pages(batch), 3)
+
+    def test_chunked_merge_reports_unreadable_labels(self):
+        self.env['ir.config_parameter'].sudo().set_param('palletways.label_batch_merge_chunk', 2)
+        shipments = self._shipments(5, 'PW-LC')
+        batch = self.env['palletways.label.batch']._create_for(shipments)
+        labels = {shipment.tracking_id: _pdf() for shipment in shipments}
+        labels['PW-LC-3'] = b'no es un PDF'
+
+        self._run(batch, labels)
+
+        self.assertEqual(batch.state, 'partial', "Etiqueta no unida: el lote no queda como terminado")
+        self.assertEqual((batch.done_count, batch.failed_count), (4, 1))
+        self.assertIn('PW-LC-3', batch.last_error)
+        self.assertEqual(self._merged_pages(batch), 4)
+
+    def test_all_labels_merged(self):
+        shipments = self._shipments(2, 'PW-LD')
+        batch = self.env['palletways.label.batch']._create_for(shipments)
+
+        self._run(batch, {shipment.tracking_id: _pdf() for shipment in shipments})
+
+        self.assertEqual(batch.state, 'done')
+        self.assertFalse(batch.last_error)
+        self.assertEqual(self._merged_pages(batch), 2)
+
+    def test_retry_only_stale_running_batches(self):
+        batch = self.env['palletways.label.batch']._create_for(self._shipments(1, 'PW-LS'))
+        batch.state = 'running'
+        self.env.flush_all()
+        self.assertFalse(batch.is_stale)
+        with self.assertRaises(UserError):
+            batch.action_retry()
+
+        self.env.cr.execute(
+            "UPDATE palletways_label_batch SET write_date = %s WHERE id = %s",
+            [fields.Datetime.now() - timedelta(hours=2), batch.id])
+        batch.invalidate_recordset()
+        self.assertTrue(batch.is_stale)
+        batch.action_retry()
+        self.assertEqual(batch.state, 'pending')
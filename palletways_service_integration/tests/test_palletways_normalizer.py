@@ -0,0 +1,89 @@
+import time
+import xml.etree.ElementTree as ET
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase
+from odoo.addons.palletways_service_integration.models.palletways_normalizer import normalize
+
+
+def _legacy_walk(api_data, xml_to_dict=None):
+    """Recorrido manual anterior al normalizador (referencia)"""
+    if xml_to_dict is not None:
+        api_data = xml_to_dict(api_data)
+    status = api_data.get('Status', {})
+    if isinstance(status, list):
+        status = status[0] if status else {}
+    detail = api_data.get('Detail', {})
+    if isinstance(detail, list):
+        detail = detail[0] if detail else {}
+    data = detail.get('Data', {})
+    if isinstance(data, list):
+        data = data[0] if data else {}
+    return status.get('Code'), data.get('StatusCode')
+
+
+def _legacy_xml_to_dict(element):
+    """Conversión recursiva anterior (referencia)"""
+    result = {}
+    if element.text and element.text.strip():
+        result['_text'] = element.text.strip()
+    if element.attrib:
+        result['_attributes'] = element.attrib
+    for child in element:
+        child_data = _legacy_xml_to_dict(child)
+        if child.tag in result:
+            if not isinstance(result[child.tag], list):
+                result[child.tag] = [result[child.tag]]
+            result[child.tag].append(child_data)
+        else:
+            result[child.tag] = child_data
+    if len(result) == 1 and '_text' in result:
+        return result['_text']
+    return result
+
+
+@tagged('post_install', '-at_install')
+class TestPalletwaysNormalizer(BaseCase):
+
+    def test_status_and_records_in_any_shape(self):
+        for payload in (
+            {'Status': {'Code': 'OK'}, 'Detail': {'Data': {'StatusCode': '700'}}},
+            {'Status': [{'Code': 'OK'}], 'Detail': [{'Data': [{'StatusCode': '700'}, {'StatusCode': '800'}]}]},
+            {'Response': {'Status': {'Code': 'OK'}, 'Detail': {'Data': [{'StatusCode': '700'}]}}},
+            ET.fromstring("<Response><Status><Code>OK</Code></Status>"
+                          "<Detail><Data><StatusCode>700</StatusCode></Data></Detail></Response>"),
+        ):
+            response = normalize(payload)
+            self.assertTrue(response.ok, payload)
+            self.assertEqual(response.detail.first.get('StatusCode'), '700', payload)
+
+        self.assertFalse(normalize({'Status': 'ERROR', 'Detail': 'Sin datos'}).ok)
+        self.assertFalse(normalize({}).detail.first)
+
+    def test_faster_than_manual_walk(self):
+        """getConsignment con historial: normalize() sobre el XML frente a _xml_to_dict + dicts"""
+        events = ''.join(
+            f"<Event><Date>2024-01-{i % 28 + 1:02d}</Date><Code>{i}</Code>"
+            f"<Description>Evento {i}</Description></Event>"
+            for i in range(50)
+        )
+        root = ET.fromstring(
+            "<Response><Status><Code>OK</Code><Description>OK</Description></Status>"
+            "<Detail><Data><StatusCode>700</StatusCode><StatusDescription>En reparto</StatusDescription>"
+            "<ConNo>123</ConNo></Data>"
+            f"<History>{events}</History></Detail></Response>"
+        )
+        iterations = 500
+
+        start = time.perf_counter()
+        for _i in range(iterations):
+            expected = _legacy_walk(root, _legacy_xml_to_dict)
+        legacy = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _i in range(iterations):
+            response = normalize(root)
+            result = (response.status.code, response.detail.first.get('StatusCode'))
+        normalized = time.perf_counter() - start
+
+        self.assertEqual(result, expected)
+        self.assertLess(normalized, legacy, f"normalize() {normalized:.4f}s vs manual {legacy:.4f}s")
@@ -0,0 +1,52 @@
+from odoo.tests import tagged
+from .common import PalletwaysTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestPalletwaysServiceSync(PalletwaysTestCommon):
+
+    @staticmethod
+    def _api_service(group, code, name):
+        return {'ServiceGroupCode': group, 'ServiceCode': code, 'ServiceName': name,
+                'ServiceGroupName': f'Grupo {group}', 'ServiceDaysMin': 1, 'ServiceDaysMax': 2}
+
+    def test_sync_diffs_existing_services(self):
+        Service = self.env['palletways.service']
+        order = self.env['sale.order'].create({'partner_id': self.partner.id})
+        other_order = self.env['sale.order'].create({'partner_id': self.partner.id})
+
+        def existing(order, group, code, name):
+            return Service.create(dict(Service._prepare_service_vals(self._api_service(group, code, name)),
+                                       sale_order_id=order.id))
+
+        unchanged = existing(order, 'G1', 'A', 'Premium')
+        renamed = existing(order, 'G1', 'B', 'Economy')
+        withdrawn = existing(order, 'G2', 'C', 'Sábado')
+        duplicate = existing(order, 'G1', 'A', 'Premium')
+        untouched = existing(other_order, 'G2', 'C', 'Sábado')
+        order.palletways_service_id = unchanged
+
+        stats = Service._sync_order_services({order: [
+            self._api_service('G1', 'A', 'Premium'),
+            self._api_service('G1', 'B', 'Economy Plus'),
+            self._api_service('G3', 'D', 'Nuevo'),
+        ]})
+
+        self.assertEqual(stats, {'created': 1, 'updated': 1, 'deleted': 2})
+        self.assertFalse((withdrawn | duplicate).exists())
+        self.assertEqual(renamed.service_name, 'Economy Plus')
+        self.assertEqual(order.palletways_service_id, unchanged, "Las filas sin cambios conservan su id")
+        self.assertEqual(
+            sorted(order.palletways_service_ids.mapped(lambda s: (s.service_group_code, s.service_code))),
+            [('G1', 'A'), ('G1', 'B'), ('G3', 'D')],
+        )
+        self.assertTrue(untouched.exists(), "Los servicios de otros pedidos no se tocan")
+
+    def test_sync_without_changes_writes_nothing(self):
+        Service = self.env['palletways.service']
+        order = self.env['sale.order'].create({'partner_id': self.partner.id})
+        services = [self._api_service('G1', 'A', 'Premium')]
+        Service._sync_order_services({order: services})
+
+        self.assertEqual(Service._sync_order_services({order: services}),
+                         {'created': 0, 'updated': 0, 'deleted': 0})
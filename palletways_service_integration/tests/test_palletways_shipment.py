@@ -0,0 +1,122 @@
+from datetime import timedelta
+from unittest.mock import patch
+from odoo import fields
+from odoo.tests import tagged
+from .common import PalletwaysTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestPalletwaysShipmentPolling(PalletwaysTestCommon):
+
+    def _simulate_upgrade(self, shipment, last_update, create_date):
+        """Estado de un envío anterior a next_poll_at/status_changed_at"""
+        self.env.cr.execute("""
+            UPDATE palletways_shipment
+               SET status_changed_at = NULL, next_poll_at = NULL,
+                   last_update = %s, create_date = %s
+             WHERE id = %s
+        """, [last_update, create_date, shipment.id])
+        shipment.invalidate_recordset()
+
+    def test_create_schedules_first_poll(self):
+        shipment = self._create_shipment('PW-NEW')
+        self.assertTrue(shipment.status_changed_at)
+        self.assertTrue(shipment.next_poll_at)
+
+    def test_poll_index_matches_cron_domain(self):
+        """El predicado del índice parcial no depende de status (ver init)"""
+        self.env.cr.execute("""
+            SELECT indexdef FROM pg_indexes
+             WHERE tablename = 'palletways_shipment' AND indexname LIKE 'palletways_shipment_next_poll_at%%'
+        """)
+        indexdefs = [row[0] for row in self.env.cr.fetchall()]
+        self.assertEqual(len(indexdefs), 1)
+        self.assertIn('WHERE (next_poll_at IS NOT NULL)', indexdefs[0])
+
+        final = self._create_shipment('PW-FINAL', status='delivered')
+        final.write({'next_poll_at': final._get_next_poll_at('delivered', False, fields.Datetime.now())})
+        self.assertFalse(final.next_poll_at, "Estado final: fuera del índice")
+
+    def test_upgrade_backfill_uses_last_update(self):
+        now = fields.Datetime.now()
+        recent = self._create_shipment('PW-RECENT', status='in_transit')
+        stale = self._create_shipment('PW-STALE', status='in_transit')
+        never_updated = self._create_shipment('PW-NEVER', status='created')
+        delivered = self._create_shipment('PW-DELIVERED', status='delivered')
+
+        self._simulate_upgrade(recent, now - timedelta(days=2), now - timedelta(days=60))
+        self._simulate_upgrade(stale, now - timedelta(days=40), now - timedelta(days=45))
+        self._simulate_upgrade(never_updated, None, now - timedelta(days=3))
+        self._simulate_upgrade(delivered, now - timedelta(days=1), now - timedelta(days=5))
+
+        self.env['palletways.shipment'].init()
+
+        self.assertEqual(recent.status_changed_at, now - timedelta(days=2))
+        self.assertTrue(recent.next_poll_at)
+
+        self.assertEqual(stale.status_changed_at, now - timedelta(days=40))
+        self.assertFalse(stale.next_poll_at, "Más de 30 días sin cambios: no se vuelve a consultar")
+
+        self.assertEqual(never_updated.status_changed_at, now - timedelta(days=3))
+        self.assertTrue(never_updated.next_poll_at)
+
+        self.assertEqual(delivered.status_changed_at, now - timedelta(days=1))
+        self.assertFalse(delivered.next_poll_at)
+
+
+@tagged('post_install', '-at_install')
+class TestPalletwaysShipmentStatusWrites(PalletwaysTestCommon):
+
+    @staticmethod
+    def _status_response(code, con_no):
+        return {
+            'Status': {'Code': 'OK', 'Description': 'OK'},
+            'Detail': {'Data': {'StatusCode': code, 'StatusDescription': 'AT DELIVERY DEPOT', 'ConNo': con_no}},
+        }
+
+    def test_identical_status_values_are_written_together(self):
+        shipments = self.env['palletways.shipment'].browse()
+        for index in range(10):
+            shipments |= self._create_shipment(f'PW-GROUP-{index}', status='in_transit')
+        results = [(self._status_response('700', f'CON-{index}'), None) for index in range(10)]
+
+        Shipment = self.env.registry['palletways.shipment']
+        frozen_now = fields.Datetime.now()
+        with patch.object(fields.Datetime, 'now', return_value=frozen_now), \
+                patch.object(Shipment, 'write', autospec=True, side_effect=Shipment.write) as write, \
+                patch.object(self.env.cr, 'execute', wraps=self.env.cr.execute) as execute:
+            updated, errors = shipments._apply_status_results(results)
+
+        self.assertEqual((updated, errors), (10, 0))
+        self.assertEqual(write.call_count, 1, "Mismo estado para todos: un único write agrupado")
+        per_record_updates = [call for call in execute.call_args_list if 'FROM (VALUES' in str(call.args[0])]
+        self.assertEqual(len(per_record_updates), 2, "status_hash y consignment_number: una UPDATE cada uno")
+        self.assertEqual(set(shipments.mapped('status')), {'at_depot'})
+        self.assertEqual(shipments.mapped('consignment_number'), [f'CON-{index}' for index in range(10)])
+        self.assertEqual(len(set(shipments.mapped('status_hash'))), 10)
+
+
+@tagged('post_install', '-at_install')
+class TestPalletwaysShipmentDocuments(PalletwaysTestCommon):
+
+    def test_label_is_stored_and_reused(self):
+        shipment = self._create_shipment('PW-LABEL')
+        Client = self.env.registry['palletways.api.client']
+        with patch.object(Client, 'get_labels', autospec=True, return_value=b'%PDF-1.4 etiqueta') as get_labels:
+            action = shipment.action_download_labels()
+            self.assertEqual(shipment.action_download_labels(), action)
+
+        self.assertEqual(get_labels.call_count, 1, "La segunda descarga sale del filestore")
+        self.assertTrue(shipment.label_fetched_at)
+        self.assertEqual(shipment._get_document_attachment('label_pdf').raw, b'%PDF-1.4 etiqueta')
+        self.assertIn('Etiquetas descargadas', shipment.picking_id.message_ids[0].body)
+
+    def test_pod_is_stored(self):
+        shipment = self._create_shipment('PW-POD', status='delivered')
+        Client = self.env.registry['palletways.api.client']
+        with patch.object(Client, 'get_pod', autospec=True, return_value=b'%PDF-1.4 pod'):
+            shipment.action_download_pod()
+
+        self.assertEqual(shipment.pod_state, 'done')
+        self.assertTrue(shipment.pod_fetched_at)
+        self.assertEqual(shipment._get_document_attachment('pod_pdf').raw, b'%PDF-1.4 pod')
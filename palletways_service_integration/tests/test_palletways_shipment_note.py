@@ -0,0 +1,57 @@
+from datetime import datetime
+from unittest.mock import patch
+from odoo.tests import tagged
+from .common import PalletwaysTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestPalletwaysShipmentNotes(PalletwaysTestCommon):
+
+    NOTES = [
+        {'NoteDate': '2026-10-01', 'NoteTime': '09:30:00', 'NoteText': 'Recogido en origen'},
+        {'NoteDate': '2026-10-02', 'NoteTime': '11:00:00', 'NoteText': 'En depot de destino'},
+    ]
+
+    def _sync(self, notes):
+        Client = self.env.registry['palletways.api.client']
+        with self._inline_api_calls(), \
+                patch.object(Client, 'iter_notes', autospec=True, return_value=notes) as iter_notes:
+            self.env['palletways.shipment'].cron_sync_notes()
+        return iter_notes
+
+    def test_cron_stores_new_notes_once(self):
+        shipment = self._create_shipment('PW-NOTES', status='in_transit')
+
+        self._sync(self.NOTES)
+
+        self.assertEqual(shipment.note_ids.mapped('text'), ['Recogido en origen', 'En depot de destino'])
+        self.assertEqual(shipment.notes_high_water, datetime(2026, 10, 2, 11, 0))
+        self.assertTrue(shipment.notes_synced_at)
+        self.assertIn('Notas nuevas de Palletways (2)', shipment.picking_id.message_ids[0].body)
+
+        # La nota con la misma fecha que la marca de agua vuelve a llegar: no se duplica
+        newer = {'NoteDate': '2026-10-03', 'NoteTime': '08:00:00', 'NoteText': 'Entregado'}
+        self._sync(self.NOTES + [newer])
+
+        self.assertEqual(len(shipment.note_ids), 3)
+        self.assertEqual(shipment.notes_high_water, datetime(2026, 10, 3, 8, 0))
+        self.assertIn('Notas nuevas de Palletways (1)', shipment.picking_id.message_ids[0].body)
+
+    def test_undated_and_repeated_notes_are_deduplicated(self):
+        shipment = self._create_shipment('PW-NOTES-DUP', status='in_transit')
+        undated = {'NoteDate': '', 'NoteTime': '', 'NoteText': 'Llamar antes de entregar'}
+
+        self._sync([undated, undated, self.NOTES[0]])
+        self._sync([undated, self.NOTES[0]])
+
+        self.assertEqual(sorted(shipment.note_ids.mapped('text')), ['Llamar antes de entregar', 'Recogido en origen'])
+
+    def test_cron_skips_failed_shipments(self):
+        shipment = self._create_shipment('PW-NOTES-ERR', status='in_transit')
+        Client = self.env.registry['palletways.api.client']
+        with self._inline_api_calls(), \
+                patch.object(Client, 'iter_notes', autospec=True, side_effect=ValueError('timeout')):
+            self.env['palletways.shipment'].cron_sync_notes()
+
+        self.assertFalse(shipment.note_ids)
+        self.assertFalse(shipment.notes_synced_at)
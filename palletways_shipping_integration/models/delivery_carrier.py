@@ -8,6 +8,8 @@ import datetime
 import uuid
 import logging
 from urllib.parse import quote_plus
+# Normalizador común (sin ORM); se importa sin depender del addon, que es alternativo a este
+from odoo.addons.palletways_service_integration.models.palletways_normalizer import normalize
 
 _logger = logging.getLogger("Palletways")
 
@@ -141,27 +143,18 @@ class DeliveryCarrier(models.Model):
             if errors:
                 raise ValidationError(str(errors))
 
-            # Extraer detalles
-            detail_container = response_data.get('Detail') or response_data.get('Response', {}).get('Detail', {})
-            response_details = None
-            if isinstance(detail_container, dict):
-                response_details = detail_container.get('ImportDetail') or detail_container.get('Data') or detail_container
-            else:
-                response_details = detail_container
+            # Extraer detalles (ImportDetail, Data o el propio Detail)
+            response_details = normalize(response_data, detail_as_record=True).detail.records
 
             if not response_details:
                 raise ValidationError(_("Respuesta inesperada (sin detalles): %s") % str(response_data)[:1000])
 
-            if isinstance(response_details, dict):
-                response_details = [response_details]
-
             tracking_ls = []
             con_no_from_api = None
             for rd in response_details:
-                if isinstance(rd, dict):
-                    if rd.get('TrackingID'):
-                        tracking_ls.append(str(rd.get('TrackingID')))
-                    con_no_from_api = con_no_from_api or rd.get('ConsignmentNo') or rd.get('ConNo') or rd.get('Number')
+                if rd.get('TrackingID'):
+                    tracking_ls.append(str(rd.get('TrackingID')))
+                con_no_from_api = con_no_from_api or rd.get('ConsignmentNo') or rd.get('ConNo') or rd.get('Number')
 
             final_con_no = con_no_from_api or consignment_number_local
 
@@ -186,10 +179,35 @@ class DeliveryCarrier(models.Model):
                 raise ValidationError(_("No se pudo obtener la etiqueta (GET: %s, POST: %s)") % (err_get, err_post))
 
             logmessage = _("Label Created  %s") % (picking.name)
-            pickings.message_post(body=logmessage, attachments=[(f"{picking.name}.pdf", label_response.content)])
+            label_attachment = self._palletways_label_attachment(picking, label_response.content)
+            pickings.message_post(body=logmessage, attachment_ids=label_attachment.ids)
 
             return [{'exact_price': 0.0, 'tracking_number': ', '.join(tracking_ls)}]
 
+    def _palletways_label_attachment(self, picking, content):
+        """
+        Adjunto de la etiqueta en el albarán. Si ya existe uno con el mismo
+        contenido (checksum) se reutiliza en lugar de crear otro; los bytes se
+        guardan tal cual en el filestore (sin pasar por base64).
+        """
+        Attachment = self.env['ir.attachment']
+        name = f"{picking.name}.pdf"
+        attachment = Attachment.search([
+            ('res_model', '=', picking._name),
+            ('res_id', '=', picking.id),
+            ('name', '=', name),
+            ('checksum', '=', Attachment._compute_checksum(content)),
+        ], limit=1)
+        if not attachment:
+            attachment = Attachment.create({
+                'name': name,
+                'raw': content,
+                'res_model': picking._name,
+                'res_id': picking.id,
+                'mimetype': 'application/pdf',
+            })
+        return attachment
+
     def palletways_get_tracking_link(self, picking):
         return "https://track2.palletways.com/?dc_syscon={0}".format(picking.carrier_tracking_ref)
 
@@ -3,21 +3,55 @@ import lxml
 import datetime
 import logging
 from collections import defaultdict
+import timeit
 from odoo.addons.palletways_shipping_integration.models.utils import get_dom_tree, python_2_unicode_compatible
 import json
 _logger = logging.getLogger(__name__)
 
 @python_2_unicode_compatible
 class ResponseDataObject():
+    """
+    Attribute view over a reply dict.
+
+    Nested dicts and lists are wrapped, and datetime nodes parsed, only when
+    the attribute is first read; the result is cached. Building the object
+    costs nothing, so big replies cost in proportion to what is read.
+    """
+    __slots__ = ('_data', '_datetime_nodes', '_cache')
 
     def __init__(self, mydict, datetime_nodes=[]):
-        self._load_dict(mydict, list(datetime_nodes))
+        self._data = mydict
+        self._datetime_nodes = datetime_nodes if isinstance(datetime_nodes, frozenset) \
+            else frozenset(n.lower() for n in datetime_nodes)
+        self._cache = {}
 
     def __repr__(self):
         return str(self)
 
     def __str__(self):
-        return "%s" % self.__dict__
+        return "%s" % self._data
+
+    def __getattr__(self, name):
+        if name in ResponseDataObject.__slots__:
+            raise AttributeError(name)
+        cache = self._cache
+        if name in cache:
+            return cache[name]
+        try:
+            value = self._data[name]
+        except (KeyError, TypeError):
+            raise AttributeError(name)
+        value = cache[name] = self._wrap(name, value)
+        return value
+
+    def __setattr__(self, name, value):
+        if name in ResponseDataObject.__slots__:
+            object.__setattr__(self, name, value)
+        else:
+            self._cache[name] = value
+
+    def __dir__(self):
+        return list(self._data) if isinstance(self._data, dict) else []
 
     def has_key(self, name):
         try:
@@ -32,31 +66,21 @@ class ResponseDataObject():
         except AttributeError:
             return default
 
-    def _setattr(self, name, value, datetime_nodes):
-        if name.lower() in datetime_nodes:
+    def _wrap(self, name, value):
+        if isinstance(value, dict):
+            return ResponseDataObject(value, self._datetime_nodes)
+        if isinstance(value, list):
+            return [
+                ResponseDataObject(i, self._datetime_nodes) if isinstance(i, dict) else i
+                for i in value
+            ]
+        if name.lower() in self._datetime_nodes:
             try:
                 ts = "%s %s" % (value.partition('T')[0], value.partition('T')[2].partition('.')[0])
                 value = datetime.datetime.strptime(ts, '%Y-%m-%d %H:%M:%S')
             except ValueError:
                 pass
-
-        setattr(self, name, value)
-
-    def _load_dict(self, mydict, datetime_nodes):
-        for a in list(mydict.items()):
-            if isinstance(a[1], dict):
-                o = ResponseDataObject(a[1], datetime_nodes)
-                setattr(self, a[0], o)
-            elif isinstance(a[1], list):
-                objs = []
-                for i in a[1]:
-                    if i is None or isinstance(i, str) or isinstance(i, str):
-                        objs.append(i)
-                    else:
-                        objs.append(ResponseDataObject(i, datetime_nodes))
-                setattr(self, a[0], objs)
-            else:
-                self._setattr(a[0], a[1], datetime_nodes)
+        return value
 
 class Response():
 
@@ -67,12 +91,12 @@ class Response():
                 self._dom = self._parse_xml(obj)
                 self._dict = self._etree_to_dict(self._dom)
                 if verb and 'Envelope' in list(self._dict.keys()):
-                    elem = self._dom.find('Body').find('%sResponse' % verb)
+                    elem = self._dom.find('{*}Body/{*}%sResponse' % verb)
                     if elem is not None:
                         self._dom = elem
                     self._dict = self._dict['Envelope']['Body'].get('%sResponse' % verb, self._dict)
                 elif verb:
-                    elem = self._dom.find('%sResponse' % verb)
+                    elem = self._dom.find('{*}%sResponse' % verb)
                     if elem is not None:
                         self._dom = elem
                     self._dict = self._dict.get('%sResponse' % verb, self._dict)
@@ -83,18 +107,6 @@ class Response():
         else:
             self.reply = ResponseDataObject({}, [])
 
-    def _get_node_path(self, t):
-        i = t
-        path = []
-        path.insert(0, i.tag)
-        while 1:
-            try:
-                path.insert(0, i.getparent().tag)
-                i = i.getparent()
-            except AttributeError:
-                break
-        return '.'.join(path)
-
     @staticmethod
     def _pullval(v):
         if len(v) == 1:
@@ -103,30 +115,47 @@ class Response():
             return v
 
     def _etree_to_dict(self, t):
-        if type(t) == lxml.etree._Comment:
+        """
+        Convert the tree to nested dicts in a single pass.
+        Namespaces are stripped through a tag -> local name map built once per
+        distinct tag; the tree itself is left untouched.
+        """
+        if not isinstance(t.tag, str):
             return {}
-        t.tag = self._get_node_tag(t)
-        d = {t.tag: {} if t.attrib else None}
-        children = list(t)
-        if children:
-            dd = defaultdict(list)
-            for dc in map(self._etree_to_dict, children):
-                for k, v in list(dc.items()):
-                    dd[k].append(v)
-            d = {t.tag: dict((k, self._pullval(v)) for k, v in list(dd.items()))}
-            parent_path = self._get_node_path(t)
-            for k in list(d[t.tag].keys()):
-                path = "%s.%s" % (parent_path, k)
-        if t.attrib:
-            d[t.tag].update(('_' + k, v) for k, v in list(t.attrib.items()))
-        if t.text:
-            text = t.text.strip()
-            if children or t.attrib:
-                if text:
-                    d[t.tag]['value'] = text
+        local_names = {}
+        pullval = self._pullval
+
+        def local_name(tag):
+            name = local_names.get(tag)
+            if name is None:
+                name = local_names[tag] = tag.rpartition('}')[2] if tag[:1] == '{' else tag
+            return name
+
+        def convert(node):
+            children = list(node)
+            attrib = node.attrib
+            if children:
+                dd = {}
+                for child in children:
+                    if isinstance(child.tag, str):
+                        key, value = convert(child)
+                        dd.setdefault(key, []).append(value)
+                value = dict((k, pullval(v)) for k, v in dd.items())
             else:
-                d[t.tag] = text
-        return d
+                value = {} if attrib else None
+            if attrib:
+                value.update(('_' + k, v) for k, v in attrib.items())
+            if node.text:
+                text = node.text.strip()
+                if children or attrib:
+                    if text:
+                        value['value'] = text
+                else:
+                    value = text
+            return local_name(node.tag), value
+
+        tag, value = convert(t)
+        return {tag: value}
 
     def __getattr__(self, name):
         return getattr(self._obj, name)
@@ -135,7 +164,7 @@ class Response():
         return get_dom_tree(xml)
 
     def _get_node_tag(self, node):
-        return node.tag.replace('{' + node.nsmap.get(node.prefix, '') + '}', '')
+        return lxml.etree.QName(node).localname
 
     def dom(self, lxml=True):
         if not lxml:
@@ -146,4 +175,82 @@ class Response():
         return self._dict
 
     def json(self):
-        return json.dumps(self.dict())
\ No newline at end of file
+        return json.dumps(self.dict())
+
+
+def _etree_to_dict_reference(t):
+    """Previous O(n*depth) converter (ancestor walk per node), kept as the benchmark baseline"""
+    if type(t) == lxml.etree._Comment:
+        return {}
+    t.tag = t.tag.replace('{' + t.nsmap.get(t.prefix, '') + '}', '')
+    d = {t.tag: {} if t.attrib else None}
+    children = list(t)
+    if children:
+        dd = defaultdict(list)
+        for dc in map(_etree_to_dict_reference, children):
+            for k, v in list(dc.items()):
+                dd[k].append(v)
+        d = {t.tag: dict((k, Response._pullval(v)) for k, v in list(dd.items()))}
+        path = []
+        i = t
+        path.insert(0, i.tag)
+        while 1:
+            try:
+                path.insert(0, i.getparent().tag)
+                i = i.getparent()
+            except AttributeError:
+                break
+        parent_path = '.'.join(path)
+        for k in list(d[t.tag].keys()):
+            path = "%s.%s" % (parent_path, k)
+    if t.attrib:
+        d[t.tag].update(('_' + k, v) for k, v in list(t.attrib.items()))
+    if t.text:
+        text = t.text.strip()
+        if children or t.attrib:
+            if text:
+                d[t.tag]['value'] = text
+        else:
+            d[t.tag] = text
+    return d
+
+
+def _sample_responses(records):
+    ns = 'xmlns="http://api.palletways.com/"'
+    services = ''.join(
+        '<Data><ServiceGroupCode>G%d</ServiceGroupCode><ServiceCode>%s</ServiceCode>'
+        '<ServiceName>Service %d</ServiceName><ServiceGroupName>Group</ServiceGroupName>'
+        '<ServiceDaysMin>1</ServiceDaysMin><ServiceDaysMax>3</ServiceDaysMax></Data>' % (i, 'ABCDE'[i % 5], i)
+        for i in range(records))
+    consignments = ''.join(
+        '<ImportDetail type="consignment"><ImportID>%d</ImportID><ResponseID>R%d</ResponseID>'
+        '<TrackingID>T%d</TrackingID><Messages><Message><Code>0</Code><Text>OK</Text></Message></Messages>'
+        '</ImportDetail>' % (i, i, i)
+        for i in range(records))
+    status = '<Status><Code>OK</Code><Description>OK</Description></Status>'
+    return {
+        'availableServices': '<Response %s>%s<Detail>%s</Detail></Response>' % (ns, status, services),
+        'createconsignment': '<Response %s>%s<Detail>%s</Detail></Response>' % (ns, status, consignments),
+    }
+
+
+def perftest_etree_to_dict(records=2000, number=5):
+    """
+    Benchmark Response._etree_to_dict against the previous converter on large
+    availableServices and createconsignment replies. Asserts identical dicts
+    and a speedup; returns {verb: (old seconds, new seconds)}.
+    """
+    converter = Response(None, parse_response=False)
+    results = {}
+    for verb, xml in _sample_responses(records).items():
+        xml = xml.encode('utf-8')
+        assert converter._etree_to_dict(lxml.etree.fromstring(xml)) == \
+            _etree_to_dict_reference(lxml.etree.fromstring(xml))
+
+        trees = [lxml.etree.fromstring(xml) for _i in range(number)]
+        old = timeit.timeit(lambda: _etree_to_dict_reference(trees.pop()), number=number)
+        tree = lxml.etree.fromstring(xml)
+        new = timeit.timeit(lambda: converter._etree_to_dict(tree), number=number)
+        assert new < old, "%s: _etree_to_dict (%.4fs) is not faster than before (%.4fs)" % (verb, new, old)
+        results[verb] = (old, new)
+    return results
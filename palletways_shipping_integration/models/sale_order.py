@@ -3,6 +3,7 @@ from odoo.exceptions import ValidationError
 from odoo import models, fields, api, _
 from requests import request
 from odoo.addons.palletways_shipping_integration.models.palletways_response import Response
+from odoo.addons.palletways_service_integration.models.palletways_normalizer import normalize
 import logging
 
 _logger = logging.getLogger("palletways")
@@ -66,16 +67,11 @@ class SaleOrder(models.Model):
             results = api.dict()
 
         # 3) Verificación de estado y extracción de servicios
-        resp_root = results.get('Response', results) if isinstance(results, dict) else {}
-        status = resp_root.get('Status', {}) if isinstance(resp_root, dict) else {}
-        code = status.get('Code')
-        if code and code != 'OK':
+        response = normalize(results, record_keys=('Data',))
+        if response.status.code and not response.ok:
             raise ValidationError(str(results))
 
-        detail = resp_root.get('Detail', {}) if isinstance(resp_root, dict) else {}
-        available_services = detail.get('Data') if isinstance(detail, dict) else None
-        if isinstance(available_services, dict):
-            available_services = [available_services]
+        available_services = [record.data for record in response.detail if record.data]
 
         if not available_services:
             # si la estructura difiere, devolvemos el dict para inspección
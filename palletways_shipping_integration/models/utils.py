@@ -70,7 +70,7 @@ def attribute_check(root):
         if '#text' in root:
             value = root['#text']
         if '@attrs' in root:
-            for ak, av in sorted(root.pop('@attrs').items()):
+            for ak, av in sorted(root['@attrs'].items()):
                 attrs.append(str('{0}="{1}"').format(ak, smart_encode(av)))
 
     return attrs, value
@@ -91,61 +91,61 @@ def to_xml(root):
     return dict2xml(root)
 
 def dict2xml(root):
-    xml = str('')
-    if root is None:
-        return xml
+    """
+    Serialize `root` (dict, list or scalar) to XML.
 
-    if isinstance(root, dict):
-        for key in sorted(root.keys()):
+    Parts are collected in a list and joined once, so the cost is linear in
+    the output size. Dicts may carry '@attrs' (attributes) and '#text'
+    (text); `root` is not modified.
+    """
+    parts = []
+    _dict2xml(root, parts)
+    return ''.join(parts)
 
-            if isinstance(root[key], dict):
-                attrs, value = attribute_check(root[key])
 
-                if not value:
-                    value = dict2xml(root[key])
-                elif isinstance(value, dict):
-                    value = dict2xml(value)
+def _node2xml(tag, node, parts):
+    attrs, value = attribute_check(node)
+    if attrs:
+        parts.append('<%s %s>' % (tag, ' '.join(attrs)))
+    else:
+        parts.append('<%s>' % tag)
 
-                attrs_sp = str('')
-                if len(attrs) > 0:
-                    attrs_sp = str(' ')
+    if not value:
+        _dict2xml(node, parts, skip_attrs=True)
+    elif isinstance(value, dict):
+        _dict2xml(value, parts)
+    else:
+        parts.append(str(smart_encode(value)))
 
-                xml = str('{xml}<{tag}{attrs_sp}{attrs}>{value}</{tag}>') \
-                    .format(**{'tag': key, 'xml': str(xml), 'attrs': str(' ').join(attrs),
-                               'value': smart_encode(value), 'attrs_sp': attrs_sp})
+    parts.append('</%s>' % tag)
 
-            elif isinstance(root[key], list):
 
-                for item in root[key]:
-                    attrs, value = attribute_check(item)
+def _dict2xml(root, parts, skip_attrs=False):
+    if root is None:
+        return
 
-                    if not value:
-                        value = dict2xml(item)
-                    elif isinstance(value, dict):
-                        value = dict2xml(value)
+    if isinstance(root, dict):
+        for key in sorted(root.keys()):
+            if skip_attrs and key == '@attrs':
+                continue
+            node = root[key]
 
-                    attrs_sp = ''
-                    if len(attrs) > 0:
-                        attrs_sp = ' '
+            if isinstance(node, dict):
+                _node2xml(key, node, parts)
 
-                    xml = str('{xml}<{tag}{attrs_sp}{attrs}>{value}</{tag}>') \
-                        .format(**{'xml': str(xml), 'tag': key, 'attrs': ' '.join(attrs), 'value': smart_encode(value),
-                                   'attrs_sp': attrs_sp})
+            elif isinstance(node, list):
+                for item in node:
+                    _node2xml(key, item, parts)
 
             else:
-                value = root[key]
-                xml = str('{xml}<{tag}>{value}</{tag}>') \
-                    .format(**{'xml': str(xml), 'tag': key, 'value': smart_encode(value)})
-
-    elif isinstance(root, str) or isinstance(root, int) \
-        or isinstance(root, str) or isinstance(root, int) \
-        or isinstance(root, float):
-        xml = str('{0}{1}').format(str(xml), root)
+                parts.append('<%s>%s</%s>' % (key, smart_encode(node), key))
+
+    elif isinstance(root, (str, int, float)):
+        parts.append(str(root))
     else:
         raise Exception('Unable to serialize node of type %s (%s)' % \
             (type(root), root))
 
-    return xml
 
 def getValue(response_dict, *args, **kwargs):
     args_a = [w for w in args]
@@ -190,30 +190,8 @@ def getNodeText(node):
 
     return ''.join(rc)
 
-def perftest_dict2xml():
-    sample_dict = {
-        'searchFilter': {'categoryId': {'#text': 222, '@attrs': {'site': 'US'}}},
-        'paginationInput': {
-            'pageNumber': '1',
-            'pageSize': '25'
-        },
-        'itemFilter': [
-            {'name': 'Condition',
-             'value': 'Used'},
-            {'name': 'LocatedIn',
-             'value': 'GB'},
-        ],
-        'sortOrder': 'StartTimeNewest'
-    }
-    xml = dict2xml(sample_dict)
-
 if __name__ == '__main__':
 
-    import timeit
-    # print(("perftest_dict2xml() %s" % \
-    #     timeit.timeit("perftest_dict2xml()", number=50000,
-    #                   setup="from __main__ import perftest_dict2xml")))
-
     import doctest
     failure_count, test_count = doctest.testmod()
-    sys.exit(failure_count)
\ No newline at end of file
+    sys.exit(failure_count)